@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    User, Repository, RepoCollaborator, PullRequest, Commit, 
+    User, Repository, RepoCollaborator, PullRequest, PullRequestReviewer, Commit, 
     Review, Thread, Comment, LLMUsage, ReviewFeedback, WebhookEventLog
 )
 
@@ -33,6 +33,12 @@ class PullRequestAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     raw_id_fields = ('repository',)
 
+@admin.register(PullRequestReviewer)
+class PullRequestReviewerAdmin(admin.ModelAdmin):
+    list_display = ('login', 'pull_request', 'github_id', 'updated_at')
+    search_fields = ('login', 'github_id', 'pull_request__repository__repo_name')
+    raw_id_fields = ('pull_request',)
+
 @admin.register(Commit)
 class CommitAdmin(admin.ModelAdmin):
     list_display = ('commit_hash_short', 'repository', 'message_short', 'author_github_id', 'timestamp')
@@ -103,7 +109,7 @@ class CommentAdmin(admin.ModelAdmin):
 class LLMUsageAdmin(admin.ModelAdmin):
     list_display = ('user', 'review_info', 'llm_model', 'input_tokens', 'output_tokens', 'cost', 'created_at')
     search_fields = ('user__username', 'review__id', 'llm_model')
-    list_filter = ('llm_model', 'created_at')
+    list_filter = ('llm_model', 'usage_pending', 'created_at')
     raw_id_fields = ('user', 'review')
 
     def review_info(self, obj):
@@ -11,6 +11,12 @@ from .models import (
 from .serializers import (
     UserSerializer, AdminUserUpdateSerializer
 )
+from .pagination import CreatedAtCursorPagination
+from .github_client.cache import get_response_cache
+from .github_client.ratelimit import get_rate_limiter
+from .webhooks.event_log import buffer_depth as event_log_buffer_depth
+from .task_routing import queue_depths
+from .langgraph_client.limiter import get_llm_limiter
 from django.shortcuts import get_object_or_404
 import logging
 # Create a logger instance
@@ -32,13 +38,28 @@ class AdminStatsView(APIView):
             'llm_usages': llm_usage_count,
         })
 
+class AdminMetricsView(APIView):
+    """Runtime metrics for this process (caches, rate limits, queues)."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        response_cache = get_response_cache()
+        return Response({
+            'github_response_cache': response_cache.stats() if response_cache else None,
+            'github_rate_limits': get_rate_limiter().snapshot(),
+            'webhook_event_log_buffer': event_log_buffer_depth(),
+            'task_queues': queue_depths(),
+            'llm_limits': get_llm_limiter().snapshot(),
+        })
+
 class AdminUserListView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request, *args, **kwargs):
-        users = User.objects.all()
+        paginator = CreatedAtCursorPagination()
+        users = paginator.paginate_queryset(User.objects.all(), request, view=self)
         serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
 class AdminUserUpdateView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
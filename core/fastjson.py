@@ -0,0 +1,30 @@
+"""
+Thin JSON wrapper: uses orjson when it is installed and falls back to the stdlib.
+
+loads() accepts bytes directly, so callers can hand it request.body without decoding.
+"""
+import json
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - orjson is optional
+    orjson = None
+
+if orjson is not None:
+    JSONDecodeError = orjson.JSONDecodeError # subclass of json.JSONDecodeError / ValueError
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(obj, default=None) -> bytes:
+        return orjson.dumps(obj, default=default)
+else:
+    JSONDecodeError = json.JSONDecodeError
+
+    def loads(data):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode('utf-8')
+        return json.loads(data)
+
+    def dumps(obj, default=None) -> bytes:
+        return json.dumps(obj, default=default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Response headers we keep alongside a cached body and replay on a 304
+CACHED_RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Link', 'Content-Type')
+
+class BaseResponseCacheBackend:
+    """Storage interface for cached GitHub responses."""
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = options or {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+class LRUResponseCacheBackend(BaseResponseCacheBackend):
+    """In-process LRU, bounded by MAX_ENTRIES. Not shared between workers."""
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.max_entries = self.options.get('MAX_ENTRIES', 512)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class DjangoResponseCacheBackend(BaseResponseCacheBackend):
+    """Stores entries in a Django cache (e.g. Redis) so all workers share them."""
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.cache = caches[self.options.get('CACHE_ALIAS', 'default')]
+        self.timeout = self.options.get('TIMEOUT', 24 * 60 * 60)
+        self.key_prefix = self.options.get('KEY_PREFIX', 'gh-etag')
+
+    def _key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, entry):
+        self.cache.set(self._key(key), entry, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+    def clear(self):
+        # Entries expire on their own; we don't wipe a shared cache we don't own
+        pass
+
+class GitHubResponseCache:
+    """
+    Conditional-request cache for GitHub REST GETs.
+
+    Entries are keyed by token scope + URL + params and keep the ETag/Last-Modified
+    validators. A 304 reply is turned back into the cached 200 response, which GitHub
+    does not count against the rate limit.
+    """
+    def __init__(self, backend: BaseResponseCacheBackend, max_entry_bytes: int = 512 * 1024):
+        self.backend = backend
+        self.max_entry_bytes = max_entry_bytes
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped': 0}
+        self._stats_lock = threading.Lock()
+
+    def _incr(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def make_key(github_token, url, params=None, accept=None) -> str:
+        # Never keep raw tokens in keys; the digest is enough to separate scopes
+        token_scope = hashlib.sha256((github_token or 'anonymous').encode('utf-8')).hexdigest()[:16]
+        params_part = '&'.join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        raw = f"{token_scope}|{accept or ''}|{url}?{params_part}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, key) -> Optional[Dict[str, Any]]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"GitHub response cache lookup failed: {e}")
+            return None
+
+    @staticmethod
+    def conditional_headers(entry) -> Dict[str, str]:
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def process_response(self, key, entry, response):
+        """Serve 304s from the cache and store cacheable 200s. Returns the response to use."""
+        if response.status_code == 304 and entry is not None:
+            self._incr('hits')
+            response.status_code = 200
+            response.reason = 'OK'
+            response._content = entry['content']
+            response.headers.update(entry['headers'])
+            response.from_cache = True
+            return response
+
+        self._incr('misses')
+        if response.status_code == 200:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            content = response.content
+            if not (etag or last_modified) or len(content) > self.max_entry_bytes:
+                self._incr('skipped')
+                return response
+            new_entry = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'content': content,
+                'headers': {h: response.headers[h] for h in CACHED_RESPONSE_HEADERS if h in response.headers},
+            }
+            try:
+                self.backend.set(key, new_entry)
+                self._incr('stores')
+            except Exception as e:
+                logger.warning(f"GitHub response cache store failed: {e}")
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            data = dict(self._stats)
+        lookups = data['hits'] + data['misses']
+        data['hit_ratio'] = round(data['hits'] / lookups, 4) if lookups else 0.0
+        data['backend'] = type(self.backend).__name__
+        return data
+
+_response_cache: Optional[GitHubResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[GitHubResponseCache]:
+    """Return the process-wide response cache, or None when it is disabled."""
+    global _response_cache
+    if not getattr(settings, 'GITHUB_RESPONSE_CACHE_ENABLED', True):
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                options = getattr(settings, 'GITHUB_RESPONSE_CACHE_OPTIONS', {})
+                backend_path = getattr(
+                    settings, 'GITHUB_RESPONSE_CACHE_BACKEND',
+                    'core.github_client.cache.LRUResponseCacheBackend'
+                )
+                backend = import_string(backend_path)(options)
+                _response_cache = GitHubResponseCache(
+                    backend, max_entry_bytes=options.get('MAX_ENTRY_BYTES', 512 * 1024)
+                )
+    return _response_cache
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Only the fields the app actually reads; keep these in sync with the normalizers below.
+PULL_REQUEST_FRAGMENT = """
+fragment PullRequestFields on PullRequest {
+  databaseId number title body state merged url
+  createdAt updatedAt closedAt mergedAt
+  headRefOid baseRefOid
+  author { login avatarUrl ... on User { databaseId } }
+  reviewRequests(first: 100) {
+    nodes { requestedReviewer { __typename ... on User { login databaseId } ... on Team { slug databaseId } } }
+  }
+}
+"""
+
+COMMIT_FRAGMENT = """
+fragment CommitFields on Commit {
+  oid message url
+  author { name email date user { login databaseId } }
+  committer { name email date user { login databaseId } }
+}
+"""
+
+class GitHubGraphQLError(requests.exceptions.RequestException):
+    """A GraphQL error that applies to one batched key (other than NOT_FOUND)."""
+
+def _user(node):
+    if not node:
+        return None
+    return {'login': node.get('login'), 'id': node.get('databaseId'), 'avatar_url': node.get('avatarUrl')}
+
+def normalize_pull_request(node: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Map a GraphQL PullRequest node onto the REST field names the views already use."""
+    if not node:
+        return None
+    reviewers, teams = [], []
+    for request_node in (node.get('reviewRequests') or {}).get('nodes') or []:
+        reviewer = (request_node or {}).get('requestedReviewer') or {}
+        if reviewer.get('__typename') == 'User':
+            reviewers.append({'login': reviewer.get('login'), 'id': reviewer.get('databaseId')})
+        elif reviewer.get('__typename') == 'Team':
+            teams.append({'slug': reviewer.get('slug'), 'id': reviewer.get('databaseId')})
+    return {
+        'id': node.get('databaseId'),
+        'number': node.get('number'),
+        'title': node.get('title'),
+        'body': node.get('body'),
+        'state': 'open' if node.get('state') == 'OPEN' else 'closed',
+        'merged': node.get('merged'),
+        'html_url': node.get('url'),
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+        'closed_at': node.get('closedAt'),
+        'merged_at': node.get('mergedAt'),
+        'head': {'sha': node.get('headRefOid')},
+        'base': {'sha': node.get('baseRefOid')},
+        'user': _user(node.get('author')),
+        'requested_reviewers': reviewers,
+        'requested_teams': teams,
+    }
+
+def _git_actor(actor):
+    actor = actor or {}
+    return {'name': actor.get('name'), 'email': actor.get('email'), 'date': actor.get('date')}
+
+def normalize_commit(node: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Map a GraphQL Commit node onto the REST commit shape."""
+    if not node or 'oid' not in node:
+        return None
+    author, committer = node.get('author') or {}, node.get('committer') or {}
+    return {
+        'sha': node.get('oid'),
+        'html_url': node.get('url'),
+        'commit': {
+            'message': node.get('message'),
+            'author': _git_actor(author),
+            'committer': _git_actor(committer),
+        },
+        'author': _user(author.get('user')),
+        'committer': _user(committer.get('user')),
+    }
+
+def normalize_collaborator(node: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Map a collaborator edge onto the REST collaborator shape (login, id, permissions)."""
+    edges = (node or {}).get('edges') or []
+    if not edges:
+        return None
+    edge = edges[0]
+    permission = edge.get('permission')
+    return {
+        'login': (edge.get('node') or {}).get('login'),
+        'id': (edge.get('node') or {}).get('databaseId'),
+        'permission': permission,
+        'permissions': {
+            'admin': permission == 'ADMIN',
+            'maintain': permission in ('ADMIN', 'MAINTAIN'),
+            'push': permission in ('ADMIN', 'MAINTAIN', 'WRITE'),
+            'triage': permission in ('ADMIN', 'MAINTAIN', 'WRITE', 'TRIAGE'),
+            'pull': permission is not None,
+        },
+    }
+
+# key = (kind, owner, repo, identifier)
+BatchKey = Tuple[str, str, str, Any]
+
+def build_batch_query(keys: List[BatchKey]) -> Tuple[str, Dict[str, Any]]:
+    """Build one aliased GraphQL query (and its variables) resolving every key."""
+    declarations, selections, variables = [], [], {}
+    kinds = set()
+    for i, (kind, owner, repo, identifier) in enumerate(keys):
+        declarations += [f"$o{i}: String!", f"$r{i}: String!"]
+        variables[f"o{i}"], variables[f"r{i}"] = owner, repo
+        if kind == 'pull_request':
+            declarations.append(f"$n{i}: Int!")
+            variables[f"n{i}"] = int(identifier)
+            inner = f"pullRequest(number: $n{i}) {{ ...PullRequestFields }}"
+        elif kind == 'commit':
+            declarations.append(f"$e{i}: String!")
+            variables[f"e{i}"] = str(identifier)
+            inner = f"object(expression: $e{i}) {{ ... on Commit {{ ...CommitFields }} }}"
+        elif kind == 'collaborator':
+            declarations.append(f"$l{i}: String!")
+            variables[f"l{i}"] = str(identifier)
+            inner = f"collaborators(login: $l{i}, first: 1) {{ edges {{ permission node {{ login databaseId }} }} }}"
+        else:
+            raise ValueError(f"Unknown batch key kind: {kind}")
+        kinds.add(kind)
+        selections.append(f"k{i}: repository(owner: $o{i}, name: $r{i}) {{ {inner} }}")
+
+    query = f"query({', '.join(declarations)}) {{\n  " + "\n  ".join(selections) + "\n}\n"
+    if 'pull_request' in kinds:
+        query += PULL_REQUEST_FRAGMENT
+    if 'commit' in kinds:
+        query += COMMIT_FRAGMENT
+    return query, variables
+
+def _extract(kind, repository_node):
+    repository_node = repository_node or {}
+    if kind == 'pull_request':
+        return normalize_pull_request(repository_node.get('pullRequest'))
+    if kind == 'commit':
+        return normalize_commit(repository_node.get('object'))
+    return normalize_collaborator(repository_node.get('collaborators'))
+
+class Deferred:
+    """Result handle returned by the loader; reading it flushes the pending batch."""
+    def __init__(self, loader, key):
+        self._loader = loader
+        self.key = key
+
+    def result(self):
+        return self._loader._get_result(self.key)
+
+class GitHubBatchLoader:
+    """
+    DataLoader-style batching of GitHub metadata lookups for one token.
+
+    Callers queue keys with load_*(); the first result() (or an explicit dispatch())
+    resolves everything queued so far with a single GraphQL query per batch.
+    Results are memoised for the loader's lifetime, i.e. one request or task.
+    """
+    def __init__(self, github_token: str, transport: Callable[[str, Dict[str, Any], str], Dict[str, Any]], batch_size: int = 50):
+        self.github_token = github_token
+        self.transport = transport
+        self.batch_size = batch_size
+        self._pending: List[BatchKey] = []
+        self._results: Dict[BatchKey, Any] = {}
+        self._errors: Dict[BatchKey, Exception] = {}
+        self._lock = threading.RLock()
+
+    def _load(self, key: BatchKey) -> Deferred:
+        with self._lock:
+            if key not in self._results and key not in self._errors and key not in self._pending:
+                self._pending.append(key)
+        return Deferred(self, key)
+
+    def load_pull_request(self, owner: str, repo: str, number: int) -> Deferred:
+        return self._load(('pull_request', owner, repo, int(number)))
+
+    def load_commit(self, owner: str, repo: str, sha: str) -> Deferred:
+        return self._load(('commit', owner, repo, sha))
+
+    def load_collaborator(self, owner: str, repo: str, login: str) -> Deferred:
+        return self._load(('collaborator', owner, repo, login))
+
+    def dispatch(self) -> None:
+        """Resolve every pending key."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            for start in range(0, len(pending), self.batch_size):
+                self._resolve_batch(pending[start:start + self.batch_size])
+
+    def _resolve_batch(self, keys: List[BatchKey]) -> None:
+        query, variables = build_batch_query(keys)
+        try:
+            payload = self.transport(query, variables, self.github_token)
+        except Exception as e:
+            for key in keys:
+                self._errors[key] = e
+            return
+
+        data = payload.get('data') or {}
+        errors_by_alias = {}
+        for error in payload.get('errors') or []:
+            path = error.get('path') or []
+            if path:
+                errors_by_alias.setdefault(path[0], error)
+
+        for i, key in enumerate(keys):
+            alias = f"k{i}"
+            error = errors_by_alias.get(alias)
+            if error and error.get('type') != 'NOT_FOUND':
+                self._errors[key] = GitHubGraphQLError(error.get('message', 'GraphQL error'))
+            else:
+                self._results[key] = _extract(key[0], data.get(alias))
+
+    def _get_result(self, key: BatchKey):
+        with self._lock:
+            if key in self._pending:
+                self.dispatch()
+            if key in self._errors:
+                raise self._errors[key]
+            return self._results.get(key)
+
+    async def aload(self, deferred: Deferred):
+        """
+        Await a deferred result. Keys queued by other coroutines before this one runs
+        end up in the same batch; the HTTP call runs in a worker thread.
+        """
+        await asyncio.sleep(0) # let sibling coroutines queue their keys first
+        return await asyncio.to_thread(deferred.result)
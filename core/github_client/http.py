@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+import aiohttp
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Process-wide pooled HTTP clients for talking to GitHub.
+# A single requests.Session is shared by all sync helpers (requests.Session is
+# safe to share between threads for plain GET/POST usage), while aiohttp sessions
+# are bound to an event loop, so we keep one per running loop.
+_sync_session: Optional[requests.Session] = None
+_sync_session_lock = threading.Lock()
+_async_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+_async_sessions_lock = threading.Lock()
+
+def _get_setting(name, default):
+    return getattr(settings, name, default)
+
+def get_request_timeout():
+    """Default (connect, read) timeout used for GitHub requests."""
+    return (
+        _get_setting('GITHUB_HTTP_CONNECT_TIMEOUT', 5),
+        _get_setting('GITHUB_HTTP_READ_TIMEOUT', 30),
+    )
+
+def _build_sync_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=_get_setting('GITHUB_HTTP_POOL_CONNECTIONS', 10),
+        pool_maxsize=_get_setting('GITHUB_HTTP_POOL_MAXSIZE', 20),
+        pool_block=_get_setting('GITHUB_HTTP_POOL_BLOCK', False),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_sync_session() -> requests.Session:
+    """Return the shared, keep-alive requests session for GitHub calls."""
+    global _sync_session
+    if _sync_session is None:
+        with _sync_session_lock:
+            if _sync_session is None:
+                _sync_session = _build_sync_session()
+    return _sync_session
+
+def close_sync_session() -> None:
+    """Close the shared sync session (e.g. on worker shutdown)."""
+    global _sync_session
+    with _sync_session_lock:
+        if _sync_session is not None:
+            _sync_session.close()
+            _sync_session = None
+
+def _build_async_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=_get_setting('GITHUB_HTTP_POOL_MAXSIZE', 20),
+        limit_per_host=_get_setting('GITHUB_HTTP_LIMIT_PER_HOST', 10),
+        keepalive_timeout=_get_setting('GITHUB_HTTP_KEEPALIVE_TIMEOUT', 30),
+        ttl_dns_cache=300,
+    )
+    connect_timeout, read_timeout = get_request_timeout()
+    timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def get_async_session() -> aiohttp.ClientSession:
+    """Return the pooled aiohttp session bound to the currently running event loop."""
+    loop = asyncio.get_running_loop()
+    with _async_sessions_lock:
+        # Drop sessions whose loop has gone away so we don't keep dead connectors around
+        for stale_loop in [l for l in _async_sessions if l.is_closed()]:
+            _async_sessions.pop(stale_loop, None)
+        session = _async_sessions.get(loop)
+        if session is None or session.closed:
+            session = _build_async_session()
+            _async_sessions[loop] = session
+    return session
+
+async def close_async_session() -> None:
+    """Close the pooled aiohttp session for the running loop, if any."""
+    loop = asyncio.get_running_loop()
+    with _async_sessions_lock:
+        session = _async_sessions.pop(loop, None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,44 @@
+import re
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from django.conf import settings
+
+_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def parse_link_header(link_header: Optional[str]) -> Dict[str, str]:
+    """Parse a GitHub `Link` header into a {rel: url} dict."""
+    if not link_header:
+        return {}
+    return {rel: url for url, rel in _LINK_RE.findall(link_header)}
+
+def last_page_from_link(link_header: Optional[str]) -> Optional[int]:
+    """Return the page number of rel="last" in a `Link` header, if present."""
+    last_url = parse_link_header(link_header).get('last')
+    if not last_url:
+        return None
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(last_url).query)
+    try:
+        return int(query['page'][0])
+    except (KeyError, IndexError, ValueError):
+        return None
+
+def get_pagination_concurrency() -> int:
+    return max(1, getattr(settings, 'GITHUB_PAGINATION_CONCURRENCY', 4))
+
+def get_pagination_executor() -> ThreadPoolExecutor:
+    """Shared, bounded pool used to fetch list pages concurrently from sync code."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_pagination_concurrency(),
+                    thread_name_prefix='github-pages',
+                )
+    return _executor
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+class GitHubRateLimitExceeded(requests.exceptions.RequestException):
+    """Raised when a request would have to wait longer than GITHUB_RATE_LIMIT_MAX_WAIT."""
+    def __init__(self, message, retry_in=None):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+def _token_key(github_token: Optional[str]) -> str:
+    return hashlib.sha256((github_token or 'anonymous').encode('utf-8')).hexdigest()[:12]
+
+def _float_header(headers, name) -> Optional[float]:
+    value = headers.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # e.g. an HTTP-date Retry-After from a proxy
+        logger.debug(f"Ignoring malformed {name} header: {value!r}")
+        return None
+
+class TokenBudget:
+    """Last known rate-limit state for one token and GitHub resource (core, graphql, search...)."""
+    def __init__(self, token_key: str, resource: str):
+        self.token_key = token_key
+        self.resource = resource
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None # epoch seconds
+        self.blocked_until = 0.0 # set from Retry-After / exhausted budget
+        self.updated_at = None
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.retries = 0
+        self.lock = threading.Lock() # requests for a starving token queue up on this lock
+
+    def delay(self, reserve: int, now: Optional[float] = None, max_spacing: Optional[float] = None) -> float:
+        """
+        Seconds to wait before the next request so the budget lasts until reset. Spacing
+        below the reserve is capped at max_spacing: a low budget slows requests down, only
+        an exhausted or blocked one makes them wait for the reset.
+        """
+        now = now or time.time()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.remaining is None or self.reset_at is None or self.reset_at <= now:
+            return 0.0
+        if self.remaining <= 0:
+            return self.reset_at - now
+        if self.remaining < reserve:
+            # Spread what is left of the budget evenly over the rest of the window
+            spacing = (self.reset_at - now) / self.remaining
+            return min(spacing, max_spacing) if max_spacing is not None else spacing
+        return 0.0
+
+    def as_dict(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = now or time.time()
+        return {
+            'token': self.token_key,
+            'resource': self.resource,
+            'limit': self.limit,
+            'remaining': self.remaining,
+            'reset_in': max(0, round(self.reset_at - now)) if self.reset_at else None,
+            'blocked_for': max(0, round(self.blocked_until - now, 1)),
+            'waits': self.waits,
+            'waited_seconds': round(self.waited_seconds, 2),
+            'retries': self.retries,
+        }
+
+class GitHubRateLimiter:
+    """
+    Per-token request scheduler for the GitHub API.
+
+    Tracks X-RateLimit-* headers per token, slows requests down as a budget runs low,
+    honours Retry-After and retries 403/429 rate-limit responses with backoff.
+    """
+    def __init__(self, reserve=100, max_wait=30.0, max_retries=3, backoff_base=1.0):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._budgets: Dict[tuple, TokenBudget] = {}
+        self._budgets_lock = threading.Lock()
+
+    def _budget(self, github_token, resource='core') -> TokenBudget:
+        key = (_token_key(github_token), resource)
+        with self._budgets_lock:
+            budget = self._budgets.get(key)
+            if budget is None:
+                budget = TokenBudget(key[0], resource)
+                self._budgets[key] = budget
+            return budget
+
+    def _check_wait(self, budget: TokenBudget, wait: float) -> None:
+        if wait > self.max_wait:
+            raise GitHubRateLimitExceeded(
+                f"GitHub rate limit for token {budget.token_key} ({budget.resource}) exhausted; retry in {wait:.0f}s",
+                retry_in=wait,
+            )
+
+    def acquire(self, github_token, resource='core') -> None:
+        """Block until the token's budget allows another request."""
+        budget = self._budget(github_token, resource)
+        with budget.lock:
+            wait = budget.delay(self.reserve, max_spacing=self.max_wait)
+            if wait <= 0:
+                return
+            self._check_wait(budget, wait)
+            budget.waits += 1
+            budget.waited_seconds += wait
+            logger.info(f"Throttling GitHub requests for token {budget.token_key} ({resource}) for {wait:.2f}s")
+            time.sleep(wait)
+
+    async def async_acquire(self, github_token, resource='core') -> None:
+        """Async counterpart of acquire(); waits without blocking the event loop."""
+        budget = self._budget(github_token, resource)
+        wait = budget.delay(self.reserve, max_spacing=self.max_wait)
+        if wait <= 0:
+            return
+        self._check_wait(budget, wait)
+        budget.waits += 1
+        budget.waited_seconds += wait
+        logger.info(f"Throttling GitHub requests for token {budget.token_key} ({resource}) for {wait:.2f}s")
+        await asyncio.sleep(wait)
+
+    def record(self, github_token, status_code, headers) -> None:
+        """Update the token budget from a GitHub response."""
+        resource = headers.get('X-RateLimit-Resource') or 'core'
+        budget = self._budget(github_token, resource)
+        try:
+            if headers.get('X-RateLimit-Limit') is not None:
+                budget.limit = int(headers['X-RateLimit-Limit'])
+            if headers.get('X-RateLimit-Remaining') is not None:
+                budget.remaining = int(headers['X-RateLimit-Remaining'])
+            if headers.get('X-RateLimit-Reset') is not None:
+                budget.reset_at = float(headers['X-RateLimit-Reset'])
+            if status_code in (403, 429) and headers.get('Retry-After') is not None:
+                budget.blocked_until = time.time() + float(headers['Retry-After'])
+        except (TypeError, ValueError):
+            logger.debug(f"Ignoring malformed GitHub rate-limit headers: {dict(headers)}")
+        budget.updated_at = time.time()
+
+    def retry_delay(self, github_token, status_code, headers, attempt) -> Optional[float]:
+        """
+        Seconds to wait before retrying a rate-limited response, or None if the
+        response should be returned to the caller as-is.
+        """
+        if status_code not in (403, 429) or attempt >= self.max_retries:
+            return None
+        retry_after = _float_header(headers, 'Retry-After')
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_at = _float_header(headers, 'X-RateLimit-Reset')
+        if retry_after is not None:
+            delay = retry_after
+        elif remaining == '0' and reset_at is not None:
+            delay = max(0.0, reset_at - time.time())
+        elif status_code == 429:
+            delay = self.backoff_base * (2 ** attempt)
+        else:
+            # A 403 without rate-limit hints is a real permission error
+            return None
+        delay += random.uniform(0, self.backoff_base)
+        if delay > self.max_wait:
+            return None
+        self._budget(github_token, headers.get('X-RateLimit-Resource') or 'core').retries += 1
+        return delay
+
+    def snapshot(self):
+        now = time.time()
+        with self._budgets_lock:
+            budgets = list(self._budgets.values())
+        return [budget.as_dict(now) for budget in budgets]
+
+_rate_limiter: Optional[GitHubRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> GitHubRateLimiter:
+    """Return the process-wide GitHub rate limiter."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = GitHubRateLimiter(
+                    reserve=getattr(settings, 'GITHUB_RATE_LIMIT_RESERVE', 100),
+                    max_wait=getattr(settings, 'GITHUB_RATE_LIMIT_MAX_WAIT', 30.0),
+                    max_retries=getattr(settings, 'GITHUB_RATE_LIMIT_MAX_RETRIES', 3),
+                    backoff_base=getattr(settings, 'GITHUB_RATE_LIMIT_BACKOFF_BASE', 1.0),
+                )
+    return _rate_limiter
@@ -0,0 +1,225 @@
+"""
+Local mirror of GitHub pull requests and commits for registered repositories.
+
+A periodic task (see core/tasks/sync_tasks.py) walks each repository's PRs newest-updated
+first and its commits with `since`, upserting pages into PullRequest/Commit until it
+reaches the watermark stored on the Repository. A walk longer than GITHUB_MIRROR_MAX_PAGES
+leaves the watermark where it was and records the next page in Repository.mirror_cursor;
+the following sync resumes there. The PR and commit list endpoints serve from these
+tables and report mirror_synced_at as a freshness hint; webhooks keep the mirror current
+between syncs.
+"""
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Repository, PullRequest, Commit
+from .redis_client import get_redis
+from .services import get_repository_commits_from_github, get_repository_pull_requests_from_github
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100 # GitHub's maximum per_page
+# Re-read a little before the watermark: GitHub timestamps have second precision and
+# an item can be updated while a sync is walking the pages
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+PR_UPDATE_FIELDS = [
+    'pr_number', 'title', 'body', 'author_github_id', 'status', 'url', 'head_sha', 'base_sha',
+    'user_login', 'user_avatar_url', 'created_at_gh', 'updated_at_gh', 'closed_at_gh', 'merged_at_gh', 'updated_at',
+]
+COMMIT_UPDATE_FIELDS = [
+    'message', 'author_github_id', 'committer_github_id', 'url', 'timestamp',
+    'author_name', 'author_email', 'committer_name', 'committer_email', 'committed_date', 'updated_at',
+]
+
+def _parse(value) -> Optional[Any]:
+    return parse_datetime(value) if value else None
+
+def _github_id(user: Optional[Dict[str, Any]]) -> Optional[str]:
+    return str(user['id']) if user and user.get('id') is not None else None
+
+def pull_request_fields(gh_pr: Dict[str, Any]) -> Dict[str, Any]:
+    """PullRequest field values from a GitHub pull request object (REST or webhook payload)."""
+    user = gh_pr.get('user') or {}
+    return {
+        'pr_github_id': str(gh_pr.get('id')),
+        'pr_number': gh_pr.get('number'),
+        'title': (gh_pr.get('title') or '')[:255],
+        'body': gh_pr.get('body'),
+        'author_github_id': _github_id(user) or '',
+        'status': gh_pr.get('state'),
+        'url': gh_pr.get('html_url'),
+        'head_sha': (gh_pr.get('head') or {}).get('sha'),
+        'base_sha': (gh_pr.get('base') or {}).get('sha'),
+        'user_login': user.get('login'),
+        'user_avatar_url': user.get('avatar_url'),
+        'created_at_gh': _parse(gh_pr.get('created_at')),
+        'updated_at_gh': _parse(gh_pr.get('updated_at')),
+        'closed_at_gh': _parse(gh_pr.get('closed_at')),
+        'merged_at_gh': _parse(gh_pr.get('merged_at')),
+    }
+
+def commit_fields(gh_commit: Dict[str, Any]) -> Dict[str, Any]:
+    """Commit field values from an entry of GitHub's list-commits response."""
+    git_commit = gh_commit.get('commit') or {}
+    author = git_commit.get('author') or {}
+    committer = git_commit.get('committer') or {}
+    return {
+        'commit_hash': gh_commit.get('sha'),
+        'message': git_commit.get('message') or '',
+        'author_github_id': _github_id(gh_commit.get('author')),
+        'committer_github_id': _github_id(gh_commit.get('committer')),
+        'url': gh_commit.get('html_url'),
+        'timestamp': _parse(author.get('date')), # git author date, like the rest of the app
+        'author_name': author.get('name'),
+        'author_email': author.get('email'),
+        'committer_name': committer.get('name'),
+        'committer_email': committer.get('email'),
+        'committed_date': _parse(committer.get('date')),
+    }
+
+def _upsert_pull_requests(repository: Repository, items: List[Dict[str, Any]]) -> None:
+    rows = [PullRequest(repository=repository, **pull_request_fields(item)) for item in items]
+    PullRequest.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['pr_github_id'], update_fields=PR_UPDATE_FIELDS,
+    )
+
+def _upsert_commits(repository: Repository, items: List[Dict[str, Any]]) -> None:
+    rows = [Commit(repository=repository, **commit_fields(item)) for item in items if item.get('sha')]
+    Commit.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['repository', 'commit_hash'], update_fields=COMMIT_UPDATE_FIELDS,
+    )
+
+def _max_time(current, candidates):
+    values = [value for value in candidates if value is not None]
+    if current is not None:
+        values.append(current)
+    return max(values) if values else None
+
+def _resume_state(repository: Repository, resource: str) -> Tuple[int, Optional[Any]]:
+    """(first page to read, newest time seen so far) for a walk, resuming a truncated one."""
+    state = (repository.mirror_cursor or {}).get(resource) or {}
+    return state.get('page') or 1, _parse(state.get('until'))
+
+def _finish_walk(repository: Repository, resource: str, watermark_field: str, newest, next_page: Optional[int]) -> None:
+    """Move the watermark once a walk is complete; a truncated walk only saves where to resume."""
+    cursor = dict(repository.mirror_cursor or {})
+    if next_page:
+        cursor[resource] = {'page': next_page, 'until': newest.isoformat() if newest else None}
+    else:
+        cursor.pop(resource, None)
+        setattr(repository, watermark_field, newest)
+    repository.mirror_cursor = cursor
+
+def sync_pull_requests(repository: Repository, github_token: str, max_pages: int) -> Tuple[int, Optional[Any], Optional[int]]:
+    """
+    Mirror PRs updated since the watermark; returns (PRs written, newest updated_at seen,
+    page to resume from or None when the walk reached the watermark).
+    """
+    owner_login, repo_name = repository.repo_name.split('/', 1)
+    watermark = repository.pulls_synced_until
+    cutoff = watermark - WATERMARK_OVERLAP if watermark else None
+    start_page, resumed_newest = _resume_state(repository, 'pulls')
+    newest, written = _max_time(watermark, [resumed_newest]), 0
+    for page in range(start_page, start_page + max_pages):
+        items = get_repository_pull_requests_from_github(
+            github_token=github_token, owner_login=owner_login, repo_name=repo_name,
+            state='all', sort='updated', direction='desc', per_page=PAGE_SIZE, page=page,
+        )
+        fresh = [item for item in items if cutoff is None or (_parse(item.get('updated_at')) or cutoff) >= cutoff]
+        if fresh:
+            _upsert_pull_requests(repository, fresh)
+            written += len(fresh)
+            newest = _max_time(newest, (_parse(item.get('updated_at')) for item in fresh))
+        # Sorted by updated_at, so the first item past the watermark ends the walk
+        if len(fresh) < len(items) or len(items) < PAGE_SIZE:
+            return written, newest, None
+    logger.info(f"PR mirror for {repository.repo_name} stopped after page {page}, resuming there next sync")
+    return written, newest, page + 1
+
+def sync_commits(repository: Repository, github_token: str, max_pages: int) -> Tuple[int, Optional[Any], Optional[int]]:
+    """
+    Mirror default-branch commits since the watermark; returns (commits written, newest
+    commit date seen, page to resume from or None when the walk is complete).
+    """
+    owner_login, repo_name = repository.repo_name.split('/', 1)
+    watermark = repository.commits_synced_until
+    # `since` stays at the old watermark until a resumed walk completes
+    since = (watermark - WATERMARK_OVERLAP).isoformat() if watermark else None
+    start_page, resumed_newest = _resume_state(repository, 'commits')
+    newest, written = _max_time(watermark, [resumed_newest]), 0
+    for page in range(start_page, start_page + max_pages):
+        items = get_repository_commits_from_github(
+            github_token=github_token, owner_login=owner_login, repo_name=repo_name,
+            per_page=PAGE_SIZE, page=page, since=since,
+        )
+        if items:
+            _upsert_commits(repository, items)
+            written += len(items)
+            newest = _max_time(newest, (_parse(((item.get('commit') or {}).get('committer') or {}).get('date')) for item in items))
+        if len(items) < PAGE_SIZE:
+            return written, newest, None
+    logger.info(f"Commit mirror for {repository.repo_name} stopped after page {page}, resuming there next sync")
+    return written, newest, page + 1
+
+def sync_repository(repository: Repository) -> Dict[str, Any]:
+    """
+    Bring the PR and commit mirror of one repository up to date. Uses the owner's GitHub
+    token. Watermarks only move once a resource was walked to the end without errors, so
+    a failed sync is retried from the old watermark and a truncated one resumes from
+    mirror_cursor. 'truncated' in the result tells the caller to queue another round.
+    """
+    github_token = repository.owner.github_access_token
+    if not github_token:
+        logger.warning(f"Skipping GitHub mirror sync of {repository.repo_name}: owner has no GitHub token")
+        return {}
+    max_pages = getattr(settings, 'GITHUB_MIRROR_MAX_PAGES', 20)
+    pulls, newest, next_page = sync_pull_requests(repository, github_token, max_pages)
+    _finish_walk(repository, 'pulls', 'pulls_synced_until', newest, next_page)
+    repository.save(update_fields=['pulls_synced_until', 'mirror_cursor'])
+    commits, newest, next_page = sync_commits(repository, github_token, max_pages)
+    _finish_walk(repository, 'commits', 'commits_synced_until', newest, next_page)
+    repository.mirror_synced_at = timezone.now()
+    repository.save(update_fields=['commits_synced_until', 'mirror_cursor', 'mirror_synced_at'])
+    return {'pull_requests': pulls, 'commits': commits, 'truncated': bool(repository.mirror_cursor)}
+
+def _refresh_lock_key(repository_id: int) -> str:
+    return f"github-mirror-refresh:{repository_id}"
+
+def request_refresh(repository: Repository) -> bool:
+    """Queue a sync of one repository unless one was queued recently; returns whether it was queued."""
+    interval = getattr(settings, 'GITHUB_MIRROR_REFRESH_MIN_INTERVAL', 60)
+    try:
+        # Shared Redis, so the throttle holds across web workers
+        if not get_redis().set(_refresh_lock_key(repository.id), 1, nx=True, ex=interval):
+            return False
+    except Exception as e:
+        logger.warning(f"Mirror refresh throttle unavailable: {str(e)}")
+    # Imported here: core.tasks imports this module (sync_tasks)
+    from .tasks.sync_tasks import sync_repository_mirror
+    try:
+        sync_repository_mirror.delay(repository.id)
+    except Exception as e:
+        logger.error(f"Could not queue mirror sync for {repository.repo_name}: {str(e)}")
+        return False
+    return True
+
+def add_freshness_headers(response, repository: Repository, refresh: bool = False):
+    """
+    Freshness hint for list endpoints served from the mirror: X-Mirror-Synced-At (ISO time
+    or "never") and X-Mirror-Stale. A refresh is queued when asked for (?refresh=true) or
+    when the repository was never synced.
+    """
+    synced_at = repository.mirror_synced_at
+    stale_after = getattr(settings, 'GITHUB_MIRROR_STALE_AFTER', 900)
+    stale = synced_at is None or timezone.now() - synced_at > timedelta(seconds=stale_after)
+    response['X-Mirror-Synced-At'] = synced_at.isoformat() if synced_at else 'never'
+    response['X-Mirror-Stale'] = 'true' if stale else 'false'
+    if refresh or synced_at is None:
+        response['X-Mirror-Refresh'] = 'queued' if request_refresh(repository) else 'pending'
+    return response
@@ -0,0 +1,101 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .models import PullRequest, Repository, Review
+from .services import compare_commits_from_github
+
+logger = logging.getLogger(__name__)
+
+# GitHub's compare API lists at most this many files; beyond it we cannot trust the list
+COMPARE_FILES_LIMIT = 300
+
+# Keys a per-file finding may use for its path
+_FILE_KEYS = ('file', 'filename', 'file_path', 'path')
+
+# review_data entries that hold per-file findings and can be merged forward
+MERGEABLE_KEYS = ('reviews', 'fixes')
+
+def incremental_review_enabled() -> bool:
+    return getattr(settings, 'INCREMENTAL_REVIEW_ENABLED', True)
+
+def find_previous_review(pr: PullRequest, head_sha: str, exclude_review_id: Optional[int] = None) -> Optional[Review]:
+    """Latest completed review of this PR that ran against a different head."""
+    queryset = Review.objects.filter(
+        pull_request=pr, status='completed', head_sha__isnull=False, review_data__isnull=False,
+    ).exclude(head_sha=head_sha)
+    if exclude_review_id:
+        queryset = queryset.exclude(id=exclude_review_id)
+    return queryset.order_by('-updated_at').first()
+
+def changed_files_between(repo: Repository, base_sha: str, head_sha: str) -> Optional[List[str]]:
+    """
+    Files touched between two heads of the same PR, or None when an incremental
+    review is not safe (force-push/rebase, truncated file list, API error).
+    """
+    github_token = repo.owner.github_access_token
+    if not github_token:
+        return None
+    owner_login, repo_name = repo.repo_name.split('/', 1)
+    try:
+        comparison = compare_commits_from_github(github_token, owner_login, repo_name, base_sha, head_sha)
+    except Exception as e:
+        logger.warning(f"Could not compare {base_sha[:7]}...{head_sha[:7]} in {repo.repo_name}: {str(e)}")
+        return None
+
+    status = comparison.get('status')
+    if status == 'identical':
+        return []
+    if status != 'ahead':
+        # 'diverged'/'behind' means the old head is no longer in the branch history
+        logger.info(f"{repo.repo_name}: {base_sha[:7]}...{head_sha[:7]} is '{status}', falling back to a full review")
+        return None
+
+    files = comparison.get('files') or []
+    if len(files) >= COMPARE_FILES_LIMIT:
+        return None
+    changed = set()
+    for f in files:
+        changed.add(f.get('filename'))
+        if f.get('previous_filename'):
+            changed.add(f['previous_filename'])
+    changed.discard(None)
+    return sorted(changed)
+
+def _finding_file(item: Any) -> Optional[str]:
+    if isinstance(item, dict):
+        for key in _FILE_KEYS:
+            if item.get(key):
+                return item[key]
+    return None
+
+def _merge_findings(previous: Any, current: Any, changed_files: Iterable[str]) -> Any:
+    changed = set(changed_files)
+    if isinstance(previous, dict) and isinstance(current, dict):
+        # {filename: findings}
+        merged = {name: value for name, value in previous.items() if name not in changed}
+        merged.update(current)
+        return merged
+    if isinstance(previous, list) and isinstance(current, list):
+        # [{file: ..., ...}]; entries we cannot attribute to a file are not carried over, and a
+        # file the agent reported again (changed or not) keeps only its new findings
+        replaced = changed | {_finding_file(item) for item in current}
+        carried = [item for item in previous if _finding_file(item) and _finding_file(item) not in replaced]
+        return carried + current
+    return current if current is not None else previous
+
+def merge_review_data(previous_data: Dict[str, Any], current_data: Dict[str, Any], changed_files: List[str],
+                      base_review_id: int, base_head_sha: str) -> Dict[str, Any]:
+    """Carry findings for untouched files forward from the previous review into the new one."""
+    merged = dict(previous_data or {})
+    merged.update(current_data or {})
+    for key in MERGEABLE_KEYS:
+        if key in (previous_data or {}) or key in (current_data or {}):
+            merged[key] = _merge_findings((previous_data or {}).get(key), (current_data or {}).get(key), changed_files)
+    merged['incremental'] = {
+        'base_review_id': base_review_id,
+        'base_head_sha': base_head_sha,
+        'changed_files': changed_files,
+    }
+    return merged
@@ -1,41 +1,108 @@
 import logging
-import time
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from django.conf import settings
 from langgraph_sdk import get_client
 from langsmith import Client
 from ..models import User
+from .limiter import get_llm_limiter
 logger = logging.getLogger(__name__)
 
+def _message_usage(message: Any) -> Optional[Dict[str, int]]:
+    """Token usage reported on one serialized AI message, if any."""
+    if not isinstance(message, dict):
+        return None
+    usage = message.get('usage_metadata')
+    if usage:
+        return {'input_tokens': usage.get('input_tokens') or 0, 'output_tokens': usage.get('output_tokens') or 0}
+    # Older langchain providers only fill response_metadata
+    usage = (message.get('response_metadata') or {}).get('token_usage')
+    if usage:
+        return {'input_tokens': usage.get('prompt_tokens') or 0, 'output_tokens': usage.get('completion_tokens') or 0}
+    return None
+
+def usage_from_messages(messages: List[Any]) -> Dict[str, int]:
+    """Sum the token usage the model reported on AI messages; {} when none of them carry it."""
+    input_tokens, output_tokens, found = 0, 0, False
+    for message in messages or []:
+        usage = _message_usage(message)
+        if usage:
+            found = True
+            input_tokens += usage['input_tokens']
+            output_tokens += usage['output_tokens']
+    if not found:
+        return {}
+    return {'input_tokens': input_tokens, 'output_tokens': output_tokens, 'total_tokens': input_tokens + output_tokens}
+
+def _chunk_text(chunk: Any) -> str:
+    """Text of a streamed AI message chunk (content may be a string or a list of content blocks)."""
+    if not isinstance(chunk, dict) or chunk.get('type') not in ('AIMessageChunk', 'ai'):
+        return ''
+    content = chunk.get('content')
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') for block in content if isinstance(block, dict) and block.get('type') == 'text')
+    return ''
+
+def _messages_since_last_human(messages: List[Any]) -> List[Any]:
+    """Messages produced by the latest turn of a long-running thread."""
+    messages = messages or []
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], dict) and messages[index].get('type') == 'human':
+            return messages[index + 1:]
+    return messages
+
 class LangGraphClient:
     def __init__(self):
         self.client = get_client(url=settings.LANGGRAPH_API_URL)
         self.assistants = None
         self.review_agent = None
         self.feedback_agent = None
+        self.langsmith_client = None
 
-    async def initialize(self):
-        """Initialize the client and get assistants"""
-        try:
-            # Ensure client is initialized (it is in __init__ if url is present)
-            # self.assistants = await self.client.assistants.search() # No longer searching all
-            
-            # Fetch specific assistants by ID or name from settings
-            # assistants = await self.client.assistants.search()
-            self.review_agent = await self.client.assistants.get(settings.LANGGRAPH_REVIEW_ASSISTANT_ID)
-            self.feedback_agent = await self.client.assistants.get(settings.LANGGRAPH_FEEDBACK_ASSISTANT_ID)
+    async def initialize(self) -> bool:
+        """Initialize the client and get assistants. Returns False if the assistants could not be fetched."""
+        healthy = await self.refresh_assistants()
+        if self.langsmith_client is None:
             self.langsmith_client = Client(api_key=settings.LANGSMITH_API_KEY)
-            if not self.review_agent:
-                logger.error(f"Review agent with ID '{settings.LANGGRAPH_REVIEW_ASSISTANT_ID}' not found.")
-            if not self.feedback_agent:
-                logger.error(f"Feedback agent with ID '{settings.LANGGRAPH_FEEDBACK_ASSISTANT_ID}' not found.")
-                
+        return healthy
+
+    async def refresh_assistants(self) -> bool:
+        """
+        (Re)fetch the review and feedback assistants. Doubles as a health check: on
+        failure the previously fetched descriptors are kept and False is returned.
+        """
+        try:
+            # Fetch specific assistants by ID from settings
+            review_agent = await self.client.assistants.get(settings.LANGGRAPH_REVIEW_ASSISTANT_ID)
+            feedback_agent = await self.client.assistants.get(settings.LANGGRAPH_FEEDBACK_ASSISTANT_ID)
         except Exception as e:
             logger.error(f"Error initializing LangGraph client or fetching assistants: {str(e)}")
-            # Depending on policy, you might want to set agents to None or re-raise
-            self.review_agent = None
-            self.feedback_agent = None
-            # raise # Optionally re-raise if assistant presence is critical for startup
+            return False
+        if not review_agent:
+            logger.error(f"Review agent with ID '{settings.LANGGRAPH_REVIEW_ASSISTANT_ID}' not found.")
+        if not feedback_agent:
+            logger.error(f"Feedback agent with ID '{settings.LANGGRAPH_FEEDBACK_ASSISTANT_ID}' not found.")
+        self.review_agent = review_agent or self.review_agent
+        self.feedback_agent = feedback_agent or self.feedback_agent
+        return bool(review_agent and feedback_agent)
+
+    def read_run_usage(self, run_id: str) -> Optional[Dict[str, int]]:
+        """
+        Token usage LangSmith recorded for a run, or None while the run is not processed yet.
+        Blocking; meant for the deferred backfill task, not the review path.
+        """
+        if self.langsmith_client is None:
+            self.langsmith_client = Client(api_key=settings.LANGSMITH_API_KEY)
+        meta = self.langsmith_client.read_run(run_id=run_id)
+        if meta.prompt_tokens is None and meta.completion_tokens is None:
+            return None
+        return {
+            'input_tokens': meta.prompt_tokens or 0,
+            'output_tokens': meta.completion_tokens or 0,
+            'total_tokens': meta.total_tokens or 0
+        }
+
     async def _get_user_github_token(self, user_github_id: str) -> Optional[str]:
         """Retrieve the GitHub token for a user"""
         try:
@@ -47,13 +114,26 @@ class LangGraphClient:
         except Exception as e:
             logger.error(f"Error retrieving GitHub token for user {user_github_id}: {e}")
             return None
+    async def copy_thread(self, thread_id: str) -> Optional[str]:
+        """Copy a thread (with its state/history) so a reused review gets its own conversation."""
+        thread = await self.client.threads.copy(thread_id)
+        # The server answers with the new thread; older SDKs type this as None
+        return (thread or {}).get('thread_id')
+
     async def generate_review(
         self,
         pr_data: Dict[str, Any],
         repo_settings: Dict[str, Any],
-        user_id: str
+        user_id: str,
+        changed_files: Optional[List[str]] = None,
+        base_head_sha: Optional[str] = None,
+        on_progress: Optional[Callable[[str, Any], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Generate a code review for a pull request"""
+        """
+        Generate a code review for a pull request.
+        With changed_files set, the agent is asked to review only those files (incremental re-review from base_head_sha).
+        With on_progress set, the run is streamed and on_progress(node, update) is awaited for every node update.
+        """
         if not self.review_agent:
             await self.initialize()
         github_token = await self._get_user_github_token(user_id)
@@ -83,6 +163,11 @@ class LangGraphClient:
                     "pr_id": pr_data.get("number", ""),
                     "commit_hash": "",  # Empty for PR reviews
                 })
+                if changed_files is not None:
+                    input_data.update({
+                        "changed_files": changed_files,
+                        "base_commit_hash": base_head_sha or "",
+                    })
             # Handle Commit review
             else:
                 # For commit reviews (either from the event_data format or our custom format)
@@ -103,30 +188,34 @@ class LangGraphClient:
                     "commit_hash": commit_hash,
                 })
 
-            # Start the review process
-            run = await self.client.runs.create(
-                thread_id=thread['thread_id'],
-                assistant_id=self.review_agent['assistant_id'],
-                input=input_data,
-                config={"recursion_limit": 99999999}
-            )
+            # Wait for a free slot on this model instead of getting throttled by the provider
+            async with get_llm_limiter().slot(
+                input_data['llm_model'], getattr(settings, 'LLM_ESTIMATED_REVIEW_TOKENS', 20000)
+            ) as llm_slot:
+                if on_progress:
+                    run_id = await self._stream_run(
+                        thread['thread_id'], self.review_agent['assistant_id'], input_data,
+                        {"recursion_limit": 99999999}, on_progress
+                    )
+                    run = {'run_id': run_id}
+                else:
+                    # Start the review process
+                    run = await self.client.runs.create(
+                        thread_id=thread['thread_id'],
+                        assistant_id=self.review_agent['assistant_id'],
+                        input=input_data,
+                        config={"recursion_limit": 99999999}
+                    )
 
-            # Wait for the run to complete
-            completed_run = await self.client.runs.join(run_id=run['run_id'], thread_id=thread["thread_id"])
-
-            # Get the final state of the feedback
-            final_state = await self.client.threads.get_state(thread['thread_id'])
-            token_usage = {}
-            try:
-                time.sleep(5)  # Optional: wait a bit for the run to be fully processed
-                meta = self.langsmith_client.read_run(run_id=run['run_id'])
-                token_usage = {
-                    'input_tokens': meta.prompt_tokens,
-                    'output_tokens': meta.completion_tokens,
-                    'total_tokens': meta.total_tokens
-                }
-            except Exception as e_ls:
-                logger.error(f"Could not fetch token usage from Langsmith: {e_ls}")
+                    # Wait for the run to complete
+                    completed_run = await self.client.runs.join(run_id=run['run_id'], thread_id=thread["thread_id"])
+
+                # Get the final state of the feedback
+                final_state = await self.client.threads.get_state(thread['thread_id'])
+                # Usage comes from the run's own messages; when they don't carry it the caller
+                # backfills from LangSmith later (see core.tasks.usage_tasks) rather than waiting here
+                token_usage = usage_from_messages(final_state['values'].get('messages'))
+                llm_slot.record_usage(token_usage)
             return {
                 'thread_id': thread['thread_id'],
                 'run_id': run['run_id'],
@@ -138,6 +227,91 @@ class LangGraphClient:
             logger.error(f"Error generating review: {str(e)}")
             raise
 
+    async def _stream_run(
+        self,
+        thread_id: str,
+        assistant_id: str,
+        input_data: Dict[str, Any],
+        config: Dict[str, Any],
+        on_progress: Callable[[str, Any], Awaitable[None]]
+    ) -> Optional[str]:
+        """Run an assistant in 'updates' stream mode, reporting each node update. Returns the run id."""
+        run_id = None
+        async for part in self.client.runs.stream(
+            thread_id,
+            assistant_id,
+            input=input_data,
+            config=config,
+            stream_mode="updates",
+        ):
+            if part.event == 'metadata':
+                run_id = (part.data or {}).get('run_id')
+            elif part.event == 'error':
+                raise Exception(f"LangGraph run {run_id} failed: {part.data}")
+            elif part.event == 'updates' and isinstance(part.data, dict):
+                for node, update in part.data.items():
+                    await on_progress(node, update)
+        return run_id
+
+    def _feedback_input(
+        self,
+        feedback: str,
+        thread_id: str,
+        user_id: str,
+        github_token: Optional[str],
+        is_first_message: bool = False,
+        review_data: Optional[Dict[str, Any]] = None,
+        repo_settings: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Input for a feedback agent run"""
+        # Prepare input data for feedback
+        messages_for_langgraph = []
+        # Convert conversation_history to LangGraph message format if necessary
+        # For example: messages_for_langgraph = [(msg_role, msg_content) for msg_role, msg_content in conversation_history]
+        # Then add the current feedback
+        messages_for_langgraph.append(("user", feedback))
+
+        input_data = {
+            "messages": messages_for_langgraph, # Use the constructed history + new message
+            "feedback": feedback,
+            "reviewer_id": user_id, # This should be the ID of the user giving feedback
+            "thread_id": thread_id # thread_id is usually part of the run config, not input directly to messages
+        }
+        if is_first_message:
+            input_data.update({
+                "original_review": review_data.get("review_data", {}).get("final_result", {}), # Assuming review_data contains the structure
+                "updated_review": review_data.get("review_data", {}).get("final_result", {}), # Assuming final_result is the updated review
+                "llm_model": repo_settings.get('llm_preference', settings.DEFAULT_LLM_MODEL),
+                "user": review_data.get("repository", {}).get("owner", {}).get("username"), # Example, adjust as per actual data
+                "repo": review_data.get("repository", {}).get("repo_name").split("/")[-1], # Example
+                "user_github_token": github_token, # GitHub token for the user
+                "pr_id": str(review_data.get("pull_request", {}).get("pr_number", "")) if review_data.get("pull_request") else None, # Example
+                "standards": repo_settings.get('coding_standards', []),
+                "metrics": repo_settings.get('code_metrics', []),
+                "temperature": settings.DEFAULT_TEMPERATURE,
+                "max_tokens": settings.DEFAULT_MAX_TOKENS,
+                "max_tool_calls": settings.DEFAULT_MAX_TOOL_CALLS,
+                "reviewer_id": user_id, # Already present
+            })
+        return input_data
+
+    async def _feedback_result(self, thread_id: str, run_id: Optional[str]) -> Dict[str, Any]:
+        """Final thread state and usage of a finished feedback run"""
+        final_state = await self.client.threads.get_state(thread_id)
+
+        # The thread keeps the whole conversation; only this turn's messages count
+        token_usage = usage_from_messages(_messages_since_last_human(final_state.get('values', {}).get('messages')))
+
+        return {
+            'run_id': run_id,
+            'feedback_data': final_state.get('values', {}), # Get the 'values' from the state
+            'token_usage': token_usage
+        }
+
+    def _feedback_slot(self, repo_settings: Optional[Dict[str, Any]], llm_model: Optional[str], max_wait: Optional[float] = None):
+        model = (repo_settings or {}).get('llm_preference') or llm_model or settings.DEFAULT_LLM_MODEL
+        return get_llm_limiter().slot(model, getattr(settings, 'LLM_ESTIMATED_FEEDBACK_TOKENS', 6000), max_wait)
+
     async def handle_feedback(
         self,
         feedback: str,
@@ -145,81 +319,98 @@ class LangGraphClient:
         user_id: str,
         is_first_message:bool = False,
         review_data: Optional[Dict[str, Any]] = None,
-        repo_settings: Optional[Dict[str, Any]] = None
+        repo_settings: Optional[Dict[str, Any]] = None,
+        llm_model: Optional[str] = None,
+        max_wait: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Handle feedback for a review"""
+        """
+        Handle feedback for a review. llm_model is the thread's model, used for rate
+        limiting; max_wait caps the wait for a slot (LLMRateLimitTimeout before the run starts).
+        """
         if not self.feedback_agent:
             await self.initialize()
         github_token = await self._get_user_github_token(user_id)
         try:
-            # Prepare input data for feedback
-            messages_for_langgraph = []
-            # Convert conversation_history to LangGraph message format if necessary
-            # For example: messages_for_langgraph = [(msg_role, msg_content) for msg_role, msg_content in conversation_history]
-            # Then add the current feedback
-            messages_for_langgraph.append(("user", feedback))
-
-            input_data = {
-                "messages": messages_for_langgraph, # Use the constructed history + new message
-                "feedback": feedback,
-                "reviewer_id": user_id, # This should be the ID of the user giving feedback
-                "thread_id": thread_id # thread_id is usually part of the run config, not input directly to messages
-            }
-            if is_first_message:
-                input_data.update({
-                    "original_review": review_data.get("review_data", {}).get("final_result", {}), # Assuming review_data contains the structure
-                    "updated_review": review_data.get("review_data", {}).get("final_result", {}), # Assuming final_result is the updated review
-                    "llm_model": repo_settings.get('llm_preference', settings.DEFAULT_LLM_MODEL),
-                    "user": review_data.get("repository", {}).get("owner", {}).get("username"), # Example, adjust as per actual data
-                    "repo": review_data.get("repository", {}).get("repo_name").split("/")[-1], # Example
-                    "user_github_token": github_token, # GitHub token for the user
-                    "pr_id": str(review_data.get("pull_request", {}).get("pr_number", "")) if review_data.get("pull_request") else None, # Example
-                    "standards": repo_settings.get('coding_standards', []),
-                    "metrics": repo_settings.get('code_metrics', []),
-                    "temperature": settings.DEFAULT_TEMPERATURE,
-                    "max_tokens": settings.DEFAULT_MAX_TOKENS,
-                    "max_tool_calls": settings.DEFAULT_MAX_TOOL_CALLS,
-                    "reviewer_id": user_id, # Already present
-                })
+            input_data = self._feedback_input(
+                feedback, thread_id, user_id, github_token, is_first_message, review_data, repo_settings
+            )
             
             # The thread_id for the run/wait call
             config = {"recursion_limit": 99999999} # Configurable can be added if needed by your LangGraph setup
 
-            run = await self.client.runs.create( # Use create then join, or wait if your SDK version supports it well
-                assistant_id=self.feedback_agent['assistant_id'],
-                thread_id=thread_id,
-                input=input_data,
-                config=config # Pass config here if using create
-            )
-            
-            # Wait for the run to complete
-            completed_run = await self.client.runs.join(run_id=run['run_id'], thread_id=thread_id) # Adjust timeout
+            async with self._feedback_slot(repo_settings, llm_model, max_wait) as llm_slot:
+                run = await self.client.runs.create( # Use create then join, or wait if your SDK version supports it well
+                    assistant_id=self.feedback_agent['assistant_id'],
+                    thread_id=thread_id,
+                    input=input_data,
+                    config=config # Pass config here if using create
+                )
+                
+                # Wait for the run to complete
+                completed_run = await self.client.runs.join(run_id=run['run_id'], thread_id=thread_id) # Adjust timeout
 
-            # Get the final state of the feedback
-            final_state = await self.client.threads.get_state(thread_id)
-            
-            # Fetch token usage if not in completed_run or final_state
-            # This part depends on your LangGraph SDK version and Langsmith client integration
-            # token_usage = completed_run.get('token_usage', {})
-            # if not token_usage and hasattr(self, 'langsmith_client'): # Hypothetical langsmith_client
-            token_usage = {}
-            try:
-                time.sleep(1)  # Optional: wait a bit for the run to be fully processed
-                meta = self.langsmith_client.read_run(run_id=run['run_id'])
-                token_usage = {
-                    'input_tokens': meta.prompt_tokens,
-                    'output_tokens': meta.completion_tokens,
-                    'total_tokens': meta.total_tokens
-                }
-            except Exception as e_ls:
-                logger.error(f"Could not fetch token usage from Langsmith: {e_ls}")
-
-            return {
-                'run_id': run['run_id'],
-                'feedback_data': final_state.get('values', {}), # Get the 'values' from the state
-                'token_usage': token_usage
-            }
+                result = await self._feedback_result(thread_id, run['run_id'])
+                llm_slot.record_usage(result['token_usage'])
+            return result
 
         except Exception as e:
             logger.error(f"Error handling feedback: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    async def finish_feedback(self, thread_id: str, run_id: str) -> Dict[str, Any]:
+        """Wait for a feedback run started elsewhere (e.g. a dropped stream) and return its result."""
+        await self.client.runs.join(thread_id=thread_id, run_id=run_id)
+        return await self._feedback_result(thread_id, run_id)
+
+    async def stream_feedback(
+        self,
+        feedback: str,
+        thread_id: str,
+        user_id: str,
+        is_first_message: bool = False,
+        review_data: Optional[Dict[str, Any]] = None,
+        repo_settings: Optional[Dict[str, Any]] = None,
+        llm_model: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of handle_feedback. Yields ('run', run_id) once the run exists,
+        ('token', text) for LLM tokens and ('node', name) as graph nodes finish, then
+        ('done', <handle_feedback result>). The run keeps going if the stream is dropped;
+        finish_feedback() collects it.
+        """
+        if not self.feedback_agent:
+            await self.initialize()
+        github_token = await self._get_user_github_token(user_id)
+        input_data = self._feedback_input(
+            feedback, thread_id, user_id, github_token, is_first_message, review_data, repo_settings
+        )
+
+        async with self._feedback_slot(repo_settings, llm_model) as llm_slot:
+            run_id = None
+            async for part in self.client.runs.stream(
+                thread_id,
+                self.feedback_agent['assistant_id'],
+                input=input_data,
+                config={"recursion_limit": 99999999},
+                stream_mode=["messages-tuple", "updates"],
+                on_disconnect="continue",
+            ):
+                if part.event == 'metadata':
+                    run_id = (part.data or {}).get('run_id')
+                    if run_id:
+                        yield 'run', run_id
+                elif part.event == 'error':
+                    raise Exception(f"LangGraph run {run_id} failed: {part.data}")
+                elif part.event == 'messages':
+                    # [message chunk, metadata]
+                    chunk = part.data[0] if isinstance(part.data, (list, tuple)) and part.data else part.data
+                    text = _chunk_text(chunk)
+                    if text:
+                        yield 'token', text
+                elif part.event == 'updates' and isinstance(part.data, dict):
+                    for node in part.data:
+                        yield 'node', node
+
+            result = await self._feedback_result(thread_id, run_id)
+            llm_slot.record_usage(result['token_usage'])
+        yield 'done', result
@@ -0,0 +1,276 @@
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional
+
+from django.conf import settings
+
+from ..redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'llm-limit'
+MODELS_KEY = f'{KEY_PREFIX}:models'
+TOKEN_WINDOW = 60 # seconds, tokens-per-minute window
+
+class LLMRateLimitTimeout(Exception):
+    """Raised when a run waited longer than LLM_LIMIT_MAX_WAIT for a slot."""
+
+# KEYS: queue (zset ticket -> enqueued at), seen (hash ticket -> last poll),
+#       inflight (zset ticket -> lease expiry), tokens (zset "ticket|tokens" -> reserved at)
+# ARGV: ticket, max_in_flight, tokens_per_minute, estimated_tokens, lease_seconds, stale_after
+# Returns {1, 0, 0} when the slot is granted, else {0, position in queue, seconds until tokens free up}
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local ticket = ARGV[1]
+local max_in_flight = tonumber(ARGV[2])
+local tpm = tonumber(ARGV[3])
+local estimate = tonumber(ARGV[4])
+local lease = tonumber(ARGV[5])
+local stale_after = tonumber(ARGV[6])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now - 60)
+
+-- Waiters that stopped polling (crashed worker) must not block the head of the queue
+local head = redis.call('ZRANGE', KEYS[1], 0, 9)
+for _, waiter in ipairs(head) do
+    local seen = tonumber(redis.call('HGET', KEYS[2], waiter) or '0')
+    if waiter ~= ticket and seen < now - stale_after then
+        redis.call('ZREM', KEYS[1], waiter)
+        redis.call('HDEL', KEYS[2], waiter)
+    end
+end
+
+if not redis.call('ZSCORE', KEYS[1], ticket) then
+    redis.call('ZADD', KEYS[1], now, ticket)
+end
+redis.call('HSET', KEYS[2], ticket, now)
+local position = redis.call('ZRANK', KEYS[1], ticket)
+
+local used = 0
+for _, entry in ipairs(redis.call('ZRANGE', KEYS[4], 0, -1)) do
+    used = used + tonumber(string.match(entry, '|(%d+)$') or '0')
+end
+local token_wait = 0
+if tpm > 0 and used > 0 and used + estimate > tpm then
+    local oldest = redis.call('ZRANGE', KEYS[4], 0, 0, 'WITHSCORES')
+    token_wait = tonumber(oldest[2]) + 60 - now
+end
+
+if position == 0 and redis.call('ZCARD', KEYS[3]) < max_in_flight and token_wait <= 0 then
+    redis.call('ZREM', KEYS[1], ticket)
+    redis.call('HDEL', KEYS[2], ticket)
+    redis.call('ZADD', KEYS[3], now + lease, ticket)
+    if estimate > 0 then
+        redis.call('ZADD', KEYS[4], now, ticket .. '|' .. estimate)
+    end
+    return {1, 0, 0}
+end
+return {0, position, tostring(token_wait)}
+"""
+
+# KEYS: inflight, tokens  ARGV: ticket, actual tokens (-1 to keep the estimate)
+_RELEASE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+local actual = tonumber(ARGV[2])
+if actual >= 0 then
+    local prefix = ARGV[1] .. '|'
+    for _, entry in ipairs(redis.call('ZRANGE', KEYS[2], 0, -1)) do
+        if string.sub(entry, 1, string.len(prefix)) == prefix then
+            local reserved_at = redis.call('ZSCORE', KEYS[2], entry)
+            redis.call('ZREM', KEYS[2], entry)
+            if actual > 0 then
+                redis.call('ZADD', KEYS[2], reserved_at, prefix .. actual)
+            end
+        end
+    end
+end
+return 1
+"""
+
+def _model_key(model: str) -> str:
+    return (model or 'default').lower()
+
+def _keys(model_key: str):
+    base = f'{KEY_PREFIX}:{model_key}'
+    return [f'{base}:queue', f'{base}:seen', f'{base}:inflight', f'{base}:tokens']
+
+class ModelSlot:
+    """A granted run slot. Set `tokens` to the actual usage before release to correct the estimate."""
+    def __init__(self, model_key: str, ticket: Optional[str], waited: float = 0.0):
+        self.model_key = model_key
+        self.ticket = ticket
+        self.waited = waited
+        self.tokens: Optional[int] = None
+
+    def record_usage(self, token_usage: Optional[Dict[str, int]]) -> None:
+        """Use the run's reported usage for the token budget; unknown usage keeps the estimate."""
+        total = (token_usage or {}).get('total_tokens')
+        if total:
+            self.tokens = total
+
+class LLMConcurrencyLimiter:
+    """
+    Redis-backed limiter for LangGraph runs, keyed by LLM model. Enforces a maximum
+    number of in-flight runs and an estimated tokens-per-minute budget per model across
+    all processes. Waiting runs queue in arrival order; only the head of the queue may
+    take a slot, so a big burst can't starve earlier callers.
+
+    Slots are leases that are renewed while the run is alive, so a crashed worker frees
+    its slot once the lease runs out. If Redis is unavailable runs are not limited.
+    """
+    def __init__(self, limits: Dict[str, Dict[str, Any]], lease_seconds=120, poll_interval=1.0, max_wait=1800.0):
+        self.limits = {key.lower(): value for key, value in limits.items()}
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+
+    def limits_for(self, model: str) -> Dict[str, Any]:
+        model_key = _model_key(model)
+        for key, value in self.limits.items():
+            if key != 'default' and key in model_key:
+                return value
+        return self.limits.get('default', {})
+
+    async def acquire(self, model: str, estimated_tokens: int = 0, max_wait: Optional[float] = None) -> ModelSlot:
+        """
+        Wait for a slot for `model`; raises LLMRateLimitTimeout after max_wait seconds
+        (LLM_LIMIT_MAX_WAIT unless given; request threads pass a short one).
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        model_key = _model_key(model)
+        limits = self.limits_for(model)
+        max_in_flight = limits.get('max_in_flight') or 0
+        if max_in_flight <= 0:
+            return ModelSlot(model_key, None)
+
+        ticket = uuid.uuid4().hex
+        started = time.monotonic()
+        try:
+            client = get_async_redis()
+            script = client.register_script(_ACQUIRE_SCRIPT)
+            await client.sadd(MODELS_KEY, model_key)
+        except Exception as e:
+            logger.warning(f"LLM limiter unavailable, not limiting {model_key}: {str(e)}")
+            return ModelSlot(model_key, None)
+
+        stale_after = max(10 * self.poll_interval, 30)
+        logged = False
+        while True:
+            try:
+                granted, position, token_wait = await script(
+                    keys=_keys(model_key),
+                    args=[ticket, max_in_flight, limits.get('tokens_per_minute') or 0,
+                          min(estimated_tokens, limits.get('tokens_per_minute') or estimated_tokens),
+                          self.lease_seconds, stale_after],
+                )
+            except Exception as e:
+                logger.warning(f"LLM limiter unavailable, not limiting {model_key}: {str(e)}")
+                return ModelSlot(model_key, None)
+            waited = time.monotonic() - started
+            if int(granted) == 1:
+                if waited >= 1:
+                    logger.info(f"LLM run for {model_key} got a slot after {waited:.1f}s")
+                return ModelSlot(model_key, ticket, waited)
+            if waited > max_wait:
+                await self._leave_queue(client, model_key, ticket)
+                raise LLMRateLimitTimeout(f"No {model_key} slot after {waited:.0f}s (position {position} in queue)")
+            if not logged:
+                logger.info(f"LLM run for {model_key} queued at position {position}")
+                logged = True
+            try:
+                sleep_for = min(max(float(token_wait), self.poll_interval), 5 * self.poll_interval)
+                await asyncio.sleep(max(min(sleep_for, max_wait - waited), 0.01))
+            except asyncio.CancelledError:
+                await self._leave_queue(client, model_key, ticket)
+                raise
+
+    async def _leave_queue(self, client, model_key: str, ticket: str) -> None:
+        queue_key, seen_key, _, _ = _keys(model_key)
+        try:
+            await client.zrem(queue_key, ticket)
+            await client.hdel(seen_key, ticket)
+        except Exception:
+            pass # stale waiters are pruned by the next acquire
+
+    async def _renew(self, slot: ModelSlot) -> None:
+        _, _, inflight_key, _ = _keys(slot.model_key)
+        client = get_async_redis()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                expires = (await client.time())[0] + self.lease_seconds
+                await client.zadd(inflight_key, {slot.ticket: expires}, xx=True)
+            except Exception as e:
+                logger.warning(f"Could not renew {slot.model_key} LLM slot: {str(e)}")
+
+    async def release(self, slot: ModelSlot) -> None:
+        if not slot.ticket:
+            return
+        _, _, inflight_key, tokens_key = _keys(slot.model_key)
+        try:
+            client = get_async_redis()
+            await client.register_script(_RELEASE_SCRIPT)(
+                keys=[inflight_key, tokens_key],
+                args=[slot.ticket, slot.tokens if slot.tokens is not None else -1],
+            )
+        except Exception as e:
+            # The lease expires on its own
+            logger.warning(f"Could not release {slot.model_key} LLM slot: {str(e)}")
+
+    @contextlib.asynccontextmanager
+    async def slot(self, model: str, estimated_tokens: int = 0, max_wait: Optional[float] = None) -> AsyncIterator[ModelSlot]:
+        """`async with limiter.slot(model, estimate) as slot:` around one LangGraph run."""
+        slot = await self.acquire(model, estimated_tokens, max_wait)
+        renewer = asyncio.ensure_future(self._renew(slot)) if slot.ticket else None
+        try:
+            yield slot
+        finally:
+            if renewer:
+                renewer.cancel()
+            await self.release(slot)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, in-flight runs and tokens used in the last minute per model."""
+        try:
+            client = get_redis()
+            now = float(client.time()[0])
+            result = {}
+            for raw_key in sorted(client.smembers(MODELS_KEY)):
+                model_key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+                queue_key, _, inflight_key, tokens_key = _keys(model_key)
+                token_entries = client.zrangebyscore(tokens_key, now - TOKEN_WINDOW, '+inf')
+                limits = self.limits_for(model_key)
+                result[model_key] = {
+                    'waiting': client.zcard(queue_key),
+                    'in_flight': client.zcount(inflight_key, now, '+inf'),
+                    'tokens_last_minute': sum(int(entry.rsplit(b'|', 1)[-1]) for entry in token_entries),
+                    'max_in_flight': limits.get('max_in_flight'),
+                    'tokens_per_minute': limits.get('tokens_per_minute'),
+                }
+            return result
+        except Exception as e:
+            logger.warning(f"Could not read LLM limiter state: {str(e)}")
+            return {}
+
+_limiter: Optional[LLMConcurrencyLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_llm_limiter() -> LLMConcurrencyLimiter:
+    """Return the process-wide LLM run limiter."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = LLMConcurrencyLimiter(
+                    limits=getattr(settings, 'LLM_MODEL_LIMITS', {}) if getattr(settings, 'LLM_LIMITER_ENABLED', True) else {},
+                    lease_seconds=getattr(settings, 'LLM_LIMIT_LEASE_SECONDS', 120),
+                    poll_interval=getattr(settings, 'LLM_LIMIT_POLL_INTERVAL', 1.0),
+                    max_wait=getattr(settings, 'LLM_LIMIT_MAX_WAIT', 1800.0),
+                )
+    return _limiter
@@ -0,0 +1,169 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+
+from .client import LangGraphClient
+
+logger = logging.getLogger(__name__)
+
+class LangGraphRuntime:
+    """
+    Process-scoped home for LangGraph work from sync code (Celery tasks, sync views).
+
+    Owns one event loop running in a background thread and one LangGraphClient whose
+    HTTP connections and assistant descriptors live as long as the process. Assistants
+    are re-fetched every LANGGRAPH_RUNTIME_REFRESH_SECONDS, or sooner after a failure;
+    a failed refresh keeps the last good descriptors.
+    """
+    def __init__(self, refresh_interval: float = 300, run_timeout: Optional[float] = None):
+        self.refresh_interval = refresh_interval
+        self.run_timeout = run_timeout
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='langgraph-runtime', daemon=True)
+        self._thread.start()
+        self.client = LangGraphClient()
+        self._refreshed_at = 0.0
+        self._stale = True
+        self._refresh_lock = None # asyncio.Lock, created on the runtime loop
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the runtime loop from sync code and return its result. Raises
+        TimeoutError after `timeout` (default LANGGRAPH_RUN_TIMEOUT) seconds.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout if timeout is not None else self.run_timeout)
+        except BaseException:
+            # Timed out or interrupted (e.g. a Celery soft time limit): stop the coroutine too
+            future.cancel()
+            raise
+
+    def warm_up(self) -> concurrent.futures.Future:
+        """Load the assistants in the background; the caller doesn't wait for LangGraph."""
+        future = asyncio.run_coroutine_threadsafe(self.ensure_ready(), self.loop)
+
+        def _log_failure(done):
+            if not done.cancelled() and done.exception() is not None:
+                logger.error(f"Could not warm up LangGraph runtime in process {os.getpid()}: {str(done.exception())}")
+        future.add_done_callback(_log_failure)
+        return future
+
+    def _needs_refresh(self) -> bool:
+        return (
+            self._stale
+            or not self.client.review_agent
+            or not self.client.feedback_agent
+            or time.monotonic() - self._refreshed_at > self.refresh_interval
+        )
+
+    async def ensure_ready(self) -> LangGraphClient:
+        if self._needs_refresh():
+            if self._refresh_lock is None:
+                self._refresh_lock = asyncio.Lock()
+            async with self._refresh_lock:
+                if self._needs_refresh():
+                    await self._refresh()
+        return self.client
+
+    async def _refresh(self) -> None:
+        healthy = await self.client.initialize()
+        if healthy:
+            self._refreshed_at = time.monotonic()
+            self._stale = False
+        else:
+            logger.warning("LangGraph runtime refresh failed; keeping the previous assistant descriptors.")
+
+    def get_client(self) -> LangGraphClient:
+        """The process-wide client with assistants loaded (refreshed if due)."""
+        return self.run(self.ensure_ready())
+
+    def mark_stale(self) -> None:
+        """Force a health-checked refresh before the next use (e.g. after a failed run)."""
+        self._stale = True
+
+    async def _cancel_pending(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        if self.loop.is_running():
+            # Let cancelled or still-running calls unwind before the loop goes away
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_pending(), self.loop).result(5)
+            except Exception as e:
+                logger.warning(f"LangGraph runtime shut down with calls still pending: {str(e)}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+        if not self.loop.is_closed():
+            self.loop.close()
+
+_runtime: Optional[LangGraphRuntime] = None
+_runtime_pid: Optional[int] = None
+_runtime_lock = threading.Lock()
+
+def get_langgraph_runtime() -> LangGraphRuntime:
+    """
+    Return this process's runtime, creating it on first use. A runtime inherited
+    through fork() has no loop thread, so a new one is built per PID.
+    """
+    global _runtime, _runtime_pid
+    pid = os.getpid()
+    if _runtime is None or _runtime_pid != pid:
+        with _runtime_lock:
+            if _runtime is None or _runtime_pid != pid:
+                _runtime = LangGraphRuntime(
+                    refresh_interval=getattr(settings, 'LANGGRAPH_RUNTIME_REFRESH_SECONDS', 300),
+                    run_timeout=getattr(settings, 'LANGGRAPH_RUN_TIMEOUT', 3600),
+                )
+                _runtime_pid = pid
+    return _runtime
+
+def close_langgraph_runtime() -> None:
+    global _runtime, _runtime_pid
+    with _runtime_lock:
+        if _runtime is not None and _runtime_pid == os.getpid():
+            _runtime.close()
+        _runtime, _runtime_pid = None, None
+
+# Async views (ASGI) can't use the runtime loop for streaming, so they get a client bound to their own loop
+_loop_clients: Dict[asyncio.AbstractEventLoop, Tuple[LangGraphClient, float]] = {}
+
+async def aget_langgraph_client() -> LangGraphClient:
+    """LangGraphClient for the running event loop, with assistants loaded and refreshed like the runtime's."""
+    loop = asyncio.get_running_loop()
+    for stale_loop in [l for l in _loop_clients if l.is_closed()]:
+        _loop_clients.pop(stale_loop, None)
+    client, refreshed_at = _loop_clients.get(loop) or (LangGraphClient(), 0.0)
+    refresh_interval = getattr(settings, 'LANGGRAPH_RUNTIME_REFRESH_SECONDS', 300)
+    if not client.feedback_agent or not client.review_agent or time.monotonic() - refreshed_at > refresh_interval:
+        if await client.initialize():
+            refreshed_at = time.monotonic()
+    _loop_clients[loop] = (client, refreshed_at)
+    return client
+
+@worker_process_init.connect
+def _init_worker_runtime(**kwargs):
+    # Warm up once per worker process so the first task doesn't pay for it. Not waited on:
+    # Celery kills a child that takes longer than worker_proc_alive_timeout (4s) to init.
+    try:
+        get_langgraph_runtime().warm_up()
+    except Exception as e:
+        logger.error(f"Could not warm up LangGraph runtime in worker {os.getpid()}: {str(e)}")
+
+@worker_process_shutdown.connect
+def _close_worker_runtime(**kwargs):
+    close_langgraph_runtime()
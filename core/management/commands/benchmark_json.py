@@ -0,0 +1,133 @@
+import datetime
+import decimal
+import gc
+import time
+import tracemalloc
+import uuid
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Review
+from core.query_plans import with_review_plan
+from core.renderers import FastJSONParser, FastJSONRenderer, orjson
+from core.serializers import ReviewSerializer
+
+def _finding(i):
+    return {
+        'file': f'src/module_{i % 40}/handler_{i}.py',
+        'line': 10 + i,
+        'severity': ('critical', 'major', 'minor', 'info')[i % 4],
+        'category': ('security', 'performance', 'style', 'correctness')[i % 4],
+        'message': 'Possible unbounded query inside a loop; consider prefetching the relation. ' * 2,
+        'suggestion': 'for item in items.select_related("owner"):\n    process(item.owner)\n' * 3,
+        'explanation': 'Each iteration issues a separate SELECT, which grows linearly with the page size. ' * 3,
+    }
+
+def _comment(i, findings):
+    return {
+        'id': i,
+        'user': {'id': 1, 'username': 'ai_assistant', 'email': 'ai@example.com', 'is_admin': False,
+                 'github_id': '0', 'created_at': '2025-01-01T00:00:00Z', 'updated_at': '2025-01-01T00:00:00Z'},
+        'comment': 'Thanks, I re-checked the handler and updated the finding. ' * 4,
+        'type': 'response' if i % 2 else 'request',
+        'comment_data': {
+            'messages': [['human', 'Why is this flagged?'], ['ai', 'The loop performs a query per item. ' * 10]] * 3,
+            'original_review': {'reviews': findings[:20]},
+            'updated_review': {'reviews': findings[:20]},
+            'feedback_status': 'accepted',
+        },
+        'created_at': '2025-01-01T00:00:00Z',
+    }
+
+def synthetic_review(i, findings_per_review):
+    """Shaped like ReviewSerializer output, plus the raw types DRF's encoder has to handle."""
+    findings = [_finding(n) for n in range(findings_per_review)]
+    now = datetime.datetime(2025, 1, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+    return {
+        'id': i,
+        'repository': {'id': 1, 'repo_name': 'acme/api', 'repo_url': 'https://github.com/acme/api',
+                       'coding_standards': ['pep8', 'no-n-plus-one'], 'code_metrics': ['complexity']},
+        'pull_request': {'id': i, 'pr_number': i, 'title': f'Refactor handlers #{i}', 'body': 'Body text. ' * 50,
+                         'status': 'open', 'head_sha': uuid.uuid4().hex},
+        'status': 'completed',
+        'review_data': {
+            'reviews': findings,
+            'fixes': findings[: findings_per_review // 2],
+            'metrics': {'complexity': {f'handler_{n}': n % 17 for n in range(100)}},
+            'standards': ['pep8', 'no-n-plus-one'],
+            'llm_model': 'gpt-4o',
+        },
+        'threads': [{'id': t, 'title': f'Thread {t}', 'comments': [_comment(c, findings) for c in range(4)]} for t in range(3)],
+        'usage': {'cost': decimal.Decimal('0.012345'), 'run_id': uuid.uuid4(), 'duration': datetime.timedelta(seconds=42.5)},
+        'created_at': now,
+        'updated_at': now,
+    }
+
+class Command(BaseCommand):
+    help = "Compare encode/decode time and memory of the stdlib and orjson DRF renderer/parser on review payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reviews', type=int, default=50, help='Reviews per payload (a history/list response).')
+        parser.add_argument('--findings', type=int, default=60, help='Findings per synthetic review_data.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--from-db', action='store_true', help='Serialize the latest reviews from the database instead of synthetic ones.')
+
+    def handle(self, *args, **options):
+        if options['from_db']:
+            reviews = with_review_plan(Review.objects.order_by('-id'))[:options['reviews']]
+            payload = ReviewSerializer(reviews, many=True).data
+        else:
+            payload = [synthetic_review(i, options['findings']) for i in range(options['reviews'])]
+        if not payload:
+            self.stdout.write("No reviews to benchmark.")
+            return
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; FastJSONRenderer falls back to the stdlib."))
+
+        iterations = options['iterations']
+        results = {}
+        for label, renderer, parser in (
+            ('stdlib', JSONRenderer(), JSONParser()),
+            ('orjson', FastJSONRenderer(), FastJSONParser()),
+        ):
+            body = renderer.render(payload)
+            encode_s = self._time(lambda: renderer.render(payload), iterations)
+            decode_s = self._time(lambda: parser.parse(BytesIO(body), parser_context={'encoding': 'utf-8'}), iterations)
+            encode_peak = self._peak(lambda: renderer.render(payload))
+            decode_peak = self._peak(lambda: parser.parse(BytesIO(body), parser_context={'encoding': 'utf-8'}))
+            results[label] = (len(body), encode_s, decode_s, encode_peak, decode_peak)
+
+        self.stdout.write(f"{len(payload)} reviews, {results['stdlib'][0] / 1024:.0f} KiB per response, {iterations} iterations\n")
+        self.stdout.write(f"{'':8}{'size KiB':>10}{'encode ms':>11}{'decode ms':>11}{'enc peak KiB':>14}{'dec peak KiB':>14}")
+        for label, (size, encode_s, decode_s, encode_peak, decode_peak) in results.items():
+            self.stdout.write(
+                f"{label:8}{size / 1024:>10.0f}{encode_s * 1000:>11.2f}{decode_s * 1000:>11.2f}"
+                f"{encode_peak / 1024:>14.0f}{decode_peak / 1024:>14.0f}"
+            )
+        stdlib, fast = results['stdlib'], results['orjson']
+        self.stdout.write(self.style.SUCCESS(
+            f"encode {stdlib[1] / fast[1]:.1f}x faster, decode {stdlib[2] / fast[2]:.1f}x faster, "
+            f"encode peak memory {stdlib[3] / max(fast[3], 1):.1f}x lower"
+        ))
+
+    def _time(self, func, iterations):
+        """Median wall time of one call."""
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return sorted(timings)[len(timings) // 2]
+
+    def _peak(self, func):
+        """Peak traced allocation of one call, in bytes."""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_thread_created_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pullrequest',
+            name='reviewers_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PullRequestReviewer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('github_id', models.CharField(max_length=255)),
+                ('login', models.CharField(max_length=255)),
+                ('pull_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='requested_reviewers', to='core.pullrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pull_request', 'login'], name='core_pullre_pull_re_1d726a_idx')],
+                'unique_together': {('pull_request', 'github_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_pullrequest_reviewers'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='repository',
+            name='repo_name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_repository_repo_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='diff_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_review_diff_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='head_sha',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_review_head_sha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmusage',
+            name='run_id',
+            field=models.CharField(blank=True, db_index=True, help_text='LangGraph run the usage belongs to', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='llmusage',
+            name='usage_pending',
+            field=models.BooleanField(default=False, help_text='Token counts not known yet; backfilled from LangSmith'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_llmusage_run_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='progress',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0012_review_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'created_at', 'id'], name='core_commen_thread__a82dbd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repocollaborator',
+            index=models.Index(fields=['repository', 'created_at', 'id'], name='core_repoco_reposit_6d2d3f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['created_at', 'id'], name='core_review_created_d6efeb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['repository', 'created_at', 'id'], name='core_review_reposit_5244b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['pull_request', 'created_at', 'id'], name='core_review_pull_re_716658_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['commit', 'created_at', 'id'], name='core_review_commit__318ff4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['created_at', 'id'], name='core_thread_created_640af1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['review', 'created_at', 'id'], name='core_thread_review__4d9e1b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='thread',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='core_thread_created_039bee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'id'], name='core_user_created_52ebc5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookeventlog',
+            index=models.Index(fields=['repository', 'created_at', 'id'], name='core_webhoo_reposit_6a541e_idx'),
+        ),
+    ]
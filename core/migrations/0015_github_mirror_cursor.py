@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_github_mirror'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='mirror_cursor',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
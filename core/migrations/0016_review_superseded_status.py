@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_github_mirror_cursor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('failed', 'Failed'), ('superseded', 'Superseded'), ('processing', 'Processing'), ('pending_analysis', 'Pending Analysis')], default='pending', max_length=20),
+        ),
+    ]
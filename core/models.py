@@ -52,13 +52,18 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampMixin):
     USERNAME_FIELD = 'username' # Or 'github_id' if preferred for login
     REQUIRED_FIELDS = ['github_id'] # Fields prompted for when creating superuser, besides USERNAME_FIELD and password
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']), # Keyset pagination, see core/pagination.py
+        ]
+
     def __str__(self):
         return self.username
 
 class Repository(TimestampMixin):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='repositories', on_delete=models.CASCADE)
     github_native_id = models.IntegerField(unique=True, null=True, blank=True, db_index=True) # From Alembic: github_native_id
-    repo_name = models.CharField(max_length=255) # FastAPI: repo_name
+    repo_name = models.CharField(max_length=255, db_index=True) # FastAPI: repo_name; "owner/name", looked up on every webhook
     repo_url = models.CharField(max_length=255) # FastAPI: repo_url, ensure this is the HTML URL
     description = models.TextField(null=True, blank=True) # FastAPI: description
     coding_standards = models.JSONField(null=True, blank=True) # FastAPI: coding_standards (List[str])
@@ -67,6 +72,11 @@ class Repository(TimestampMixin):
     webhook_url = models.CharField(max_length=255, null=True, blank=True) # FastAPI: webhook_url
     webhook_secret = models.CharField(max_length=255, null=True, blank=True) # For verifying incoming webhooks
     webhook_last_event_at = models.DateTimeField(null=True, blank=True) # FastAPI: webhook_last_event_at
+    # Local mirror of GitHub PRs/commits, see core/github_mirror.py
+    pulls_synced_until = models.DateTimeField(null=True, blank=True) # Newest PR updated_at mirrored; next sync stops there
+    commits_synced_until = models.DateTimeField(null=True, blank=True) # Newest commit date mirrored; sent as `since`
+    mirror_synced_at = models.DateTimeField(null=True, blank=True) # Last completed sync, served as the freshness hint
+    mirror_cursor = models.JSONField(default=dict, blank=True) # {'pulls'|'commits': {'page', 'until'}} while a walk is cut short by GITHUB_MIRROR_MAX_PAGES
 
     class Meta:
         unique_together = ('owner', 'repo_name') # Alembic: UniqueConstraint('owner_id', 'repo_name')
@@ -90,6 +100,9 @@ class RepoCollaborator(TimestampMixin):
 
     class Meta:
         unique_together = ('repository', 'user') # Alembic: UniqueConstraint('repo_id', 'user_id')
+        indexes = [
+            models.Index(fields=['repository', 'created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.repository.repo_name} ({self.role})"
@@ -110,10 +123,38 @@ class PullRequest(TimestampMixin):
     body = models.TextField(null=True, blank=True)
     head_sha = models.CharField(max_length=255, null=True, blank=True)
     base_sha = models.CharField(max_length=255, null=True, blank=True)
+    reviewers_synced_at = models.DateTimeField(null=True, blank=True) # Last time requested_reviewers was refreshed from GitHub/webhooks
+    # GitHub-side details, filled by the mirror sync and webhooks
+    user_login = models.CharField(max_length=255, null=True, blank=True)
+    user_avatar_url = models.URLField(max_length=500, null=True, blank=True)
+    created_at_gh = models.DateTimeField(null=True, blank=True)
+    updated_at_gh = models.DateTimeField(null=True, blank=True)
+    closed_at_gh = models.DateTimeField(null=True, blank=True)
+    merged_at_gh = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['repository', 'pr_number']), # PR list, newest number first
+        ]
 
     def __str__(self):
         return f"PR #{self.pr_number}: {self.title}"
 
+class PullRequestReviewer(TimestampMixin):
+    """Local copy of a PR's requested reviewers, kept in sync from pull_request webhooks."""
+    pull_request = models.ForeignKey(PullRequest, related_name='requested_reviewers', on_delete=models.CASCADE)
+    github_id = models.CharField(max_length=255)
+    login = models.CharField(max_length=255)
+
+    class Meta:
+        unique_together = ('pull_request', 'github_id')
+        indexes = [
+            models.Index(fields=['pull_request', 'login']),
+        ]
+
+    def __str__(self):
+        return f"{self.login} requested on PR {self.pull_request_id}"
+
 class Commit(TimestampMixin):
     repository = models.ForeignKey(Repository, related_name='commits', on_delete=models.CASCADE)
     commit_hash = models.CharField(max_length=255) # Alembic: commit_sha
@@ -122,9 +163,18 @@ class Commit(TimestampMixin):
     message = models.TextField() # Alembic: commit_message (was String(255))
     url = models.CharField(max_length=255, null=True, blank=True) # Added from webhook logic
     timestamp = models.DateTimeField(null=True, blank=True) # Added from webhook logic
+    # Git author/committer details, filled by the mirror sync and push webhooks
+    author_name = models.CharField(max_length=255, null=True, blank=True)
+    author_email = models.CharField(max_length=255, null=True, blank=True)
+    committer_name = models.CharField(max_length=255, null=True, blank=True)
+    committer_email = models.CharField(max_length=255, null=True, blank=True)
+    committed_date = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('repository', 'commit_hash')
+        indexes = [
+            models.Index(fields=['repository', 'timestamp']), # Commit list, newest first
+        ]
 
     def __str__(self):
         return self.commit_hash[:12]
@@ -135,6 +185,7 @@ class Review(TimestampMixin):
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        ('superseded', 'Superseded'), # A newer push of the PR started its own review
         ('processing', 'Processing'), # Added from webhook logic
         ('pending_analysis', 'Pending Analysis') # Added from webhook logic
     ]
@@ -145,6 +196,9 @@ class Review(TimestampMixin):
     status = models.CharField(max_length=20, choices=REVIEW_STATUS_CHOICES, default='pending')
     review_data = models.JSONField(null=True, blank=True)
     error_message = models.TextField(null=True, blank=True) # New field for storing error messages
+    diff_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True) # sha256 of normalized diff + review settings, see core/review_cache.py
+    head_sha = models.CharField(max_length=255, null=True, blank=True) # PR head the review was run against, base for incremental re-reviews
+    progress = models.JSONField(null=True, blank=True) # Live checkpoint of a streaming run (current node, partial findings), see core/review_progress.py
     # user = models.ForeignKey(User, related_name='reviews', on_delete=models.CASCADE) # Consider who owns/requested the review
 
     class Meta:
@@ -154,6 +208,13 @@ class Review(TimestampMixin):
                 name='check_review_context' # Alembic: check_review_context
             )
         ]
+        # (filter, created_at, id) for keyset pagination of review lists and history
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['repository', 'created_at', 'id']),
+            models.Index(fields=['pull_request', 'created_at', 'id']),
+            models.Index(fields=['commit', 'created_at', 'id']),
+        ]
 
     def __str__(self):
         if self.pull_request:
@@ -173,6 +234,13 @@ class Thread(TimestampMixin):
     updated_at = models.DateTimeField(auto_now=True) # To track overall thread activity
     last_comment_at = models.DateTimeField(null=True, blank=True) # New field for signal
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['review', 'created_at', 'id']),
+            models.Index(fields=['created_by', 'created_at', 'id']), # my-threads
+        ]
+
     def __str__(self):
         return f"Thread for Review {self.review.id} - {self.thread_id}"
 
@@ -189,6 +257,11 @@ class Comment(TimestampMixin):
     type = models.CharField(max_length=50, choices=COMMENT_TYPE_CHOICES) # Alembic: comment_type_enum
     parent_comment = models.ForeignKey('self', related_name='replies', null=True, blank=True, on_delete=models.SET_NULL)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['thread', 'created_at', 'id']), # Comments are read per thread in posting order
+        ]
+
     def __str__(self):
         return f"Comment by {self.user.username} on Thread {self.thread.id}"
 
@@ -199,6 +272,8 @@ class LLMUsage(TimestampMixin):
     input_tokens = models.IntegerField()
     output_tokens = models.IntegerField()
     cost = models.FloatField()
+    run_id = models.CharField(max_length=255, null=True, blank=True, db_index=True, help_text="LangGraph run the usage belongs to")
+    usage_pending = models.BooleanField(default=False, help_text="Token counts not known yet; backfilled from LangSmith")
 
     def __str__(self):
         return f"LLM Usage by {self.user.username} for Review {self.review.id if self.review else 'N/A'}"
@@ -226,6 +301,11 @@ class WebhookEventLog(TimestampMixin):
     error_message = models.TextField(null=True, blank=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['repository', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         repo_name = self.repository.repo_name if self.repository else "Unknown"
         return f"Event {self.event_id} ({self.event_type}) - {repo_name} - {self.status}"
@@ -0,0 +1,120 @@
+import base64
+from collections import OrderedDict
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class CreatedAtCursorPagination(BasePagination):
+    """
+    Keyset pagination on (created_at, id), newest first. The cursor carries the
+    (created_at, id) of the last row seen, so every page is one index range scan of
+    page_size + 1 rows whatever its depth. Ties on created_at are broken by id, so rows
+    are never skipped or repeated. Needs an index on (created_at, id), or on
+    (<filter column>, created_at, id) for filtered lists.
+
+    Response: {"next": url|null, "previous": url|null, "results": [...]}
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    timestamp_field = 'created_at'
+
+    def __init__(self):
+        self.page_size = api_settings.PAGE_SIZE or 50
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        field = self.timestamp_field
+        # Forward pages walk to older rows; "previous" walks back to newer ones in reverse
+        ordering = (field, 'id') if reverse else (f'-{field}', '-id')
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            timestamp, pk = position
+            if reverse:
+                # The leading range condition is what lets the index seek straight to the cursor
+                queryset = queryset.filter(Q(**{f'{field}__gte': timestamp}), Q(**{f'{field}__gt': timestamp}) | Q(id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__lte': timestamp}), Q(**{f'{field}__lt': timestamp}) | Q(id__lt=pk))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(requested, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        """((created_at, id) or None, reverse) from the cursor query parameter."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            querystring = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            timestamp = parse_datetime(tokens['t'][0])
+            pk = int(tokens['i'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Invalid cursor')
+        if timestamp is None:
+            raise NotFound('Invalid cursor')
+        return (timestamp, pk), reverse
+
+    def encode_cursor(self, row, reverse):
+        tokens = {'t': getattr(row, self.timestamp_field).isoformat(), 'i': row.pk}
+        if reverse:
+            tokens['r'] = '1'
+        encoded = base64.urlsafe_b64encode(parse.urlencode(tokens, doseq=True).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Past the end of a reverse walk: back to the first page
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
 from .models import (
@@ -5,14 +6,32 @@ from .models import (
     Thread as ThreadModel,
 )
 
+from .reviewer_index import (
+    reviewers_are_fresh,
+    is_requested_reviewer,
+    sync_requested_reviewers,
+)
 from .services import (
-    get_repo_collaborators_from_github,
-    get_single_pull_request_from_github,
+    iter_repo_collaborators_from_github,
+    get_github_batch_loader,
 )
+from .redis_client import get_redis
 import logging
 # Create a logger instance
 logger = logging.getLogger(__name__)
 
+def _repo_access_cache_key(repository_id, user_id):
+    return f"repo-access:{repository_id}:{user_id}"
+
+# Membership answers live in the shared Redis rather than django.core.cache: revocations
+# come from webhook tasks and signals in other processes and must reach every web worker
+def invalidate_repository_access(repository_id, user_id):
+    """Drop the shared membership entry for one user on one repository."""
+    try:
+        get_redis().delete(_repo_access_cache_key(repository_id, user_id))
+    except Exception as e:
+        logger.warning(f"Could not invalidate repository access cache: {e}")
+
 class IsRepositoryOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.owner == request.user
@@ -30,6 +49,10 @@ class IsAssignedReviewerForThread(BasePermission):
         if not pr:
             return False
 
+        # Local reviewer index, filled from pull_request webhooks
+        if reviewers_are_fresh(pr):
+            return is_requested_reviewer(pr, request.user)
+
         # Ensure the user has a GitHub token
         token = getattr(request.user, "github_access_token", None)
         if not token:
@@ -40,16 +63,14 @@ class IsAssignedReviewerForThread(BasePermission):
             owner_login = pr.repository.owner.username
             repo_name = pr.repository.repo_name.split("/", 1)[1]
 
-            # Fetch the PR from GitHub to inspect requested reviewers
-            gh_pr_data = get_single_pull_request_from_github(
-                github_token=token,
-                owner_login=owner_login,
-                repo_name=repo_name,
-                pr_number=pr.pr_number
-            )
+            # Nothing fresh locally: fetch the requested reviewers via the request-scoped GraphQL batch loader
+            gh_pr_data = get_github_batch_loader(token, scope=request).load_pull_request(
+                owner_login, repo_name, pr.pr_number
+            ).result() or {}
+            reviewers = gh_pr_data.get("requested_reviewers", [])
+            sync_requested_reviewers(pr, reviewers)
 
             # Check if the current user is in the requested reviewers list
-            reviewers = gh_pr_data.get("requested_reviewers", [])
             for r in reviewers:
                 if (str(r.get("id")) == str(request.user.github_id)
                         or r.get("login") == request.user.username):
@@ -58,6 +79,9 @@ class IsAssignedReviewerForThread(BasePermission):
             logger.warning(
                 f"Could not verify assigned reviewers for user {request.user.id} on PR #{pr.pr_number}"
             )
+            # GitHub unavailable: a stale local list is better than nothing
+            if pr.reviewers_synced_at:
+                return is_requested_reviewer(pr, request.user)
 
         return False
 
@@ -67,52 +91,75 @@ class CanAccessRepository(BasePermission):
      1) user is owner
      2) user is in RepoCollaborator
      3) user actually shows up in GitHub's collaborator list (auto-sync)
+
+    Results are memoised on the request and kept in the shared Redis, positive
+    and negative answers with separate TTLs (REPO_ACCESS_CACHE_*_TTL).
     """
     def has_object_permission(self, request, view, obj):
-        if obj.owner == request.user:
+        # Owners never need a lookup
+        if obj.owner_id == request.user.id:
             return True
 
+        memo = getattr(request, "_repo_access_memo", None)
+        if memo is None:
+            memo = {}
+            request._repo_access_memo = memo
+        if obj.pk in memo:
+            return memo[obj.pk]
+
+        cache_key = _repo_access_cache_key(obj.pk, request.user.id)
+        try:
+            cached = get_redis().get(cache_key)
+            allowed = None if cached is None else cached == b"1"
+        except Exception as e:
+            logger.warning(f"Repository access cache lookup failed: {e}")
+            allowed = None
+
+        if allowed is None:
+            allowed, cacheable = self._check_access(request, obj)
+            if cacheable:
+                timeout = (
+                    getattr(settings, "REPO_ACCESS_CACHE_POSITIVE_TTL", 300) if allowed
+                    else getattr(settings, "REPO_ACCESS_CACHE_NEGATIVE_TTL", 60)
+                )
+                try:
+                    get_redis().set(cache_key, b"1" if allowed else b"0", ex=timeout)
+                except Exception as e:
+                    logger.warning(f"Repository access cache store failed: {e}")
+
+        memo[obj.pk] = allowed
+        return allowed
+
+    def _check_access(self, request, obj):
+        """Returns (allowed, cacheable); a denial caused by a GitHub error is not cached."""
         # 1) already in our DB?
         if RepoCollaborator.objects.filter(repository=obj, user=request.user).exists():
-            return True
+            return True, True
 
         # 2) fallback to GitHub API
         token = getattr(request.user, "github_access_token", None)
         if not token:
-            return False
+            return False, True
 
         owner_login = obj.owner.username
         repo_name = obj.repo_name.split("/", 1)[1]
         try:
-            # Fetch all pages of collaborators until we find the user
-            page = 1
-            per_page = 100  # Max allowed by GitHub API
-            while True:
-                gh_collabs = get_repo_collaborators_from_github(
-                    owner_login=owner_login,
-                    repo_name=repo_name,
-                    github_token=token,
-                    page=page,
-                    per_page=per_page
-                )
-                
-                # Check if user is in this batch
-                for c in gh_collabs:
-                    if str(c["id"]) == str(request.user.github_id):
-                        # sync them in and allow
-                        RepoCollaborator.objects.update_or_create(
-                            repository=obj,
-                            user=request.user,
-                            defaults={"role": c.get("permissions", {}).get("push") and "member" or "read"}
-                        )
-                        return True
-                
-                # If we got fewer resnversation_history,ults than requested, we've reached the end
-                if len(gh_collabs) < per_page:
-                    break
-                    
-                page += 1
+            # Stream collaborator pages (fetched concurrently) and stop as soon as we find the user
+            for c in iter_repo_collaborators_from_github(
+                owner_login=owner_login,
+                repo_name=repo_name,
+                github_token=token,
+            ):
+                if str(c["id"]) == str(request.user.github_id):
+                    # sync them in and allow
+                    RepoCollaborator.objects.update_or_create(
+                        repository=obj,
+                        user=request.user,
+                        defaults={"role": c.get("permissions", {}).get("push") and "member" or "read"}
+                    )
+                    return True, True
         except Exception:
             logger.warning(f"Could not verify collaborator via GitHub for {request.user}")
+            return False, False
 
-        return False
\ No newline at end of file
+        return False, True
@@ -0,0 +1,98 @@
+from typing import Iterable, Optional
+
+from django.db.models import Count, Prefetch, QuerySet
+
+from .models import Thread, Comment
+
+# Query plans for the nested review/thread/comment serializers. Each related object the
+# serializers touch is either joined (select_related), prefetched in one query per
+# relation, or counted in SQL, so serializing N reviews costs a constant number of queries.
+# A Fieldset (?fields= / ?omit=) trims the plan to the fields the client asked for.
+
+# RepositorySerializer nests the owner; PRSerializer and CommitSerializer nest the repository
+REVIEW_SELECT_RELATED = {
+    'repository': 'repository__owner',
+    'pull_request': 'pull_request__repository__owner',
+    'commit': 'commit__repository__owner',
+}
+
+def _split(value) -> list:
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [name.strip() for name in value if name and name.strip()]
+
+class Fieldset:
+    """
+    Sparse fieldset for the review/thread/comment serializers. `fields` limits the output
+    to the listed fields (None means all), `omit` drops fields. Nested serializers are
+    addressed with dotted names, e.g. `fields=id,status,threads.id,threads.comments.comment`
+    or `omit=review_data,threads.comments.comment_data`.
+    """
+    def __init__(self, fields: Optional[Iterable[str]] = None, omit: Iterable[str] = ()):
+        self.fields = set(_split(fields)) if fields is not None else None
+        self.omit = set(_split(omit))
+
+    @classmethod
+    def from_request(cls, request, default_omit: Iterable[str] = ()) -> 'Fieldset':
+        """Fieldset from ?fields= and ?omit=; `default_omit` applies unless explicitly requested."""
+        params = getattr(request, 'query_params', None) or getattr(request, 'GET', {})
+        fields = _split(params.get('fields')) or None
+        omit = set(_split(params.get('omit')))
+        omit.update(name for name in default_omit if not fields or name not in fields)
+        return cls(fields, omit)
+
+    def wants(self, name: str) -> bool:
+        """Whether the top-level field `name` is part of the output."""
+        if name in self.omit:
+            return False
+        return self.fields is None or name in self.fields or any(f.startswith(f'{name}.') for f in self.fields)
+
+    def nested(self, name: str) -> 'Fieldset':
+        """Fieldset for the nested serializer under `name` (all of its fields unless dotted names narrow it)."""
+        prefix = f'{name}.'
+        fields = None
+        if self.fields is not None:
+            fields = [f[len(prefix):] for f in self.fields if f.startswith(prefix)] or None
+        return Fieldset(fields, [f[len(prefix):] for f in self.omit if f.startswith(prefix)])
+
+    def __bool__(self):
+        return self.fields is not None or bool(self.omit)
+
+ALL_FIELDS = Fieldset()
+
+def comments_prefetch(lookup: str = 'comments', fieldset: Fieldset = ALL_FIELDS) -> Prefetch:
+    """Comments in posting order with their authors joined (CommentSerializer nests the user)."""
+    queryset = Comment.objects.order_by('created_at', 'id')
+    if fieldset.wants('user'):
+        queryset = queryset.select_related('user')
+    if not fieldset.wants('comment_data'):
+        queryset = queryset.defer('comment_data')
+    return Prefetch(lookup, queryset=queryset)
+
+def with_thread_plan(queryset: QuerySet, fieldset: Fieldset = ALL_FIELDS) -> QuerySet:
+    """Thread queryset for ThreadSerializer: comment_count annotated, comments prefetched."""
+    if fieldset.wants('created_by'):
+        queryset = queryset.select_related('created_by')
+    if fieldset.wants('comment_count'):
+        queryset = queryset.annotate(comment_count=Count('comments', distinct=True))
+    if fieldset.wants('comments'):
+        queryset = queryset.prefetch_related(comments_prefetch(fieldset=fieldset.nested('comments')))
+    return queryset
+
+def with_review_plan(queryset: QuerySet, fieldset: Fieldset = ALL_FIELDS) -> QuerySet:
+    """Review queryset for ReviewSerializer: nested FKs joined, thread_count annotated, threads prefetched."""
+    # progress is only read by the progress endpoint
+    queryset = queryset.defer('progress')
+    if not fieldset.wants('review_data'):
+        queryset = queryset.defer('review_data')
+    select_related = [path for name, path in REVIEW_SELECT_RELATED.items() if fieldset.wants(name)]
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if fieldset.wants('thread_count'):
+        queryset = queryset.annotate(thread_count=Count('threads', distinct=True))
+    if fieldset.wants('threads'):
+        threads = with_thread_plan(Thread.objects.order_by('created_at', 'id'), fieldset.nested('threads'))
+        queryset = queryset.prefetch_related(Prefetch('threads', queryset=threads))
+    return queryset
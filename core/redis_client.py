@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from typing import Dict, Optional
+
+import redis
+import redis.asyncio as aredis
+from django.conf import settings
+
+# Shared Redis clients for app-level bookkeeping (buffers, locks, counters).
+# The sync client's connection pool is thread-safe; asyncio clients are bound to
+# the loop they were created on, so we keep one per running loop.
+_sync_client: Optional[redis.Redis] = None
+_sync_client_lock = threading.Lock()
+_async_clients: Dict[asyncio.AbstractEventLoop, aredis.Redis] = {}
+_async_clients_lock = threading.Lock()
+
+def get_redis_url() -> str:
+    return getattr(settings, 'REDIS_URL', None) or settings.CELERY_BROKER_URL
+
+def _client_options():
+    return {
+        'socket_connect_timeout': getattr(settings, 'REDIS_SOCKET_TIMEOUT', 2),
+        'socket_timeout': getattr(settings, 'REDIS_SOCKET_TIMEOUT', 2),
+    }
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide sync Redis client."""
+    global _sync_client
+    if _sync_client is None:
+        with _sync_client_lock:
+            if _sync_client is None:
+                _sync_client = redis.Redis.from_url(get_redis_url(), **_client_options())
+    return _sync_client
+
+def get_async_redis() -> aredis.Redis:
+    """Return the asyncio Redis client bound to the currently running event loop."""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        for stale_loop in [l for l in _async_clients if l.is_closed()]:
+            _async_clients.pop(stale_loop, None)
+        client = _async_clients.get(loop)
+        if client is None:
+            client = aredis.Redis.from_url(get_redis_url(), **_client_options())
+            _async_clients[loop] = client
+        return client
@@ -0,0 +1,57 @@
+"""
+orjson-backed DRF renderer and parser (REST_FRAMEWORK defaults when API_FAST_JSON is on).
+
+Output matches rest_framework's JSONRenderer: compact separators, UTF-8, datetimes in
+ECMA 262 form with 'Z' for UTC, and DRF's own encoder for Decimal, timedelta, lazy
+strings, QuerySets and the rest. Anything orjson can't take (indented output for the
+browsable API, integers over 64 bits) goes through the stdlib renderer instead.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - orjson is optional
+    orjson = None
+
+_drf_encoder = JSONEncoder()
+
+def _default(obj):
+    # Only called for types orjson doesn't serialize natively (Decimal, timedelta, Promise, ...)
+    return _drf_encoder.default(obj)
+
+if orjson is not None:
+    # UTC as 'Z' like DRF; dict keys that aren't strings are stringified like the stdlib does
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        # orjson only reads UTF-8 and always rejects NaN/Infinity (STRICT_JSON)
+        if orjson is None or not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
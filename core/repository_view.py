@@ -13,7 +13,7 @@ from .models import (
 from .serializers import (
     RepositorySerializer, RepoCollaboratorSerializer, 
     GitHubCollaboratorSerializer,
-    PRSerializer, CommitSerializer
+    PRSerializer, CommitSerializer, WebhookEventLogSerializer
 )
 from .services import (
     get_repo_collaborators_from_github,
@@ -71,7 +71,7 @@ class RepositoryViewSet(viewsets.ModelViewSet):
         RepoCollaborator.objects.create(repository=instance, user=self.request.user, role='owner')
 
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy', 'regenerate_webhook_secret', 'webhook_status']:
+        if self.action in ['update', 'partial_update', 'destroy', 'regenerate_webhook_secret', 'webhook_status', 'webhook_events']:
             self.permission_classes = [IsAuthenticated, IsRepositoryOwner]
         elif self.action in ['retrieve', 'collaborators', 'registered_collaborators']:
             self.permission_classes = [IsAuthenticated, CanAccessRepository]
@@ -125,6 +125,16 @@ class RepositoryViewSet(viewsets.ModelViewSet):
         }
         return Response(status_data)
 
+    @action(detail=True, methods=['get'], url_path='webhook/events')
+    def webhook_events(self, request, pk=None):
+        """Webhook deliveries received for this repository, newest first (cursor paginated)."""
+        repository = self.get_object()
+        events = WebhookEventLog.objects.filter(repository=repository).select_related('repository__owner')
+        page = self.paginate_queryset(events)
+        if page is not None:
+            return self.get_paginated_response(WebhookEventLogSerializer(page, many=True).data)
+        return Response(WebhookEventLogSerializer(events.order_by('-created_at'), many=True).data)
+
     def list(self, request, *args, **kwargs):
         """List repositories for which the current user is an owner or collaborator."""
         # Get repos owned by the user
@@ -178,7 +188,10 @@ class RepositoryViewSet(viewsets.ModelViewSet):
     def registered_collaborators(self, request, pk=None):
         """Get registered collaborators in the system for this repository."""
         repository = self.get_object() # Applies CanAccessRepository permission
-        collaborators = RepoCollaborator.objects.filter(repository=repository)
+        collaborators = RepoCollaborator.objects.filter(repository=repository).select_related('user')
+        page = self.paginate_queryset(collaborators)
+        if page is not None:
+            return self.get_paginated_response(RepoCollaboratorSerializer(page, many=True).data)
         serializer = RepoCollaboratorSerializer(collaborators, many=True)
         return Response(serializer.data)
 
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import re
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Review
+
+# Hunk line numbers shift when the same change is cherry-picked or rebased
+_HUNK_HEADER_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+def normalize_diff(diff_text: str) -> str:
+    """
+    Reduce a unified diff to the parts that affect a review: drop blob `index` lines,
+    hunk offsets and trailing whitespace / CRLF noise.
+    """
+    lines = []
+    for line in (diff_text or '').splitlines():
+        if line.startswith('index '):
+            continue
+        line = _HUNK_HEADER_RE.sub('@@', line)
+        lines.append(line.rstrip())
+    return '\n'.join(lines).strip()
+
+def compute_diff_hash(diff_text: str, repo_settings: Dict[str, Any]) -> str:
+    """Content address of a review request: normalized diff plus the settings the agent sees."""
+    review_inputs = json.dumps({
+        'coding_standards': repo_settings.get('coding_standards') or [],
+        'code_metrics': repo_settings.get('code_metrics') or [],
+        'llm_preference': repo_settings.get('llm_preference'),
+    }, sort_keys=True)
+    digest = hashlib.sha256()
+    digest.update(normalize_diff(diff_text).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(review_inputs.encode('utf-8'))
+    return digest.hexdigest()
+
+# review_data keys that describe the run rather than the findings
+RUN_KEYS = ('repo', 'user', 'pr_id')
+
+def rebind_review_data(review_data: Dict[str, Any], run_values: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a cached review_data with its per-run keys set for the review reusing it."""
+    data = dict(review_data or {})
+    for key in RUN_KEYS:
+        if key in data:
+            data[key] = run_values.get(key, '')
+    return data
+
+def review_cache_enabled() -> bool:
+    return getattr(settings, 'REVIEW_CACHE_ENABLED', True)
+
+def find_reusable_review(diff_hash: str, repository_id: int, exclude_review_id: Optional[int] = None) -> Optional[Review]:
+    """
+    Most recent completed review of the same diff hash in the same repository within
+    REVIEW_CACHE_TTL. Never looks across repositories: a review and its LangGraph thread
+    carry the owner's data.
+    """
+    if not diff_hash:
+        return None
+    ttl = getattr(settings, 'REVIEW_CACHE_TTL', 7 * 24 * 60 * 60)
+    queryset = Review.objects.filter(
+        repository_id=repository_id,
+        diff_hash=diff_hash,
+        status='completed',
+        review_data__isnull=False,
+        updated_at__gte=timezone.now() - timedelta(seconds=ttl),
+    )
+    if exclude_review_id:
+        queryset = queryset.exclude(id=exclude_review_id)
+    return queryset.order_by('-updated_at').first()
@@ -0,0 +1,84 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Review
+
+logger = logging.getLogger(__name__)
+
+# State keys that hold findings; progress records how many there are so far and keeps the first few
+FINDING_KEYS = ('reviews', 'fixes', 'metrics', 'standards')
+
+def _finding_count(value: Any) -> Optional[int]:
+    if isinstance(value, (list, dict)):
+        return len(value)
+    return None
+
+def _partial_findings(value: Any, limit: int) -> Any:
+    if isinstance(value, list):
+        return value[:limit]
+    if isinstance(value, dict):
+        return dict(list(value.items())[:limit])
+    return None
+
+class ReviewProgressRecorder:
+    """
+    Turns the 'updates' events of a streaming LangGraph run into checkpoints on
+    Review.progress. Writes are throttled to one per REVIEW_PROGRESS_SAVE_INTERVAL
+    seconds; `finish` always writes the last state. Up to REVIEW_PROGRESS_MAX_FINDINGS
+    findings per key are kept under 'partial' so a failed run still shows what it found.
+
+    Runs on the LangGraph runtime loop, so it only uses the async ORM.
+    """
+    def __init__(self, review_id: int, min_interval: Optional[float] = None):
+        self.review_id = review_id
+        self.min_interval = min_interval if min_interval is not None else getattr(settings, 'REVIEW_PROGRESS_SAVE_INTERVAL', 2.0)
+        self.max_findings = getattr(settings, 'REVIEW_PROGRESS_MAX_FINDINGS', 20)
+        self._last_saved = 0.0
+        self._dirty = False
+        self.progress: Dict[str, Any] = {
+            'stage': 'running',
+            'node': None,
+            'nodes_completed': [],
+            'findings': {},
+            'partial': {},
+            'events': 0,
+            'started_at': timezone.now().isoformat(),
+            'updated_at': None,
+        }
+
+    async def __call__(self, node: str, update: Any) -> None:
+        self.progress['node'] = node
+        self.progress['events'] += 1
+        if node not in self.progress['nodes_completed']:
+            self.progress['nodes_completed'].append(node)
+        if isinstance(update, dict):
+            for key in FINDING_KEYS:
+                count = _finding_count(update.get(key))
+                if count is not None:
+                    self.progress['findings'][key] = count
+                    self.progress['partial'][key] = _partial_findings(update[key], self.max_findings)
+        self._dirty = True
+        if time.monotonic() - self._last_saved >= self.min_interval:
+            await self.save()
+
+    async def save(self) -> None:
+        if not self._dirty:
+            return
+        self.progress['updated_at'] = timezone.now().isoformat()
+        try:
+            await Review.objects.filter(pk=self.review_id).aupdate(progress=self.progress)
+        except Exception as e:
+            # Progress is best effort; never fail the review over it
+            logger.warning(f"Could not save progress for review {self.review_id}: {str(e)}")
+        self._last_saved = time.monotonic()
+        self._dirty = False
+
+    async def finish(self, stage: str = 'finished') -> None:
+        self.progress['stage'] = stage
+        self.progress['node'] = None
+        self._dirty = True
+        await self.save()
@@ -3,7 +3,8 @@ from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 
-from .tasks.review_tasks import process_pr_review
+from .tasks.review_tasks import process_pr_review, process_commit_review
+from .task_routing import queue_for
 from .models import (
     Review as ReviewModel,
     Thread as ThreadModel,
@@ -16,16 +17,30 @@ from .serializers import (
 from .services import (
     LangGraphService
 )
+from .query_plans import Fieldset, with_review_plan, with_thread_plan
 from django.conf import settings
 from django.db.models import Q 
+from django.shortcuts import get_object_or_404
 import logging
 from .permissions import (CanAccessRepository)
 # Create a logger instance
 logger = logging.getLogger(__name__)
 
+# Fields history has never returned; they can still be requested with ?fields=
+HISTORY_OMIT = ('repository', 'pull_request', 'review_data', 'threads', 'thread_count')
+
 class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
+
+    def get_fieldset(self):
+        """?fields= / ?omit= sparse fieldset, applied to both the query plan and the serializer."""
+        return Fieldset.from_request(self.request, HISTORY_OMIT if self.action == 'history' else ())
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve', 'history'):
+            kwargs.setdefault('fieldset', self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
     
     @action(detail=False, methods=['get'],url_path='history', permission_classes=[IsAuthenticated, CanAccessRepository])
     def history(self, request, pk=None):
@@ -52,54 +67,24 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        reviews_qs = reviews_qs.prefetch_related('threads', 'threads__comments')
-        
-        # Use default serializer context, ReviewSerializer includes threads by default if present in Meta
-        serializer_context = self.get_serializer_context()
-        serializer = self.get_serializer(reviews_qs.order_by('-created_at'), many=True, context=serializer_context)
-        
-        response_data = serializer.data # This is a list of serialized review objects
-        
-        fields_to_remove_from_each_review = [
-            'repository', 
-            'pull_request', 
-            'review_data', 
-            'threads',
-            'thread_count' # Also remove thread_count as it's related to threads
-        ]
-        
-        cleaned_response_data = []
-        for review_item_data in response_data:
-            for key_to_remove in fields_to_remove_from_each_review:
-                review_item_data.pop(key_to_remove, None)
-            cleaned_response_data.append(review_item_data)
-            
-        return Response(cleaned_response_data)
+        # Omitted fields (HISTORY_OMIT unless requested) are neither queried nor serialized
+        reviews_qs = with_review_plan(reviews_qs, self.get_fieldset())
+        page = self.paginate_queryset(reviews_qs)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        serializer = self.get_serializer(reviews_qs.order_by('-created_at'), many=True)
+        return Response(serializer.data)
     
     def get_queryset(self):
-        return ReviewModel.objects.filter(
+        queryset = ReviewModel.objects.filter(
             Q(repository__owner=self.request.user) |
             Q(repository__collaborators__user=self.request.user)
         ).distinct()
+        if self.action in ('list', 'retrieve'):
+            # Nested repository/PR/commit, threads and comments in a fixed number of queries
+            queryset = with_review_plan(queryset, self.get_fieldset())
+        return queryset
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        data = serializer.data
-        
-        # Serialize and add thread information if threads exist
-        # It's better to check instance.threads.exists() or instance.threads.all()
-        if instance.threads.exists(): 
-            # Assuming ThreadSerializer is available and imported correctly
-            # Pass the request context to the ThreadSerializer if it needs it (e.g., for HyperlinkedRelatedField)
-            serializer_context = self.get_serializer_context()
-            threads_data = ThreadSerializer(instance.threads.all(), many=True, context=serializer_context).data
-            data['threads'] = threads_data
-        else:
-            # Optionally, ensure 'threads' key is present even if empty
-            data['threads'] = []
-        # print(data)
-        return Response(data)
     # this feedback endpoint is not gonna be used anywhere, it's just a placeholder
     @action(detail=True, methods=['post'])
     def feedback(self, request, pk=None):
@@ -137,10 +122,30 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """
+        Lightweight status/progress of a review for polling clients; skips review_data and nested serializers.
+        """
+        review = get_object_or_404(
+            self.get_queryset().only('id', 'status', 'progress', 'error_message', 'updated_at'), pk=pk
+        )
+        return Response({
+            'id': review.id,
+            'status': review.status,
+            'progress': review.progress,
+            'error_message': review.error_message,
+            'updated_at': review.updated_at,
+        })
+
+    @action(detail=True, methods=['get'])
     def threads(self, request, pk=None):
         review = self.get_object() # pk is reviewId
-        threads_qs = ThreadModel.objects.filter(review=review)
-        serializer = ThreadSerializer(threads_qs, many=True) # Assuming ThreadSerializer exists
+        fieldset = self.get_fieldset()
+        threads_qs = with_thread_plan(ThreadModel.objects.filter(review=review), fieldset)
+        page = self.paginate_queryset(threads_qs)
+        if page is not None:
+            return self.get_paginated_response(ThreadSerializer(page, many=True, fieldset=fieldset).data)
+        serializer = ThreadSerializer(threads_qs, many=True, fieldset=fieldset)
         return Response(serializer.data)
 
     @action(detail=True, methods=['post']) # For creating a new thread under a review
@@ -193,23 +198,41 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 parent_review=review
             )
             
-            # Trigger re-review process
-            process_pr_review.delay({
-                'pull_request': {
-                    'number': review.pull_request.pr_number if review.pull_request else None,
-                    'user': {'id': request.user.id},
-                    'base': {
-                        'repo': {
-                            'owner': {'login': review.repository.owner.username},
-                            'name': review.repository.repo_name.split('/')[-1]
+            # Re-reviews reuse a cached result for an unchanged diff unless force_fresh is set
+            force_fresh = str(request.data.get('force_fresh', '')).lower() in ('1', 'true', 'yes')
+            repository = review.repository
+            if review.pull_request:
+                pr = review.pull_request
+                process_pr_review.apply_async(args=[{
+                    'pull_request': {
+                        'number': pr.pr_number,
+                        'id': pr.pr_github_id,
+                        'title': pr.title,
+                        'body': pr.body,
+                        'html_url': pr.url,
+                        'state': pr.status,
+                        'head': {'sha': pr.head_sha},
+                        'user': {'id': pr.author_github_id},
+                        'base': {
+                            'sha': pr.base_sha,
+                            'repo': {
+                                'owner': {'login': repository.owner.username},
+                                'name': repository.repo_name.split('/')[-1]
+                            }
                         }
-                    }
-                },
-                'repository': {
-                    'owner': {'login': review.repository.owner.username},
-                    'name': review.repository.repo_name.split('/')[-1]
-                }
-            })
+                    },
+                    'repository': {
+                        'id': repository.github_native_id,
+                        'full_name': repository.repo_name,
+                        'owner': {'login': repository.owner.username},
+                        'name': repository.repo_name.split('/')[-1]
+                    },
+                    'action': 're_review'
+                }, repository.id, pr.id], kwargs={'triggering_user_id': request.user.id, 'force_fresh': force_fresh},
+                    queue=queue_for('interactive'))
+            else:
+                process_commit_review.apply_async(args=[{}, repository.id, review.commit_id], kwargs={'force_fresh': force_fresh},
+                    queue=queue_for('interactive'))
             
             return Response({
                 'review_id': new_review.id,
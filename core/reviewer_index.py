@@ -0,0 +1,63 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PullRequest, PullRequestReviewer
+
+logger = logging.getLogger(__name__)
+
+def reviewers_are_fresh(pr: PullRequest) -> bool:
+    """True if the local reviewer list was refreshed within PR_REVIEWERS_CACHE_TTL."""
+    if not pr.reviewers_synced_at:
+        return False
+    ttl = getattr(settings, 'PR_REVIEWERS_CACHE_TTL', 300)
+    return timezone.now() - pr.reviewers_synced_at < timedelta(seconds=ttl)
+
+def sync_requested_reviewers(pr: PullRequest, reviewers) -> None:
+    """Replace the stored reviewer list with `reviewers` (GitHub user dicts with id/login)."""
+    wanted = {
+        str(r['id']): r.get('login') or ''
+        for r in reviewers or []
+        if r and r.get('id') is not None
+    }
+    with transaction.atomic():
+        PullRequestReviewer.objects.filter(pull_request=pr).exclude(github_id__in=wanted.keys()).delete()
+        if wanted:
+            PullRequestReviewer.objects.bulk_create(
+                [PullRequestReviewer(pull_request=pr, github_id=gid, login=login) for gid, login in wanted.items()],
+                update_conflicts=True,
+                unique_fields=['pull_request', 'github_id'],
+                update_fields=['login', 'updated_at'],
+            )
+        pr.reviewers_synced_at = timezone.now()
+        PullRequest.objects.filter(pk=pr.pk).update(reviewers_synced_at=pr.reviewers_synced_at)
+
+def apply_pull_request_event(pr: PullRequest, action: str, event_data) -> None:
+    """Update the reviewer index from a pull_request webhook payload."""
+    pr_data = event_data.get('pull_request') or {}
+    if 'requested_reviewers' in pr_data:
+        # The PR object carries the full current list, which already reflects this action
+        sync_requested_reviewers(pr, pr_data['requested_reviewers'])
+        return
+
+    reviewer = event_data.get('requested_reviewer') or {}
+    if not reviewer.get('id'):
+        return
+    if action == 'review_requested':
+        PullRequestReviewer.objects.update_or_create(
+            pull_request=pr, github_id=str(reviewer['id']),
+            defaults={'login': reviewer.get('login') or ''},
+        )
+    elif action == 'review_request_removed':
+        PullRequestReviewer.objects.filter(pull_request=pr, github_id=str(reviewer['id'])).delete()
+
+def is_requested_reviewer(pr: PullRequest, user) -> bool:
+    """Local index lookup; callers should check reviewers_are_fresh() first."""
+    return PullRequestReviewer.objects.filter(
+        Q(github_id=str(user.github_id)) | Q(login=user.username),
+        pull_request=pr,
+    ).exists()
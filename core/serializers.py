@@ -1,6 +1,30 @@
 from rest_framework import serializers
 from .models import User, Repository as DBRepository, RepoCollaborator, PullRequest, Commit, Review, Thread, Comment, LLMUsage, ReviewFeedback, WebhookEventLog
 
+class SparseFieldsetMixin:
+    """
+    Accepts `fieldset=` (a core.query_plans.Fieldset, usually from ?fields=/?omit=) and drops
+    the readable fields it excludes before anything is serialized, including on nested
+    serializers that use this mixin. Pair it with the matching query plan so deferred
+    columns are never loaded.
+    """
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fieldset:
+            self.apply_fieldset(fieldset)
+
+    def apply_fieldset(self, fieldset):
+        for name in list(self.fields):
+            field = self.fields[name]
+            if field.write_only:
+                continue
+            if not fieldset.wants(name):
+                self.fields.pop(name)
+                continue
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested.apply_fieldset(fieldset.nested(name))
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -209,7 +233,7 @@ class ReviewFeedbackSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True) # Comment is always by the logged-in user
     thread = serializers.PrimaryKeyRelatedField(queryset=Thread.objects.all())
     parent_comment = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.all(), allow_null=True, required=False)
@@ -240,7 +264,7 @@ class CommentSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class ThreadSerializer(serializers.ModelSerializer):
+class ThreadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     review = serializers.PrimaryKeyRelatedField(queryset=Review.objects.all())
     comments = CommentSerializer(many=True, read_only=True) # Nested comments
     comment_count = serializers.SerializerMethodField()
@@ -251,7 +275,9 @@ class ThreadSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'comments', 'comment_count', 'created_at', 'created_by', 'updated_at', 'last_comment_at']
 
     def get_comment_count(self, obj):
-        return obj.comments.count()
+        # Annotated by core.query_plans.with_thread_plan; falls back to a COUNT query
+        count = getattr(obj, 'comment_count', None)
+        return count if count is not None else obj.comments.count()
 
     def create(self, validated_data):
         # Review is typically set from the context (e.g., URL in ReviewViewSet.create_thread)
@@ -293,7 +319,7 @@ class ThreadSerializer(serializers.ModelSerializer):
                         comment_dict['comment_data'] = None
                 # If comment_data was None or not present, it remains as is (None or not present)
         return data
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     repository_id = serializers.PrimaryKeyRelatedField(
         queryset=DBRepository.objects.all(), source='repository', write_only=True
     )
@@ -335,7 +361,9 @@ class ReviewSerializer(serializers.ModelSerializer):
         }
     
     def get_thread_count(self, obj):
-        return obj.threads.count()
+        # Annotated by core.query_plans.with_review_plan; falls back to a COUNT query
+        count = getattr(obj, 'thread_count', None)
+        return count if count is not None else obj.threads.count()
     def to_representation(self, instance):
         data = super().to_representation(instance)
         
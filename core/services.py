@@ -1,15 +1,30 @@
-import requests
 from django.conf import settings
 import secrets
 import urllib.parse
-import aiohttp
 import hmac
 import hashlib
+from .github_client.http import get_sync_session, get_async_session, get_request_timeout
+from .github_client.cache import get_response_cache
+from .github_client.ratelimit import get_rate_limiter
+from .github_client.graphql import GITHUB_GRAPHQL_URL, GitHubBatchLoader
+from .github_client.pagination import (
+    get_pagination_concurrency,
+    get_pagination_executor,
+    last_page_from_link,
+)
+from collections import deque
+from itertools import islice
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 GITHUB_OAUTH_AUTHORIZE_URL = "https://github.com/login/oauth/authorize"
 GITHUB_OAUTH_TOKEN_URL = "https://github.com/login/oauth/access_token"
 GITHUB_API_USER_URL = "https://api.github.com/user"
 GITHUB_API_BASE_URL = "https://api.github.com"
+GITHUB_DIFF_MEDIA_TYPE = "application/vnd.github.v3.diff"
 
 # GitHub OAuth scopes needed (mirroring your FastAPI setup)
 GITHUB_SCOPES = [
@@ -24,6 +39,53 @@ GITHUB_SCOPES = [
     "security_events"
 ]
 
+def _github_headers(github_token=None):
+    """Standard headers for GitHub REST API v3 requests."""
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    if github_token:
+        headers["Authorization"] = f"token {github_token}"
+    return headers
+
+def _send_with_rate_limit(send, github_token, *args, resource="core", **kwargs):
+    """Send a request through the per-token rate limiter, retrying rate-limited responses."""
+    limiter = get_rate_limiter()
+    attempt = 0
+    while True:
+        limiter.acquire(github_token, resource)
+        response = send(*args, **kwargs)
+        limiter.record(github_token, response.status_code, response.headers)
+        delay = limiter.retry_delay(github_token, response.status_code, response.headers, attempt)
+        if delay is None:
+            return response
+        logger.warning(f"GitHub rate limited {response.url} ({response.status_code}); retrying in {delay:.1f}s")
+        time.sleep(delay)
+        attempt += 1
+
+def _github_get(url, github_token=None, params=None, headers=None, use_cache=True):
+    """
+    Issue a GET against GitHub through the shared keep-alive session.
+    Reads are revalidated with If-None-Match/If-Modified-Since; a 304 is served from the response cache.
+    """
+    request_headers = _github_headers(github_token)
+    if headers:
+        request_headers.update(headers)
+
+    cache = get_response_cache() if use_cache else None
+    cache_key, cached_entry = None, None
+    if cache is not None:
+        cache_key = cache.make_key(github_token, url, params, accept=request_headers.get("Accept"))
+        cached_entry = cache.lookup(cache_key)
+        if cached_entry:
+            request_headers.update(cache.conditional_headers(cached_entry))
+
+    response = _send_with_rate_limit(
+        get_sync_session().get, github_token,
+        url, headers=request_headers, params=params, timeout=get_request_timeout()
+    )
+    if cache is not None:
+        response = cache.process_response(cache_key, cached_entry, response)
+    return response
+
 def generate_oauth_state(request):
     """Generate a random state string and store it in the session."""
     state = secrets.token_urlsafe(32)
@@ -53,23 +115,19 @@ def exchange_code_for_github_token(code):
         "code": code,
     }
     headers = {"Accept": "application/json"}
-    response = requests.post(GITHUB_OAUTH_TOKEN_URL, data=payload, headers=headers)
+    response = get_sync_session().post(GITHUB_OAUTH_TOKEN_URL, data=payload, headers=headers, timeout=get_request_timeout())
     response.raise_for_status()  # Raise an exception for bad status codes
     return response.json().get("access_token")
 
 def get_github_user_info(github_token):
     """Fetches user information from GitHub API using the access token."""
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
-    response = requests.get(GITHUB_API_USER_URL, headers=headers)
+    response = _github_get(GITHUB_API_USER_URL, github_token)
     response.raise_for_status()
     
     user_data = response.json()
     
     # Attempt to get primary email if available
-    email_data = requests.get(f"{GITHUB_API_USER_URL}/emails", headers=headers)
+    email_data = _github_get(f"{GITHUB_API_USER_URL}/emails", github_token)
     if email_data.status_code == 200:
         for email_entry in email_data.json():
             if email_entry.get('primary') and email_entry.get('verified'):
@@ -82,71 +140,77 @@ def get_github_user_info(github_token):
 
 def get_user_repos_from_github(github_token, page=1, per_page=30):
     """Fetches user\'s repositories from GitHub API."""
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
     params = {"per_page": per_page, "page": page, "sort": "updated", "direction": "desc"}
-    response = requests.get(f"{GITHUB_API_USER_URL}/repos", headers=headers, params=params)
+    response = _github_get(f"{GITHUB_API_USER_URL}/repos", github_token, params=params)
     response.raise_for_status()
     return response.json()
 
 def get_user_orgs_from_github(github_token, page=1, per_page=30):
     """Fetches user\'s organizations from GitHub API."""
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
     params = {"per_page": per_page, "page": page}
-    response = requests.get(f"{GITHUB_API_USER_URL}/orgs", headers=headers, params=params)
+    response = _github_get(f"{GITHUB_API_USER_URL}/orgs", github_token, params=params)
     response.raise_for_status()
     return response.json()
 
-def get_all_repo_collaborators_from_github(owner_login: str, repo_name: str, github_token: str) -> list:
-    """Fetch all repository collaborators from GitHub, handling pagination."""
-    collaborators = []
-    page = 1
-    while True:
-        url = f"https://api.github.com/repos/{owner_login}/{repo_name}/collaborators?page={page}&per_page=100" # Max per_page is 100
-        headers = {
-            "Authorization": f"token {github_token}",
-            "Accept": "application/vnd.github.v3+json",
-        }
-        response = requests.get(url, headers=headers)
+def iter_repo_collaborators_from_github(owner_login: str, repo_name: str, github_token: str, per_page: int = 100):
+    """
+    Yield repository collaborators from GitHub, page by page and in order.
+
+    The first page's `Link` header tells us the last page; the remaining pages are then
+    fetched concurrently (bounded by GITHUB_PAGINATION_CONCURRENCY). Closing the generator
+    early, e.g. once a user has been found, cancels pages that have not started yet.
+    """
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/collaborators"
+
+    def fetch_page(page):
+        response = _github_get(url, github_token, params={"page": page, "per_page": per_page})
         response.raise_for_status()  # Raise an exception for HTTP errors
-        current_page_collaborators = response.json()
-        if not current_page_collaborators:
-            break
-        collaborators.extend(current_page_collaborators)
-        if len(current_page_collaborators) < 100: # Break if last page was not full
-            break
-        page += 1
-    return collaborators
+        return response
+
+    first_response = fetch_page(1)
+    yield from first_response.json()
+
+    last_page = last_page_from_link(first_response.headers.get("Link"))
+    if not last_page or last_page <= 1:
+        return
+
+    executor = get_pagination_executor()
+    pages = iter(range(2, last_page + 1))
+    pending = deque(executor.submit(fetch_page, page) for page in islice(pages, get_pagination_concurrency()))
+    try:
+        while pending:
+            page_response = pending.popleft().result()
+            next_page = next(pages, None)
+            if next_page is not None:
+                pending.append(executor.submit(fetch_page, next_page))
+            yield from page_response.json()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def get_all_repo_collaborators_from_github(owner_login: str, repo_name: str, github_token: str) -> list:
+    """Fetch all repository collaborators from GitHub, fetching pages concurrently."""
+    return list(iter_repo_collaborators_from_github(owner_login, repo_name, github_token))
 
 def get_repo_collaborators_from_github(github_token, owner_login, repo_name, page=1, per_page=30):
     """Fetches repository collaborators from the GitHub API."""
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
     params = {"per_page": per_page, "page": page}
-    url = f"https://api.github.com/repos/{owner_login}/{repo_name}/collaborators"
-    response = requests.get(url, headers=headers, params=params)
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/collaborators"
+    response = _github_get(url, github_token, params=params)
     response.raise_for_status()
     return response.json()
 
-def get_repository_commits_from_github(github_token: str, owner_login: str, repo_name: str, per_page: int = 30, page: int = 1):
+def get_repository_commits_from_github(github_token: str, owner_login: str, repo_name: str, per_page: int = 30, page: int = 1, since: str = None):
     """
     Fetches commits for a specific repository from the GitHub API.
+    'since' (ISO 8601) limits the result to commits made after that time.
     """
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
     params = {"per_page": per_page, "page": page}
+    if since:
+        params["since"] = since
     
-    url = f"https://api.github.com/repos/{owner_login}/{repo_name}/commits"
-    response = requests.get(url, headers=headers, params=params)
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/commits"
+    response = _github_get(url, github_token, params=params)
     response.raise_for_status()  # Raise an exception for bad status codes
     return response.json()
 
@@ -157,10 +221,6 @@ def get_repository_pull_requests_from_github(github_token: str, owner_login: str
     'sort' can be 'created', 'updated', 'popularity', 'long-running'.
     'direction' can be 'asc' or 'desc'.
     """
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
     params = {
         "state": state,
         "sort": sort,
@@ -168,8 +228,8 @@ def get_repository_pull_requests_from_github(github_token: str, owner_login: str
         "per_page": per_page,
         "page": page,
     }
-    url = f"https://api.github.com/repos/{owner_login}/{repo_name}/pulls"
-    response = requests.get(url, headers=headers, params=params)
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/pulls"
+    response = _github_get(url, github_token, params=params)
     response.raise_for_status()  # Raise an exception for bad status codes
     return response.json()
 
@@ -177,12 +237,8 @@ def get_single_pull_request_from_github(github_token: str, owner_login: str, rep
     """
     Fetches a single pull request by its number for a specific repository from the GitHub API.
     """
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
     url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/pulls/{pr_number}"
-    response = requests.get(url, headers=headers)
+    response = _github_get(url, github_token)
     response.raise_for_status()  # Raise an exception for bad status codes (404 if not found)
     return response.json()
 
@@ -190,15 +246,86 @@ def get_single_commit_from_github(github_token: str, owner_login: str, repo_name
     """
     Fetches a single commit by its SHA for a specific repository from the GitHub API.
     """
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json", # Or "application/vnd.github.sha" for just the SHA
-    }
     url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/commits/{commit_sha}"
-    response = requests.get(url, headers=headers)
+    response = _github_get(url, github_token)
     response.raise_for_status()  # Raise an exception for bad status codes (404 if not found, 422 for invalid SHA)
     return response.json()
 
+def get_pull_request_diff_from_github(github_token: str, owner_login: str, repo_name: str, pr_number: int) -> str:
+    """
+    Fetches the unified diff of a pull request.
+    """
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/pulls/{pr_number}"
+    response = _github_get(url, github_token, headers={"Accept": GITHUB_DIFF_MEDIA_TYPE})
+    response.raise_for_status()
+    return response.text
+
+def get_commit_diff_from_github(github_token: str, owner_login: str, repo_name: str, commit_sha: str) -> str:
+    """
+    Fetches the unified diff of a single commit.
+    """
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/commits/{commit_sha}"
+    response = _github_get(url, github_token, headers={"Accept": GITHUB_DIFF_MEDIA_TYPE})
+    response.raise_for_status()
+    return response.text
+
+def compare_commits_from_github(github_token: str, owner_login: str, repo_name: str, base_sha: str, head_sha: str):
+    """
+    Compares two commits (base...head): status (ahead/behind/diverged/identical) and changed files.
+    """
+    url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/compare/{base_sha}...{head_sha}"
+    response = _github_get(url, github_token)
+    response.raise_for_status()
+    return response.json()
+
+def _github_graphql(query: str, variables: dict, github_token: str) -> dict:
+    """POST a GraphQL query to GitHub and return the decoded payload (data + errors)."""
+    response = _send_with_rate_limit(
+        get_sync_session().post, github_token,
+        GITHUB_GRAPHQL_URL,
+        json={"query": query, "variables": variables},
+        headers={"Authorization": f"bearer {github_token}"},
+        timeout=get_request_timeout(),
+        resource="graphql",
+    )
+    response.raise_for_status()
+    return response.json()
+
+def get_github_batch_loader(github_token: str, scope=None) -> GitHubBatchLoader:
+    """
+    Return a GraphQL batch loader for this token.
+    Passing a scope (the DRF request, or a Celery task's `self.request`) shares one loader,
+    and so one batch and its memoised results, between all callers in that request or task.
+    """
+    batch_size = getattr(settings, "GITHUB_GRAPHQL_BATCH_SIZE", 50)
+    if scope is None:
+        return GitHubBatchLoader(github_token, _github_graphql, batch_size=batch_size)
+    loaders = getattr(scope, "_github_batch_loaders", None)
+    if loaders is None:
+        loaders = {}
+        setattr(scope, "_github_batch_loaders", loaders)
+    if github_token not in loaders:
+        loaders[github_token] = GitHubBatchLoader(github_token, _github_graphql, batch_size=batch_size)
+    return loaders[github_token]
+
+def batch_get_pull_requests_from_github(github_token: str, keys, scope=None) -> dict:
+    """
+    Fetch many pull requests in one GraphQL round trip.
+    keys: iterable of (owner_login, repo_name, pr_number). Returns {key: pr_data or None}.
+    """
+    loader = get_github_batch_loader(github_token, scope)
+    deferred = {key: loader.load_pull_request(*key) for key in keys}
+    return {key: d.result() for key, d in deferred.items()}
+
+def batch_get_commits_from_github(github_token: str, keys, scope=None) -> dict:
+    """
+    Fetch many commits in one GraphQL round trip.
+    keys: iterable of (owner_login, repo_name, commit_sha). Returns {key: commit_data or None}.
+    """
+    loader = get_github_batch_loader(github_token, scope)
+    deferred = {key: loader.load_commit(*key) for key in keys}
+    return {key: d.result() for key, d in deferred.items()}
+
 # LangGraph service wrapper
 class LangGraphService:
     """Wrapper for LangGraph API calls."""
@@ -231,22 +358,74 @@ class GitHubService:
             user_token (str, optional): GitHub access token. If None, use app-level authentication.
         """
         self.token = user_token
-        self.headers = {
-            "Accept": "application/vnd.github.v3+json",
-        }
-        
-        if self.token:
-            self.headers["Authorization"] = f"token {self.token}"
+        self.headers = _github_headers(self.token)
             
+    async def _fetch(self, method, url, **kwargs):
+        """
+        Send a request on the pooled session, honouring this token's rate-limit budget.
+        Returns the decoded JSON body and the response headers.
+        """
+        limiter = get_rate_limiter()
+        session = await get_async_session()
+        attempt = 0
+        while True:
+            await limiter.async_acquire(self.token)
+            async with session.request(method, url, headers=self.headers, **kwargs) as response:
+                limiter.record(self.token, response.status, response.headers)
+                delay = limiter.retry_delay(self.token, response.status, response.headers, attempt)
+                if delay is None:
+                    response.raise_for_status()
+                    return await response.json(), response.headers
+            logger.warning(f"GitHub rate limited {method} {url} ({response.status}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request(self, method, url, **kwargs):
+        data, _ = await self._fetch(method, url, **kwargs)
+        return data
+
+    async def iter_collaborators(self, owner_login, repo_name, per_page=100):
+        """
+        Async generator over repository collaborators.
+        After the first page, the remaining pages are fetched with a bounded concurrent fan-out.
+        """
+        url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/collaborators"
+        first_page, headers = await self._fetch("GET", url, params={"page": 1, "per_page": per_page})
+        for collaborator in first_page:
+            yield collaborator
+
+        last_page = last_page_from_link(headers.get("Link"))
+        if not last_page or last_page <= 1:
+            return
+
+        semaphore = asyncio.Semaphore(get_pagination_concurrency())
+
+        async def fetch_page(page):
+            async with semaphore:
+                return await self._request("GET", url, params={"page": page, "per_page": per_page})
+
+        tasks = [asyncio.ensure_future(fetch_page(page)) for page in range(2, last_page + 1)]
+        try:
+            for task in tasks:
+                for collaborator in await task:
+                    yield collaborator
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait until the cancelled pages have stopped and collect their outcomes, so a page
+            # that fails while being cancelled doesn't log "Task exception was never retrieved"
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_all_collaborators(self, owner_login, repo_name):
+        """Get all repository collaborators."""
+        return [c async for c in self.iter_collaborators(owner_login, repo_name)]
+
     async def get_user_info(self):
         """Get authenticated user information."""
         if not self.token:
             raise ValueError("Authentication token required for this operation")
             
-        async with aiohttp.ClientSession() as session:
-            async with session.get(GITHUB_API_USER_URL, headers=self.headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        return await self._request("GET", GITHUB_API_USER_URL)
     
     async def get_repositories(self, page=1, per_page=30):
         """Get user repositories."""
@@ -254,46 +433,31 @@ class GitHubService:
             raise ValueError("Authentication token required for this operation")
             
         params = {"per_page": per_page, "page": page, "sort": "updated", "direction": "desc"}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{GITHUB_API_USER_URL}/repos", headers=self.headers, params=params) as response:
-                response.raise_for_status()
-                return await response.json()
+        return await self._request("GET", f"{GITHUB_API_USER_URL}/repos", params=params)
     
     async def get_pull_request(self, owner_login, repo_name, pr_number):
         """Get specific pull request details."""
         url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/pulls/{pr_number}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        return await self._request("GET", url)
     
     async def get_commit(self, owner_login, repo_name, commit_sha):
         """Get specific commit details."""
         url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/commits/{commit_sha}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        return await self._request("GET", url)
     
     async def post_pr_comment(self, owner_login, repo_name, pr_number, body):
         """Post a comment on a pull request."""
         url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/issues/{pr_number}/comments"
         payload = {"body": body}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=self.headers, json=payload) as response:
-                response.raise_for_status()
-                return await response.json()
+        return await self._request("POST", url, json=payload)
     
     async def post_commit_comment(self, owner_login, repo_name, commit_sha, body):
         """Post a comment on a commit."""
         url = f"{GITHUB_API_BASE_URL}/repos/{owner_login}/{repo_name}/commits/{commit_sha}/comments"
         payload = {"body": body}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=self.headers, json=payload) as response:
-                response.raise_for_status()
-                return await response.json()
+        return await self._request("POST", url, json=payload)
     
     async def verify_webhook_signature(self, payload, signature, secret):
         """Verify the webhook signature from GitHub."""
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Comment, Thread # Assuming Thread model is also in .models
+from .models import Comment, Thread, RepoCollaborator, Repository # Assuming Thread model is also in .models
+from .permissions import invalidate_repository_access
+from .webhooks.secret_index import invalidate_repository_secret
 
 @receiver(post_save, sender=Comment)
 def update_thread_last_comment_info(sender, instance, created, **kwargs):
@@ -8,4 +10,16 @@ def update_thread_last_comment_info(sender, instance, created, **kwargs):
         thread = instance.thread
         thread.last_comment_at = instance.created_at
         thread.updated_at = instance.created_at # Also update thread's general activity timestamp
-        thread.save(update_fields=['last_comment_at', 'updated_at']) 
\ No newline at end of file
+        thread.save(update_fields=['last_comment_at', 'updated_at'])
+
+@receiver(post_save, sender=RepoCollaborator)
+@receiver(post_delete, sender=RepoCollaborator)
+def invalidate_collaborator_access(sender, instance, **kwargs):
+    # Membership changed, so the cached CanAccessRepository answer is stale
+    invalidate_repository_access(instance.repository_id, instance.user_id)
+
+@receiver(post_save, sender=Repository)
+@receiver(post_delete, sender=Repository)
+def invalidate_webhook_secret(sender, instance, **kwargs):
+    # Covers create, delete and regenerate_webhook_secret
+    invalidate_repository_secret(instance.repo_name)
@@ -0,0 +1,50 @@
+import logging
+from typing import Dict, Optional
+
+from celery import current_app
+from django.conf import settings
+from kombu.exceptions import ChannelError
+
+logger = logging.getLogger(__name__)
+
+# Task classes, highest priority first. Tasks declare theirs with
+# @shared_task(queue_class=...); TASK_QUEUES maps each class to a broker queue.
+QUEUE_CLASSES = ('interactive', 'webhook', 'sync', 'maintenance')
+
+def queue_for(queue_class: str) -> str:
+    """Broker queue that tasks of `queue_class` are sent to."""
+    queues = getattr(settings, 'TASK_QUEUES', {})
+    return queues.get(queue_class) or getattr(settings, 'CELERY_TASK_DEFAULT_QUEUE', 'celery')
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router (CELERY_TASK_ROUTES): explicit per-task overrides from
+    TASK_ROUTE_OVERRIDES first, then the task's declared queue_class. A queue passed
+    to apply_async (e.g. interactive re-reviews) still wins over both.
+    """
+    overrides = getattr(settings, 'TASK_ROUTE_OVERRIDES', {})
+    if name in overrides:
+        return {'queue': queue_for(overrides[name])}
+    queue_class = getattr(task, 'queue_class', None)
+    if queue_class:
+        return {'queue': queue_for(queue_class)}
+    return None
+
+def queue_depths() -> Dict[str, Optional[int]]:
+    """Messages waiting per task queue, None where the broker can't be asked."""
+    depths = {}
+    try:
+        with current_app.connection_for_read() as connection:
+            channel = connection.default_channel
+            for queue_class in QUEUE_CLASSES:
+                queue = queue_for(queue_class)
+                try:
+                    depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+                except ChannelError:
+                    depths[queue] = 0 # never used yet, the broker hasn't created it
+                except Exception:
+                    depths[queue] = None
+    except Exception as e:
+        logger.warning(f"Could not read task queue depths: {str(e)}")
+        return {queue_for(queue_class): None for queue_class in QUEUE_CLASSES}
+    return depths
@@ -0,0 +1,2 @@
+# Import task modules so Celery's autodiscovery (which imports core.tasks) registers them
+from . import review_tasks, sync_tasks, thread_tasks, usage_tasks, webhook_tasks  # noqa
@@ -4,14 +4,24 @@ from typing import Dict, Any
 import uuid
 from celery import shared_task
 from django.conf import settings
-import asyncio
-from ..models import Review, Repository, PullRequest, LLMUsage, User, Commit, Thread
-from core.langgraph_client.client import LangGraphClient
-from core.services import GitHubService
+from django.db import transaction
+from ..models import Review, Repository, PullRequest, LLMUsage, User, Commit, Thread, RepoCollaborator
+from core.langgraph_client.runtime import get_langgraph_runtime
+from core.services import GitHubService, get_pull_request_diff_from_github, get_commit_diff_from_github
+from core.review_cache import compute_diff_hash, find_reusable_review, rebind_review_data, review_cache_enabled
+from core.incremental_review import (
+    incremental_review_enabled, find_previous_review, changed_files_between, merge_review_data
+)
+from core.reviewer_index import apply_pull_request_event
+from core.github_mirror import pull_request_fields
+from core.review_progress import ReviewProgressRecorder
+from core.redis_client import get_redis
+from core.permissions import invalidate_repository_access
+from .usage_tasks import calculate_cost, record_llm_usage  # noqa: F401 (calculate_cost is imported from here by views)
 
 logger = logging.getLogger(__name__)
 
-@shared_task(bind=True)
+@shared_task(bind=True, queue_class='webhook')
 def process_webhook_event(self, event_type: str, event_data: Dict[str, Any]) -> None:
     """Process webhook events asynchronously by dispatching to specific task handlers."""
     logger.info(f"Received webhook event: {event_type} with action {event_data.get('action')}")
@@ -34,45 +44,44 @@ def process_webhook_event(self, event_type: str, event_data: Dict[str, Any]) ->
             
             try:
                 repo = Repository.objects.get(repo_name=repo_full_name)
+                # Same fields as the mirror sync, so the PR list is current between syncs
+                pr_defaults = pull_request_fields(pr_data)
+                pr_defaults.pop('pr_number')
                 pr, pr_created = PullRequest.objects.update_or_create(
                     repository=repo,
                     pr_number=pr_number,
-                    defaults={
-                        'url': pr_data.get('html_url'),
-                        'title': pr_data.get('title'),
-                        # 'pr_author': pr_data.get('user', {}).get('login'),
-                        'author_github_id': pr_data.get('user', {}).get('id'),
-                        'body': pr_data.get('body'),
-                        'status': pr_data.get('state'),
-                        'pr_github_id': str(pr_data.get('id')),
-                        'head_sha': pr_data.get('head', {}).get('sha'),
-                        'base_sha': pr_data.get('base', {}).get('sha'),
-                        # 'updated_at_gh': pr_data.get('updated_at'),
-                    }
+                    defaults=pr_defaults
                 )
                 if pr_created:
                     logger.info(f"PR #{pr_number} for repo {repo_full_name} CREATED in DB via webhook task.")
                 else:
                     logger.info(f"PR #{pr_number} for repo {repo_full_name} UPDATED in DB via webhook task.")
 
+                # Keep the local requested-reviewer index in step (review_requested / review_request_removed etc.)
+                apply_pull_request_event(pr, action, event_data)
+
                 if action in ['opened', 'reopened', 'synchronize']:
-                    review, review_created = Review.objects.get_or_create(
-                        repository=repo,
-                        pull_request=pr,
-                        status__in=['pending', 'in_progress'],
-                        defaults={
-                            'status': 'pending',
-                            'review_data': {'message': f'Review initiated by webhook action: {action}.'}
-                        }
-                    )
-                    if review_created:
-                        logger.info(f"PENDING review record CREATED for PR {pr.id}. Enqueuing process_pr_review.")
-                        process_pr_review.delay(event_data, repo.id, pr.id, triggering_user_id=repo.owner.id)
-                    elif review.status == 'pending':
-                        logger.info(f"PENDING review record already exists for PR {pr.id}. Enqueuing process_pr_review.")
-                        process_pr_review.delay(event_data, repo.id, pr.id, triggering_user_id=repo.owner.id)
+                    # At most one pending review per PR; it may sit next to an in_progress run of an older head
+                    with transaction.atomic():
+                        active = list(
+                            Review.objects.select_for_update()
+                            .filter(repository=repo, pull_request=pr, status__in=['pending', 'in_progress'])
+                            .order_by('-created_at')
+                        )
+                        pending = next((r for r in active if r.status == 'pending'), None)
+                        if pending is None:
+                            Review.objects.create(
+                                repository=repo, pull_request=pr, status='pending',
+                                review_data={'message': f'Review initiated by webhook action: {action}.'}
+                            )
+                    if pending:
+                        logger.info(f"PENDING review record already exists for PR {pr.id}. Scheduling debounced process_pr_review.")
+                    elif active:
+                        # A review of an older head is running; the debounced task reviews the new head and supersedes it
+                        logger.info(f"Review {active[0].id} for PR {pr.id} already in progress. Scheduling debounced review of the new head.")
                     else:
-                        logger.info(f"Review for PR {pr.id} already in progress or completed. Status: {review.status}")
+                        logger.info(f"PENDING review record CREATED for PR {pr.id}. Scheduling debounced process_pr_review.")
+                    schedule_debounced_pr_review(event_data, repo, pr, triggering_user_id=repo.owner_id)
                 else:
                     logger.info(f"Skipping AI review for PR action '{action}' on PR {pr.id}")
             except Repository.DoesNotExist:
@@ -116,49 +125,223 @@ def process_webhook_event(self, event_type: str, event_data: Dict[str, Any]) ->
                     else:
                         logger.info(f"Commit {commit_sha:.7} for repo {repo_full_name} UPDATED in DB.")
 
-                    logger.info(f"Commit {db_commit.commit_sha[:7]} processed. AI review for standalone commits via push not auto-triggered by default.")
+                    logger.info(f"Commit {db_commit.commit_hash[:7]} processed. AI review for standalone commits via push not auto-triggered by default.")
 
             except Repository.DoesNotExist:
                 logger.warning(f"Repository {repo_full_name} not found in DB. Cannot process push event.")
+
+        elif event_type == 'member':
+            repo_full_name = event_data.get('repository', {}).get('full_name')
+            member_data = event_data.get('member', {})
+            action = event_data.get('action')
+            if not repo_full_name or not member_data.get('id'):
+                logger.error(f"Missing repo_full_name or member for member event. Data: {event_data}")
+                return
+
+            try:
+                repo = Repository.objects.get(repo_name=repo_full_name)
+                if action == 'added':
+                    user, _ = User.objects.get_or_create(
+                        github_id=str(member_data['id']),
+                        defaults={'username': member_data.get('login'), 'avatar_url': member_data.get('avatar_url')}
+                    )
+                    RepoCollaborator.objects.update_or_create(repository=repo, user=user, defaults={'role': 'member'})
+                elif action == 'removed':
+                    user = User.objects.filter(github_id=str(member_data['id'])).first()
+                    if user is None:
+                        logger.warning(f"User with GitHub ID {member_data['id']} not found when removing collaborator")
+                        return
+                    RepoCollaborator.objects.filter(repository=repo, user=user).delete()
+                else:
+                    user = User.objects.filter(github_id=str(member_data['id'])).first()
+                # Drop the cached membership answer even when no collaborator row changed
+                if user is not None:
+                    invalidate_repository_access(repo.id, user.id)
+                    logger.info(f"Member '{action}' for user {user.id} on repo {repo_full_name}; repository access cache invalidated.")
+            except Repository.DoesNotExist:
+                logger.warning(f"Repository {repo_full_name} not found in DB. Cannot process member event.")
         else:
             logger.info(f"Webhook event type '{event_type}' not configured for detailed processing.")
 
     except Exception as e:
         logger.error(f"Error in top-level process_webhook_event task: {str(e)}", exc_info=True)
 
-@shared_task(bind=True)
-def process_pr_review(self, event_data: Dict[str, Any], repository_id: int, pr_model_id: int,triggering_user_id: int = None) -> None:
+def _pr_review_debounce_key(repository_id: int, pr_number: int) -> str:
+    return f"pr-review-debounce:{repository_id}:{pr_number}"
+
+def schedule_debounced_pr_review(event_data: Dict[str, Any], repo: Repository, pr: PullRequest, triggering_user_id: int = None) -> None:
+    """
+    Coalesce bursts of opened/reopened/synchronize events for one PR.
+
+    Every event replaces the PR's debounce token and schedules process_pr_review after
+    PR_REVIEW_DEBOUNCE_SECONDS; only the task holding the latest token (and the latest
+    head_sha) runs, the others drop out when they wake up. The token lives in the shared
+    Redis, since the webhook task and the review task run in different worker processes.
+    """
+    quiet_period = getattr(settings, 'PR_REVIEW_DEBOUNCE_SECONDS', 30)
+    token = uuid.uuid4().hex
+    try:
+        get_redis().set(_pr_review_debounce_key(repo.id, pr.pr_number), token, ex=quiet_period + 600)
+    except Exception as e:
+        # Without the token the head_sha check still drops superseded pushes
+        logger.warning(f"Could not store PR review debounce token for PR {pr.id}: {e}")
+    process_pr_review.apply_async(
+        args=(event_data, repo.id, pr.id),
+        kwargs={'triggering_user_id': triggering_user_id, 'debounce_token': token},
+        countdown=quiet_period,
+    )
+
+def _pr_review_superseded(event_data: Dict[str, Any], pr: PullRequest, debounce_token: str) -> bool:
+    """True if a newer event for this PR has been scheduled since this task was queued."""
+    try:
+        latest_token = get_redis().get(_pr_review_debounce_key(pr.repository_id, pr.pr_number))
+    except Exception as e:
+        # Fail open: the head_sha check below still drops superseded pushes
+        logger.warning(f"Could not read PR review debounce token for PR {pr.id}: {e}")
+        latest_token = None
+    if latest_token is not None and latest_token.decode() != debounce_token:
+        return True
+    event_head_sha = (event_data.get('pull_request') or {}).get('head', {}).get('sha')
+    current_head_sha = PullRequest.objects.filter(id=pr.id).values_list('head_sha', flat=True).first()
+    return bool(event_head_sha and current_head_sha and event_head_sha != current_head_sha)
+
+def _claim_pr_review(repo: Repository, pr: PullRequest) -> Review:
+    """
+    Move the PR's newest pending review (or a new one) to in_progress. Runs of older heads
+    still in progress are marked superseded, so a PR never has two active reviews.
+    """
+    with transaction.atomic():
+        review = (
+            Review.objects.select_for_update()
+            .filter(repository=repo, pull_request=pr, status='pending')
+            .order_by('-created_at')
+            .first()
+        )
+        if review is None:
+            review = Review.objects.create(
+                repository=repo, pull_request=pr, status='in_progress',
+                review_data={'message': 'Review picked up by Celery task.'}
+            )
+        else:
+            review.status = 'in_progress'
+            review.save(update_fields=['status'])
+        # Older pending rows too: they would otherwise never be picked up
+        superseded = Review.objects.filter(
+            repository=repo, pull_request=pr, status__in=['pending', 'in_progress']
+        ).exclude(pk=review.pk).update(status='superseded', error_message=f"Superseded by review {review.id}")
+    if superseded:
+        logger.info(f"PROCESS_PR_REVIEW_TASK: Review {review.id} superseded {superseded} older review(s) of PR {pr.id}")
+    return review
+
+def _compute_review_diff_hash(review: Review, repo: Repository, repo_settings: Dict[str, Any], pr_number: int = None, commit_sha: str = None):
+    """Fetch the PR/commit diff and store its content hash on the review. Returns None if unavailable."""
+    if not review_cache_enabled():
+        return None
+    github_token = repo.owner.github_access_token
+    if not github_token:
+        return None
+    owner_login, repo_name = repo.repo_name.split('/', 1)
+    try:
+        if pr_number is not None:
+            diff_text = get_pull_request_diff_from_github(github_token, owner_login, repo_name, pr_number)
+        else:
+            diff_text = get_commit_diff_from_github(github_token, owner_login, repo_name, commit_sha)
+    except Exception as e:
+        logger.warning(f"Could not fetch diff for review {review.id}, skipping review cache: {str(e)}")
+        return None
+    diff_hash = compute_diff_hash(diff_text, repo_settings)
+    if review.diff_hash != diff_hash:
+        review.diff_hash = diff_hash
+        review.save(update_fields=['diff_hash'])
+    return diff_hash
+
+def _reuse_cached_review(review: Review, cached_review: Review, usage_user, llm_model: str, thread_title: str, run_values: Dict[str, Any]) -> None:
+    """Complete `review` with the result of an identical earlier review of the same repository."""
+    review.review_data = rebind_review_data(cached_review.review_data, run_values)
+    review.status = 'completed'
+    review.save(update_fields=['review_data', 'status', 'updated_at'])
+
+    # Give the new review its own copy of the conversation so follow-up chat keeps the agent's context.
+    # The thread holds the run input (including the owner's token), so it never leaves its repository.
+    thread_id = None
+    source_thread = None
+    if cached_review.repository_id == review.repository_id:
+        source_thread = cached_review.threads.filter(thread_type='main').order_by('created_at').first()
+    if source_thread:
+        try:
+            runtime = get_langgraph_runtime()
+            thread_id = runtime.run(runtime.get_client().copy_thread(source_thread.thread_id))
+        except Exception as e:
+            logger.warning(f"Could not copy LangGraph thread {source_thread.thread_id}: {str(e)}")
+    Thread.objects.create(
+        review=review,
+        thread_id=thread_id or uuid.uuid4().hex,
+        thread_type='main',
+        title=thread_title,
+        status='open'
+    )
+
+    # Cache hits are free but still recorded so usage dashboards count every review
+    if usage_user:
+        LLMUsage.objects.create(
+            review=review, user=usage_user, llm_model=llm_model,
+            input_tokens=0, output_tokens=0, cost=0.0
+        )
+
+def _progress_recorder(review: Review):
+    """Progress recorder for a streamed LangGraph run, or None when streaming is turned off."""
+    if not getattr(settings, 'LANGGRAPH_STREAM_REVIEWS', True):
+        return None
+    return ReviewProgressRecorder(review.id)
+
+def _finish_progress(runtime, progress: ReviewProgressRecorder, stage: str) -> None:
+    """Write the last checkpoint of a run that did not complete; never masks the original error."""
+    try:
+        runtime.run(progress.finish(stage))
+    except Exception as e:
+        logger.warning(f"Could not record '{stage}' progress for review {progress.review_id}: {str(e)}")
+
+def _resolve_pr_usage_user(triggering_user_id, pr_github_payload):
+    """User that LLMUsage for a PR review is attributed to: the triggering user, else the PR author."""
+    if triggering_user_id:
+        try:
+            user = User.objects.get(id=triggering_user_id)
+            logger.info(f"PROCESS_PR_REVIEW_TASK: LLMUsage will be attributed to triggering user ID: {triggering_user_id}")
+            return user
+        except User.DoesNotExist:
+            logger.warning(f"PROCESS_PR_REVIEW_TASK: Triggering user with ID {triggering_user_id} not found. Falling back to PR author for LLMUsage.")
+
+    pr_author_github_id = str(pr_github_payload.get('user', {}).get('id'))
+    logger.info(f"PROCESS_PR_REVIEW_TASK: LLMUsage will be attributed to PR author GitHub ID: {pr_author_github_id}")
+    user, _ = User.objects.get_or_create(
+        github_id=pr_author_github_id,
+        defaults={
+            'username': pr_github_payload.get('user', {}).get('login', 'unknown_user'),
+            'email': pr_github_payload.get('user', {}).get('email') # Ensure your User model handles potentially null email
+        }
+    )
+    return user
+
+@shared_task(bind=True, queue_class='webhook') # manual triggers pass queue=queue_for('interactive')
+def process_pr_review(self, event_data: Dict[str, Any], repository_id: int, pr_model_id: int,triggering_user_id: int = None, debounce_token: str = None, force_fresh: bool = False) -> None:
     logger.info(f"PROCESS_PR_REVIEW_TASK: Starting for PR ID {pr_model_id}, Repo ID {repository_id}")
     review = None
-    
-    # Create a new event loop for this task execution
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
+    progress = None
+    # LangGraph calls go through the worker's long-lived loop and client
+    runtime = get_langgraph_runtime()
+
     try:
         repo = Repository.objects.get(id=repository_id)
         pr = PullRequest.objects.get(id=pr_model_id, repository=repo)
 
-        review, created = Review.objects.get_or_create(
-            repository=repo, pull_request=pr, status='pending',
-            defaults={'status': 'in_progress', 'review_data': {'message': 'Review picked up by Celery task.'}}
-        )
-        if not created and review.status == 'pending':
-            review.status = 'in_progress'
-            review.save(update_fields=['status'])
-        elif review.status != 'in_progress':
-            logger.warning(f"PROCESS_PR_REVIEW_TASK: Review {review.id} for PR {pr.id} is not 'pending' or 'in_progress' (current: {review.status}). Skipping.")
+        # Debounced webhook reviews: drop this run if a newer push for the PR came in
+        if debounce_token and _pr_review_superseded(event_data, pr, debounce_token):
+            logger.info(f"PROCESS_PR_REVIEW_TASK: Review for PR {pr.id} superseded by a newer event. Dropping.")
             return
 
-        logger.info(f"PROCESS_PR_REVIEW_TASK: Processing review {review.id} for PR {pr.id}")
+        review = _claim_pr_review(repo, pr)
 
-        client = LangGraphClient()
-        # Run the async initialize method
-        loop.run_until_complete(client.initialize())
-        
-        if not client.review_agent:
-            logger.error("PROCESS_PR_REVIEW_TASK: LangGraph review agent not available after initialization.")
-            raise Exception("LangGraph review agent not available.")
+        logger.info(f"PROCESS_PR_REVIEW_TASK: Processing review {review.id} for PR {pr.id}")
 
         pr_github_payload = event_data.get('pull_request', {})
         if not pr_github_payload:
@@ -173,22 +356,91 @@ def process_pr_review(self, event_data: Dict[str, Any], repository_id: int, pr_m
         pr_author_github_id = str(pr_github_payload.get('user', {}).get('id'))
         pr_author_login = pr_github_payload.get('user', {}).get('login', 'unknown_user')
 
+        # Remember which head this review covers; incremental re-reviews diff against it
+        head_sha = pr_github_payload.get('head', {}).get('sha') or pr.head_sha
+        if head_sha and review.head_sha != head_sha:
+            review.head_sha = head_sha
+            review.save(update_fields=['head_sha'])
+
+        # Identical diff + settings reviewed recently? Reuse that result instead of calling LangGraph
+        diff_hash = _compute_review_diff_hash(review, repo, repo_settings, pr_number=pr.pr_number)
+        run_values = {'user': pr_author_login, 'repo': repo.repo_name.split('/')[-1], 'pr_id': pr.pr_number}
+        cached_review = find_reusable_review(diff_hash, repo.id, exclude_review_id=review.id) if diff_hash and not force_fresh else None
+        if cached_review:
+            logger.info(f"PROCESS_PR_REVIEW_TASK: Reusing review {cached_review.id} for review {review.id} (diff hash {diff_hash[:12]})")
+            _reuse_cached_review(
+                review, cached_review,
+                usage_user=_resolve_pr_usage_user(triggering_user_id, pr_github_payload),
+                llm_model=repo_settings['llm_preference'],
+                thread_title='Initial AI Review',
+                run_values=run_values,
+            )
+            return
+
+        # Incremental mode: only files changed since the last completed review of this PR go to the agent
+        previous_review, changed_files = None, None
+        if head_sha and not force_fresh and incremental_review_enabled():
+            previous_review = find_previous_review(pr, head_sha, exclude_review_id=review.id)
+            if previous_review:
+                changed_files = changed_files_between(repo, previous_review.head_sha, head_sha)
+        if changed_files is None:
+            previous_review = None # force-push, rebase or no usable comparison: full review
+        elif not changed_files:
+            logger.info(f"PROCESS_PR_REVIEW_TASK: No file changes since review {previous_review.id}; carrying it forward to review {review.id}")
+            _reuse_cached_review(
+                review, previous_review,
+                usage_user=_resolve_pr_usage_user(triggering_user_id, pr_github_payload),
+                llm_model=repo_settings['llm_preference'],
+                thread_title='Initial AI Review',
+                run_values=run_values,
+            )
+            return
+        else:
+            logger.info(f"PROCESS_PR_REVIEW_TASK: Incremental review {review.id} of {len(changed_files)} file(s) since {previous_review.head_sha[:7]}")
+
+        client = runtime.get_client()
+
+        if not client.review_agent:
+            logger.error("PROCESS_PR_REVIEW_TASK: LangGraph review agent not available after initialization.")
+            raise Exception("LangGraph review agent not available.")
+
+        # Last chance to skip the expensive call if the head moved while we were setting up
+        if debounce_token and _pr_review_superseded(event_data, pr, debounce_token):
+            logger.info(f"PROCESS_PR_REVIEW_TASK: Head of PR {pr.id} moved before review {review.id} started. Leaving it to the newer run.")
+            # The newer event already has its own pending review
+            review.status = 'superseded'
+            review.save(update_fields=['status'])
+            return
+
         logger.info(f"PROCESS_PR_REVIEW_TASK: Calling LangGraph to generate review for review ID {review.id}")
+        progress = _progress_recorder(review)
          # Run the async generate_review method
-        review_result = loop.run_until_complete(client.generate_review(
+        review_result = runtime.run(client.generate_review(
             pr_data=pr_github_payload,
             repo_settings=repo_settings,
-            user_id=pr_author_github_id 
+            user_id=pr_author_github_id,
+            changed_files=changed_files,
+            base_head_sha=previous_review.head_sha if previous_review else None,
+            on_progress=progress,
         ))
+        if progress:
+            runtime.run(progress.finish())
         logger.info(f"PROCESS_PR_REVIEW_TASK: LangGraph review generated for review ID {review.id}")
 
         raw_review_data = review_result.get('review_data', {})
         allowed_review_keys = ["repo", "user", "fixes", "metrics", "reviews", "llm_model", "standards",'final_result']
         filtered_review_data = {key: raw_review_data[key] for key in allowed_review_keys if key in raw_review_data}
+        if previous_review:
+            # Findings for files untouched since the previous review are carried forward
+            filtered_review_data = merge_review_data(
+                previous_review.review_data, filtered_review_data, changed_files,
+                base_review_id=previous_review.id, base_head_sha=previous_review.head_sha,
+            )
         
         review.review_data = filtered_review_data
         review.status = 'completed'
-        review.save()
+        # Leave Review.progress alone: it holds the final checkpoint written by progress.finish()
+        review.save(update_fields=['review_data', 'status', 'updated_at'])
         logger.info(f"PROCESS_PR_REVIEW_TASK: Review {review.id} updated and saved as completed.")
 
         # Create a main thread for this review
@@ -204,31 +456,11 @@ def process_pr_review(self, event_data: Dict[str, Any], repository_id: int, pr_m
             logger.info(f"PROCESS_PR_REVIEW_TASK: Created main thread for review {review.id}")
 
         token_usage_data = review_result.get('token_usage', {})
-        if token_usage_data:
-            user_for_llm_usage = None
-            if triggering_user_id:
-                try:
-                    user_for_llm_usage = User.objects.get(id=triggering_user_id)
-                    logger.info(f"PROCESS_PR_REVIEW_TASK: LLMUsage will be attributed to triggering user ID: {triggering_user_id}")
-                except User.DoesNotExist:
-                    logger.warning(f"PROCESS_PR_REVIEW_TASK: Triggering user with ID {triggering_user_id} not found. Falling back to PR author for LLMUsage.")
-
-            if not user_for_llm_usage: # Fallback to PR author
-                logger.info(f"PROCESS_PR_REVIEW_TASK: LLMUsage will be attributed to PR author GitHub ID: {pr_author_github_id}")
-                user_for_llm_usage, _ = User.objects.get_or_create(
-                    github_id=pr_author_github_id,
-                    defaults={
-                        'username': pr_author_login,
-                        'email': pr_github_payload.get('user', {}).get('email') # Ensure your User model handles potentially null email
-                    }
-                )
-            
-            LLMUsage.objects.create(
-                review=review, user=user_for_llm_usage,
-                llm_model=repo_settings['llm_preference'],
-                input_tokens=token_usage_data.get('prompt_tokens', 0),
-                output_tokens=token_usage_data.get('completion_tokens', 0),
-                cost=calculate_cost(token_usage_data, repo_settings['llm_preference'])
+        if token_usage_data or review_result.get('run_id'):
+            user_for_llm_usage = _resolve_pr_usage_user(triggering_user_id, pr_github_payload)
+            record_llm_usage(
+                review, user_for_llm_usage, repo_settings['llm_preference'],
+                token_usage_data, run_id=review_result.get('run_id'),
             )
             logger.info(f"PROCESS_PR_REVIEW_TASK: LLM usage recorded for review {review.id} by user {user_for_llm_usage.username}.")
 
@@ -260,17 +492,29 @@ def process_pr_review(self, event_data: Dict[str, Any], repository_id: int, pr_m
     except Exception as e:
         task_id = self.request.id if self.request else "N/A"
         logger.error(f"PROCESS_PR_REVIEW_TASK: Unhandled error in task {task_id} for Review ID {review.id if review else 'N/A'}: {str(e)}", exc_info=True)
+        runtime.mark_stale() # re-check the assistants before the next run
         if review and review.status != 'completed':
             review.status = 'failed'
             review.error_message = str(e)[:1023]
             review.save(update_fields=['status', 'error_message'])
+        if progress and progress.progress['stage'] == 'running':
+            _finish_progress(runtime, progress, 'failed')
         raise
-    finally:
-        # Ensure the loop is closed
-        loop.close()
-        asyncio.set_event_loop(None) # Clear the event loop for the current thread
-@shared_task(bind=True)
-def process_commit_review(self, event_data: Dict[str, Any], repository_id: int, commit_model_id: int) -> None:
+
+def _resolve_commit_usage_user(repo: Repository, commit: Commit):
+    """User that LLMUsage for a commit review is attributed to (the repository owner)."""
+    commit_author_name = getattr(commit, 'author_name', 'unknown_user')
+    author_user, _ = User.objects.get_or_create(
+        github_id=repo.owner.github_id if repo.owner.github_id else f"unknown_{commit_author_name}",
+        defaults={
+            'username': commit_author_name,
+            'email': getattr(commit, 'author_email', None)
+        }
+    )
+    return author_user
+
+@shared_task(bind=True, queue_class='interactive')
+def process_commit_review(self, event_data: Dict[str, Any], repository_id: int, commit_model_id: int, force_fresh: bool = False) -> None:
     """
     Process an AI review for a standalone commit.
     
@@ -278,11 +522,12 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
         event_data: Dictionary of GitHub webhook data or manually prepared data
         repository_id: ID of the Repository model instance
         commit_model_id: ID of the Commit model instance
+        force_fresh: Skip the diff-hash review cache and always call LangGraph
     """
     logger.info(f"PROCESS_COMMIT_REVIEW_TASK: Starting for Commit ID {commit_model_id}, Repo ID {repository_id}")
     review = None
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    progress = None
+    runtime = get_langgraph_runtime()
     try:
         repo = Repository.objects.get(id=repository_id)
         commit = Commit.objects.get(id=commit_model_id, repository=repo)
@@ -303,14 +548,6 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
         
         logger.info(f"PROCESS_COMMIT_REVIEW_TASK: Processing review {review.id} for Commit {commit.id}")
         
-        # Initialize LangGraph client
-        client = LangGraphClient()
-        loop.run_until_complete(client.initialize())
-        
-        if not client.review_agent:
-            logger.error("PROCESS_COMMIT_REVIEW_TASK: LangGraph review agent not available after initialization.")
-            raise Exception("LangGraph review agent not available.")
-        
         # Prepare commit data for LangGraph
         commit_github_data = event_data.get('commit', {})
         if not commit_github_data:
@@ -344,6 +581,29 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
         commit_author_github_id = commit.author_github_id
         commit_author_name = getattr(commit, 'author_name', 'unknown_user')
         
+        # Identical diff + settings reviewed recently? Reuse that result instead of calling LangGraph
+        diff_hash = _compute_review_diff_hash(review, repo, repo_settings, commit_sha=commit.commit_hash)
+        owner_login, repo_short_name = repo.repo_name.split('/', 1)
+        run_values = {'user': owner_login, 'repo': repo_short_name, 'pr_id': ''}
+        cached_review = find_reusable_review(diff_hash, repo.id, exclude_review_id=review.id) if diff_hash and not force_fresh else None
+        if cached_review:
+            logger.info(f"PROCESS_COMMIT_REVIEW_TASK: Reusing review {cached_review.id} for review {review.id} (diff hash {diff_hash[:12]})")
+            _reuse_cached_review(
+                review, cached_review,
+                usage_user=_resolve_commit_usage_user(repo, commit),
+                llm_model=repo_settings['llm_preference'],
+                thread_title='Initial Commit AI Review',
+                run_values=run_values,
+            )
+            return
+
+        # Worker-scoped LangGraph client, assistants already loaded
+        client = runtime.get_client()
+        
+        if not client.review_agent:
+            logger.error("PROCESS_COMMIT_REVIEW_TASK: LangGraph review agent not available after initialization.")
+            raise Exception("LangGraph review agent not available.")
+        
         # Generate review using LangGraph
         logger.info(f"PROCESS_COMMIT_REVIEW_TASK: Calling LangGraph to generate review for commit review ID {review.id}")
         
@@ -358,12 +618,16 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
             },
             'commit_sha': commit.commit_hash
         }
-        review_result = loop.run_until_complete(
+        progress = _progress_recorder(review)
+        review_result = runtime.run(
             client.generate_review(
                 pr_data=input_data,  # We reuse the PR review function but with commit data
                 repo_settings=repo_settings,
-                user_id=repo.owner.github_id if repo.owner else None,)
+                user_id=repo.owner.github_id if repo.owner else None,
+                on_progress=progress,)
         )
+        if progress:
+            runtime.run(progress.finish())
         logger.info(f"PROCESS_COMMIT_REVIEW_TASK: LangGraph review generated for review ID {review.id}")
         
         raw_review_data = review_result.get('review_data', {})
@@ -372,7 +636,8 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
         
         review.review_data = filtered_review_data
         review.status = 'completed'
-        review.save()
+        # Leave Review.progress alone: it holds the final checkpoint written by progress.finish()
+        review.save(update_fields=['review_data', 'status', 'updated_at'])
         logger.info(f"PROCESS_COMMIT_REVIEW_TASK: Review {review.id} updated and saved as completed.")
         
         # Create a main thread for this review
@@ -389,21 +654,11 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
         
         # Record token usage
         token_usage_data = review_result.get('token_usage', {})
-        if token_usage_data:
-            author_user, _ = User.objects.get_or_create(
-                github_id=repo.owner.github_id if repo.owner.github_id else f"unknown_{commit_author_name}",
-                defaults={
-                    'username': commit_author_name,
-                    'email': getattr(commit, 'author_email', None)
-                }
-            )
-            LLMUsage.objects.create(
-                review=review,
-                user=author_user,
-                llm_model=repo_settings['llm_preference'],
-                input_tokens=token_usage_data.get('input_tokens', 0),
-                output_tokens=token_usage_data.get('output_tokens', 0),
-                cost=calculate_cost(token_usage_data, repo_settings['llm_preference'])
+        if token_usage_data or review_result.get('run_id'):
+            author_user = _resolve_commit_usage_user(repo, commit)
+            record_llm_usage(
+                review, author_user, repo_settings['llm_preference'],
+                token_usage_data, run_id=review_result.get('run_id'),
             )
             logger.info(f"PROCESS_COMMIT_REVIEW_TASK: LLM usage recorded for review {review.id}")
         
@@ -440,34 +695,11 @@ def process_commit_review(self, event_data: Dict[str, Any], repository_id: int,
     except Exception as e:
         task_id = self.request.id if self.request else "N/A"
         logger.error(f"PROCESS_COMMIT_REVIEW_TASK: Unhandled error in task {task_id} for Review ID {review.id if review else 'N/A'}: {str(e)}", exc_info=True)
+        runtime.mark_stale()
         if review and review.status != 'completed':
             review.status = 'failed'
             review.error_message = str(e)[:1023]
             review.save(update_fields=['status', 'error_message'])
+        if progress and progress.progress['stage'] == 'running':
+            _finish_progress(runtime, progress, 'failed')
         raise
-
-def calculate_cost(token_usage: Dict[str, int], model: str) -> float:
-    """Calculate the cost of token usage based on the model."""
-    input_cost_per_token = 0.00001  # Default
-    output_cost_per_token = 0.00002 # Default
-
-    model_key = model.lower()
-    PRICING = {
-        "gpt-4": {"input": 0.00003, "output": 0.00006},
-        "cerebras::llama-3.3-70b": {"input": 0.0000026, "output": 0.0000035}, # Made up, adjust
-        "default": {"input": 0.00001, "output": 0.00002}
-    }
-
-    for key_part in PRICING:
-        if key_part in model_key:
-            input_cost_per_token = PRICING[key_part]["input"]
-            output_cost_per_token = PRICING[key_part]["output"]
-            break
-    
-    input_tokens = token_usage.get('input_tokens', 0) or 0
-    output_tokens = token_usage.get('output_tokens', 0) or 0
-    
-    input_cost = input_tokens * input_cost_per_token
-    output_cost = output_tokens * output_cost_per_token
-    
-    return round(input_cost + output_cost, 6) 
\ No newline at end of file
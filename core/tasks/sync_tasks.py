@@ -0,0 +1,61 @@
+import logging
+
+import requests
+from celery import shared_task
+from django.conf import settings
+from redis.exceptions import LockError
+
+from ..models import Repository
+from ..redis_client import get_redis
+from core.github_mirror import sync_repository
+
+logger = logging.getLogger(__name__)
+
+def _sync_lock_key(repository_id: int) -> str:
+    return f"github-mirror-sync:{repository_id}"
+
+@shared_task(bind=True, ignore_result=True, queue_class='sync')
+def sync_github_mirrors(self) -> None:
+    """Beat entry point: queue a mirror sync for every registered repository whose owner has a token."""
+    repository_ids = list(
+        Repository.objects.filter(owner__github_access_token__isnull=False)
+        .exclude(owner__github_access_token='')
+        .values_list('id', flat=True)
+    )
+    for repository_id in repository_ids:
+        sync_repository_mirror.delay(repository_id)
+    logger.info(f"Queued GitHub mirror sync for {len(repository_ids)} repositories.")
+
+@shared_task(bind=True, ignore_result=True, queue_class='sync', max_retries=3)
+def sync_repository_mirror(self, repository_id: int) -> None:
+    """
+    Incrementally mirror one repository's PRs and commits; skipped while another sync of it
+    runs. A walk cut short by GITHUB_MIRROR_MAX_PAGES queues the next round right away.
+    """
+    lock_timeout = getattr(settings, 'GITHUB_MIRROR_SYNC_INTERVAL', 300) * 2
+    # Redis lock, so it holds across worker processes and hosts
+    lock = get_redis().lock(_sync_lock_key(repository_id), timeout=lock_timeout)
+    if not lock.acquire(blocking=False):
+        logger.info(f"Mirror sync of repository {repository_id} already running, skipping.")
+        return
+    try:
+        try:
+            repository = Repository.objects.select_related('owner').get(id=repository_id)
+        except Repository.DoesNotExist:
+            logger.warning(f"Repository {repository_id} no longer exists, skipping mirror sync.")
+            return
+        counts = sync_repository(repository)
+        if counts:
+            logger.info(f"Mirrored {counts['pull_requests']} PRs and {counts['commits']} commits for {repository.repo_name}.")
+        if counts.get('truncated'):
+            sync_repository_mirror.apply_async(args=(repository_id,), countdown=5)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"GitHub error during mirror sync of repository {repository_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
+    except Exception as e:
+        logger.error(f"Mirror sync of repository {repository_id} failed: {str(e)}", exc_info=True)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"Mirror sync lock of repository {repository_id} expired before release")
@@ -0,0 +1,71 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from ..models import Comment, User
+from core.langgraph_client.limiter import LLMRateLimitTimeout
+from core.langgraph_client.runtime import get_langgraph_runtime
+from core.thread_reply import get_ai_user, feedback_context, save_ai_reply, save_error_reply
+
+logger = logging.getLogger(__name__)
+
+# acks_late: a worker dying mid-run gets the task redelivered (the guard below skips answered comments)
+@shared_task(
+    bind=True, ignore_result=True, queue_class='interactive', acks_late=True,
+    soft_time_limit=getattr(settings, 'THREAD_REPLY_TIME_LIMIT', 600),
+    time_limit=getattr(settings, 'THREAD_REPLY_TIME_LIMIT', 600) + 60,
+)
+def process_thread_reply(self, user_comment_id: int, user_id: int, run_id: str = None) -> None:
+    """
+    Offloaded ThreadViewSet.reply: run the feedback agent for an already saved user
+    comment and store the AI answer as a reply to it (or an error comment). With run_id
+    it only waits for a run that is already going (a reply stream the client dropped).
+    """
+    try:
+        user_comment = Comment.objects.select_related('thread__review__repository').get(id=user_comment_id)
+        user = User.objects.get(id=user_id)
+    except (Comment.DoesNotExist, User.DoesNotExist) as e:
+        logger.error(f"PROCESS_THREAD_REPLY_TASK: Comment {user_comment_id} or user {user_id} not found: {str(e)}")
+        return
+    thread = user_comment.thread
+
+    # Redelivered task: the reply already exists
+    if Comment.objects.filter(parent_comment=user_comment, type__in=['response', 'error']).exists():
+        return
+
+    ai_user = get_ai_user()
+    runtime = get_langgraph_runtime()
+    try:
+        client = runtime.get_client()
+        if run_id:
+            response = runtime.run(client.finish_feedback(thread.thread_id, run_id))
+            save_ai_reply(thread, ai_user, user_comment, response, usage_user=user)
+            logger.info(f"PROCESS_THREAD_REPLY_TASK: Finished run {run_id} for comment {user_comment.id} in thread {thread.id}")
+            return
+        is_first_message, review_data, repo_settings = feedback_context(thread)
+        response = runtime.run(client.handle_feedback(
+            feedback=user_comment.comment,
+            thread_id=thread.thread_id,
+            user_id=str(user.github_id),
+            is_first_message=is_first_message,
+            review_data=review_data,
+            repo_settings=repo_settings,
+            llm_model=thread.review.repository.llm_preference or settings.DEFAULT_LLM_MODEL,
+            # Leave the run itself time to finish before the soft time limit
+            max_wait=getattr(settings, 'THREAD_REPLY_MAX_WAIT', 240),
+        ))
+        save_ai_reply(thread, ai_user, user_comment, response, usage_user=user)
+        logger.info(f"PROCESS_THREAD_REPLY_TASK: Replied to comment {user_comment.id} in thread {thread.id}")
+    except LLMRateLimitTimeout as e:
+        # The model stayed saturated; free the worker and try again later
+        max_retries = getattr(settings, 'THREAD_REPLY_MAX_RETRIES', 2)
+        if self.request.retries < max_retries:
+            logger.info(f"PROCESS_THREAD_REPLY_TASK: No LLM slot for comment {user_comment.id}, retrying: {str(e)}")
+            raise self.retry(exc=e, countdown=30 * 2 ** self.request.retries, max_retries=max_retries)
+        logger.warning(f"PROCESS_THREAD_REPLY_TASK: Giving up on comment {user_comment.id} after {self.request.retries} retries: {str(e)}")
+        save_error_reply(thread, ai_user, user_comment, Exception("the AI model is busy right now. Please try again in a few minutes."))
+    except Exception as e:
+        logger.error(f"PROCESS_THREAD_REPLY_TASK: Error processing reply to comment {user_comment.id}: {str(e)}", exc_info=True)
+        runtime.mark_stale()
+        save_error_reply(thread, ai_user, user_comment, e)
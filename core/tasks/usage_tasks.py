@@ -0,0 +1,91 @@
+import logging
+from typing import Dict, Optional
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+
+from ..models import LLMUsage
+from core.langgraph_client.runtime import get_langgraph_runtime
+
+logger = logging.getLogger(__name__)
+
+def calculate_cost(token_usage: Dict[str, int], model: str) -> float:
+    """Calculate the cost of token usage based on the model."""
+    input_cost_per_token = 0.00001  # Default
+    output_cost_per_token = 0.00002 # Default
+
+    model_key = model.lower()
+    PRICING = {
+        "gpt-4": {"input": 0.00003, "output": 0.00006},
+        "cerebras::llama-3.3-70b": {"input": 0.0000026, "output": 0.0000035}, # Made up, adjust
+        "default": {"input": 0.00001, "output": 0.00002}
+    }
+
+    for key_part in PRICING:
+        if key_part in model_key:
+            input_cost_per_token = PRICING[key_part]["input"]
+            output_cost_per_token = PRICING[key_part]["output"]
+            break
+    
+    input_tokens = token_usage.get('input_tokens', 0) or 0
+    output_tokens = token_usage.get('output_tokens', 0) or 0
+    
+    input_cost = input_tokens * input_cost_per_token
+    output_cost = output_tokens * output_cost_per_token
+    
+    return round(input_cost + output_cost, 6)
+
+def record_llm_usage(review, user, llm_model: str, token_usage: Optional[Dict[str, int]], run_id: Optional[str] = None) -> LLMUsage:
+    """
+    Record usage for a LangGraph run. When the run's messages did not report usage, a
+    zero row is written now and backfilled from LangSmith once it has processed the run.
+    """
+    token_usage = token_usage or {}
+    pending = not token_usage and bool(run_id)
+    usage = LLMUsage.objects.create(
+        review=review, user=user, llm_model=llm_model,
+        input_tokens=token_usage.get('input_tokens', 0) or 0,
+        output_tokens=token_usage.get('output_tokens', 0) or 0,
+        cost=calculate_cost(token_usage, llm_model),
+        run_id=run_id,
+        usage_pending=pending,
+    )
+    if pending:
+        transaction.on_commit(lambda: _schedule_backfill(usage.id))
+    return usage
+
+def _schedule_backfill(usage_id: int) -> None:
+    try:
+        backfill_llm_usage.apply_async(args=[usage_id], countdown=getattr(settings, 'LLM_USAGE_BACKFILL_DELAY', 10))
+    except Exception as e:
+        logger.warning(f"Could not schedule LLM usage backfill for usage {usage_id}: {str(e)}")
+
+@shared_task(bind=True, ignore_result=True, max_retries=None, queue_class='maintenance')
+def backfill_llm_usage(self, usage_id: int) -> None:
+    """Fill in token counts for an LLMUsage row from LangSmith, retrying with backoff until the run shows up."""
+    usage = LLMUsage.objects.filter(id=usage_id, usage_pending=True).first()
+    if not usage:
+        return
+
+    try:
+        token_usage = get_langgraph_runtime().client.read_run_usage(usage.run_id)
+    except Exception as e:
+        logger.warning(f"LangSmith lookup for run {usage.run_id} failed: {str(e)}")
+        token_usage = None
+
+    if token_usage is None:
+        max_retries = getattr(settings, 'LLM_USAGE_BACKFILL_MAX_RETRIES', 6)
+        if self.request.retries >= max_retries:
+            logger.error(f"Giving up on LLM usage backfill for usage {usage_id} (run {usage.run_id}).")
+            return
+        delay = getattr(settings, 'LLM_USAGE_BACKFILL_DELAY', 10)
+        raise self.retry(countdown=delay * 2 ** self.request.retries)
+
+    LLMUsage.objects.filter(id=usage_id).update(
+        input_tokens=token_usage['input_tokens'],
+        output_tokens=token_usage['output_tokens'],
+        cost=calculate_cost(token_usage, usage.llm_model),
+        usage_pending=False,
+    )
+    logger.info(f"Backfilled LLM usage {usage_id} from run {usage.run_id}.")
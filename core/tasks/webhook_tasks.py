@@ -0,0 +1,18 @@
+import logging
+
+from celery import shared_task
+
+from core.webhooks.event_log import flush_event_log_buffer
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True, ignore_result=True, queue_class='maintenance')
+def flush_webhook_event_log(self) -> None:
+    """Move buffered WebhookEventLog rows from Redis into the database."""
+    try:
+        flushed = flush_event_log_buffer()
+    except Exception as e:
+        logger.error(f"Webhook event log flush failed: {str(e)}", exc_info=True)
+        return
+    if flushed:
+        logger.info(f"Flushed {flushed} webhook event log entries.")
@@ -1,3 +1,1190 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import decimal
+import uuid
+from io import BytesIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .github_mirror import sync_repository
+from .models import User, Repository, RepoCollaborator, PullRequest, Commit, Review, Thread, Comment, WebhookEventLog, LLMUsage
+from rest_framework.renderers import JSONRenderer
+
+from .query_plans import with_review_plan
+from . import fastjson, renderers
+from .renderers import FastJSONParser, FastJSONRenderer
+from .serializers import ReviewSerializer
+
+
+class ReviewTestCase(TestCase):
+    """A repository with a PR; add_review() adds reviews with threads and comments."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(github_id='1', username='owner')
+        cls.repository = Repository.objects.create(
+            owner=cls.owner, repo_name='owner/repo', repo_url='https://github.com/owner/repo'
+        )
+        cls.pull_request = PullRequest.objects.create(
+            repository=cls.repository, pr_github_id='100', pr_number=1, title='PR',
+            author_github_id='1', status='open', url='https://github.com/owner/repo/pull/1'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def add_review(self, threads=2, comments=3):
+        review = Review.objects.create(
+            repository=self.repository, pull_request=self.pull_request, status='completed', review_data={}
+        )
+        for t in range(threads):
+            thread = Thread.objects.create(review=review, thread_id=f'{review.id}-{t}', created_by=self.owner)
+            for c in range(comments):
+                author = User.objects.create_user(github_id=f'{thread.thread_id}-{c}', username=f'user-{thread.thread_id}-{c}')
+                Comment.objects.create(thread=thread, user=author, comment=f'comment {c}', type='request')
+        return review
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        return len(queries)
+
+
+class ReviewQueryCountTests(ReviewTestCase):
+    """Serializing reviews with threads and comments must not issue a query per object."""
+
+    def test_review_list_query_count_is_constant(self):
+        self.add_review(threads=1, comments=1)
+        expected = self.count_queries(lambda: self.client.get('/api/v1/reviews/'))
+        for _ in range(3):
+            self.add_review()
+        with self.assertNumQueries(expected):
+            response = self.client.get('/api/v1/reviews/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(sorted(review['thread_count'] for review in response.data['results']), [1, 2, 2, 2])
+
+    def test_review_retrieve_query_count_is_constant(self):
+        small = self.add_review(threads=1, comments=1)
+        large = self.add_review(threads=5, comments=4)
+        expected = self.count_queries(lambda: self.client.get(f'/api/v1/reviews/{small.id}/'))
+        with self.assertNumQueries(expected):
+            response = self.client.get(f'/api/v1/reviews/{large.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['thread_count'], 5)
+        self.assertEqual([thread['comment_count'] for thread in response.data['threads']], [4] * 5)
+
+    def test_thread_list_query_count_is_constant(self):
+        self.add_review(threads=1, comments=1)
+        expected = self.count_queries(lambda: self.client.get('/api/v1/threads/'))
+        self.add_review(threads=4, comments=5)
+        with self.assertNumQueries(expected):
+            response = self.client.get('/api/v1/threads/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(thread['comment_count'] for thread in response.data['results']), [1, 5, 5, 5, 5])
+
+    def test_review_plan_serializes_in_constant_queries(self):
+        for _ in range(3):
+            self.add_review()
+        # reviews + threads + comments
+        with self.assertNumQueries(3):
+            data = ReviewSerializer(with_review_plan(Review.objects.all()), many=True).data
+        self.assertEqual([len(review['threads']) for review in data], [2, 2, 2])
+
+
+class SparseFieldsetTests(ReviewTestCase):
+    """?fields= / ?omit= trim both the payload and the columns that are loaded."""
+
+    def select_sql(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in queries if q['sql'].startswith('SELECT')]
+
+    def test_history_skips_review_data_and_threads(self):
+        self.add_review()
+        response, queries = self.select_sql(f'/api/v1/reviews/history/?context=pr&id={self.pull_request.id}')
+        self.assertNotIn('review_data', response.data['results'][0])
+        self.assertNotIn('threads', response.data['results'][0])
+        self.assertIn('commit', response.data['results'][0])
+        self.assertFalse(any('"review_data"' in sql for sql in queries))
+        self.assertFalse(any('"core_thread"' in sql for sql in queries))
+
+    def test_fields_limits_list_payload(self):
+        self.add_review()
+        response, queries = self.select_sql('/api/v1/reviews/?fields=id,status,threads.id,threads.comments.comment')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'threads'})
+        self.assertEqual(set(response.data['results'][0]['threads'][0]), {'id', 'comments'})
+        self.assertEqual(set(response.data['results'][0]['threads'][0]['comments'][0]), {'comment'})
+        self.assertFalse(any('"comment_data"' in sql or '"review_data"' in sql for sql in queries))
+
+    def test_omit_nested_comment_data(self):
+        self.add_review()
+        response, queries = self.select_sql('/api/v1/threads/?omit=comment_count,comments.comment_data')
+        self.assertNotIn('comment_count', response.data['results'][0])
+        self.assertNotIn('comment_data', response.data['results'][0]['comments'][0])
+        self.assertIn('user', response.data['results'][0]['comments'][0])
+        self.assertFalse(any('"comment_data"' in sql for sql in queries))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_orjson_output_matches_drf_json_renderer(self):
+        data = {
+            'created_at': datetime.datetime(2025, 1, 1, 12, 0, 0, 5, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2025, 1, 1),
+            'cost': decimal.Decimal('0.0125'),
+            'run_id': uuid.UUID('12345678123456781234567812345678'),
+            'duration': datetime.timedelta(seconds=1.5),
+            'text': 'caf\u00e9 \u2028',
+            1: [None, True, 2**62],
+        }
+        expected = JSONRenderer().render(data)
+        # Fails if the renderer falls back to JSONRenderer instead of using orjson
+        with mock.patch.object(JSONRenderer, 'render', side_effect=AssertionError('fell back to JSONRenderer')):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_integers_orjson_cannot_encode_fall_back_to_drf(self):
+        data = {'big': [2**70, -2**70], 'cost': decimal.Decimal('1.5')}
+        with mock.patch.object(JSONRenderer, 'render', autospec=True, side_effect=JSONRenderer.render) as fallback:
+            self.assertEqual(FastJSONRenderer().render(data), b'{"big":[1180591620717411303424,-1180591620717411303424],"cost":1.5}')
+        fallback.assert_called_once()
+
+    def test_parser_round_trip(self):
+        body = FastJSONRenderer().render({'review_data': {'reviews': [{'line': 1}]}})
+        self.assertEqual(FastJSONParser().parse(BytesIO(body), parser_context={}), {'review_data': {'reviews': [{'line': 1}]}})
+
+
+class CursorPaginationTests(ReviewTestCase):
+    def test_walks_history_forward_and_back_without_gaps(self):
+        reviews = [self.add_review(threads=0) for _ in range(7)]
+        # Same created_at for several rows: the id tie-breaker keeps pages disjoint
+        Review.objects.filter(id__in=[r.id for r in reviews[2:5]]).update(created_at=reviews[2].created_at)
+        expected = list(Review.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        url, seen, pages = f'/api/v1/reviews/history/?context=pr&id={self.pull_request.id}&page_size=3', [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([review['id'] for review in response.data['results']])
+            seen += pages[-1]
+            last, url = response, response.data['next']
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([review['id'] for review in previous.data['results']], pages[1])
+
+    def test_deep_page_costs_the_same_as_first(self):
+        for _ in range(9):
+            self.add_review(threads=0)
+        first = self.client.get('/api/v1/reviews/?page_size=2')
+        expected = self.count_queries(lambda: self.client.get('/api/v1/reviews/?page_size=2'))
+        url = first.data['next']
+        for _ in range(3):
+            url = self.client.get(url).data['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(queries), expected)
+        self.assertFalse(any('OFFSET' in q['sql'] for q in queries))
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/api/v1/reviews/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+def _gh_pr(number, updated_at):
+    return {
+        'id': 1000 + number, 'number': number, 'title': f'PR {number}', 'body': '', 'state': 'open',
+        'html_url': f'https://github.com/owner/repo/pull/{number}', 'user': {'id': 7, 'login': 'dev'},
+        'head': {'sha': f'h{number}'}, 'base': {'sha': 'b'},
+        'created_at': '2025-01-01T00:00:00Z', 'updated_at': updated_at, 'closed_at': None, 'merged_at': None,
+    }
+
+def _gh_commit(sha, date):
+    person = {'name': 'Dev', 'email': 'dev@example.com', 'date': date}
+    return {'sha': sha, 'html_url': f'https://github.com/owner/repo/commit/{sha}', 'author': {'id': 7}, 'committer': None,
+            'commit': {'message': f'commit {sha}', 'author': person, 'committer': person}}
+
+def _gh_response(status_code=200, body=None, headers=None, url='https://api.github.com/'):
+    """A requests.Response as GitHub would send it."""
+    import requests
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'' if body is None else fastjson.dumps(body)
+    response.headers.update(headers or {})
+    response.url = url
+    return response
+
+@mock.patch('core.github_mirror.PAGE_SIZE', 2)
+class GitHubMirrorTests(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner.github_access_token = 'token'
+        self.owner.save(update_fields=['github_access_token'])
+        self.repository.refresh_from_db()
+
+    def test_incremental_sync_stops_at_watermark(self):
+        pulls = [_gh_pr(n, f'2025-01-0{n}T00:00:00Z') for n in (5, 4, 3, 2)]
+        with mock.patch('core.github_mirror.get_repository_pull_requests_from_github',
+                        side_effect=lambda **kw: pulls[(kw['page'] - 1) * 2:kw['page'] * 2]) as list_pulls, \
+             mock.patch('core.github_mirror.get_repository_commits_from_github',
+                        return_value=[_gh_commit('c1', '2025-01-03T00:00:00Z')]) as list_commits:
+            self.assertEqual(sync_repository(self.repository), {'pull_requests': 4, 'commits': 1, 'truncated': False})
+            self.assertEqual(list_pulls.call_count, 3)
+            self.assertIsNone(list_commits.call_args.kwargs['since'])
+
+            # #6 is new and #5 falls inside the overlap window; the walk ends at #4
+            pulls.insert(0, _gh_pr(6, '2025-01-07T00:00:00Z'))
+            list_pulls.reset_mock()
+            self.assertEqual(sync_repository(self.repository), {'pull_requests': 2, 'commits': 1, 'truncated': False})
+            self.assertEqual(list_pulls.call_count, 2)
+            self.assertTrue(list_commits.call_args.kwargs['since'].startswith('2025-01-02T23:55'))
+
+        self.repository.refresh_from_db()
+        self.assertEqual(self.repository.pulls_synced_until.isoformat(), '2025-01-07T00:00:00+00:00')
+        self.assertEqual(PullRequest.objects.filter(repository=self.repository, user_login='dev').count(), 5)
+        self.assertEqual(Commit.objects.get(commit_hash='c1').author_email, 'dev@example.com')
+
+    def test_truncated_walk_resumes_instead_of_moving_the_watermark(self):
+        pulls = [_gh_pr(n, f'2025-01-0{n}T00:00:00Z') for n in (5, 4, 3, 2)]
+        with self.settings(GITHUB_MIRROR_MAX_PAGES=1), \
+             mock.patch('core.github_mirror.get_repository_pull_requests_from_github',
+                        side_effect=lambda **kw: pulls[(kw['page'] - 1) * 2:kw['page'] * 2]) as list_pulls, \
+             mock.patch('core.github_mirror.get_repository_commits_from_github', return_value=[]):
+            self.assertTrue(sync_repository(self.repository)['truncated'])
+            self.assertIsNone(self.repository.pulls_synced_until)
+            self.assertEqual(self.repository.mirror_cursor['pulls']['page'], 2)
+            sync_repository(self.repository)
+            self.assertFalse(sync_repository(self.repository)['truncated'])
+        self.assertEqual([c.kwargs['page'] for c in list_pulls.call_args_list], [1, 2, 3])
+        self.repository.refresh_from_db()
+        self.assertEqual(self.repository.pulls_synced_until.isoformat(), '2025-01-05T00:00:00+00:00')
+        self.assertEqual(self.repository.mirror_cursor, {})
+        self.assertEqual(PullRequest.objects.filter(repository=self.repository, user_login='dev').count(), 4)
+
+    def test_list_is_served_from_the_mirror(self):
+        with mock.patch('core.github_mirror.request_refresh', return_value=True) as refresh:
+            response = self.client.get(f'/api/v1/pull-requests/?repo_id={self.repository.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([pr['pr_number'] for pr in response.data], [1])
+        self.assertEqual(response['X-Mirror-Synced-At'], 'never')
+        self.assertEqual(response['X-Mirror-Refresh'], 'queued') # never synced
+        refresh.assert_called_once()
+
+class PRReviewDebounceTests(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pull_request.head_sha = 'new'
+        self.pull_request.save(update_fields=['head_sha'])
+
+    def event(self, sha):
+        return {'pull_request': {'head': {'sha': sha}}}
+
+    @mock.patch('core.tasks.review_tasks.get_redis')
+    def test_only_the_latest_token_runs(self, get_redis):
+        from .tasks.review_tasks import _pr_review_superseded
+        get_redis.return_value.get.return_value = b'latest'
+        self.assertTrue(_pr_review_superseded(self.event('new'), self.pull_request, 'older'))
+        self.assertFalse(_pr_review_superseded(self.event('new'), self.pull_request, 'latest'))
+
+    @mock.patch('core.tasks.review_tasks.get_redis', side_effect=ConnectionError)
+    def test_fails_open_to_the_head_sha_check(self, get_redis):
+        from .tasks.review_tasks import _pr_review_superseded
+        self.assertFalse(_pr_review_superseded(self.event('new'), self.pull_request, 'any'))
+        self.assertTrue(_pr_review_superseded(self.event('old'), self.pull_request, 'any'))
+
+class TaskRoutingTests(ReviewTestCase):
+    def route(self, task, **options):
+        from django_backend.celery_app import app
+        return app.amqp.router.route(options, task.name, (), {}, task)['queue'].name
+
+    def test_override_beats_queue_class_and_explicit_queue_beats_both(self):
+        from .task_routing import queue_for, route_task
+        from .tasks.review_tasks import process_commit_review
+        with self.settings(TASK_QUEUES={'interactive': 'fast', 'sync': 'slow'}, TASK_ROUTE_OVERRIDES={}):
+            self.assertEqual(route_task(process_commit_review.name, (), {}, {}, task=process_commit_review), {'queue': 'fast'})
+            self.assertIsNone(route_task('other.task', (), {}, {}))
+            self.assertEqual(queue_for('unknown'), 'celery')
+        with self.settings(TASK_QUEUES={'interactive': 'fast', 'sync': 'slow'},
+                           TASK_ROUTE_OVERRIDES={process_commit_review.name: 'sync'}):
+            self.assertEqual(self.route(process_commit_review), 'slow')
+            self.assertEqual(self.route(process_commit_review, queue='fast'), 'fast')
+
+    @mock.patch('core.review_view.process_commit_review')
+    def test_commit_re_review_goes_to_the_interactive_queue(self, task):
+        commit = Commit.objects.create(repository=self.repository, commit_hash='abc1234', message='msg')
+        review = Review.objects.create(repository=self.repository, commit=commit, status='completed', review_data={})
+        with self.settings(TASK_QUEUES={'interactive': 'fast'}):
+            response = self.client.post(f'/api/v1/reviews/{review.id}/re_review/', {'issues': ['x']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        task.delay.assert_not_called()
+        self.assertEqual(task.apply_async.call_args.kwargs['queue'], 'fast')
+        self.assertEqual(task.apply_async.call_args.kwargs['args'], [{}, self.repository.id, commit.id])
+
+
+class ReviewCacheScopeTests(ReviewTestCase):
+    @mock.patch('core.tasks.review_tasks.get_langgraph_runtime')
+    def test_reuse_stays_in_the_repository_and_rebinds_run_keys(self, get_runtime):
+        from .review_cache import find_reusable_review
+        from .tasks.review_tasks import _reuse_cached_review
+        other_owner = User.objects.create_user(github_id='2', username='other')
+        other_repository = Repository.objects.create(owner=other_owner, repo_name='other/repo', repo_url='https://github.com/other/repo')
+        other_pr = PullRequest.objects.create(repository=other_repository, pr_github_id='200', pr_number=1, title='PR',
+                                              author_github_id='2', status='open', url='https://github.com/other/repo/pull/1')
+        foreign = Review.objects.create(repository=other_repository, pull_request=other_pr, status='completed', diff_hash='h',
+                                        review_data={'repo': 'repo', 'user': 'other', 'reviews': []})
+        Thread.objects.create(review=foreign, thread_id='foreign-thread', thread_type='main')
+        review = Review.objects.create(repository=self.repository, pull_request=self.pull_request, status='pending', diff_hash='h')
+        self.assertIsNone(find_reusable_review('h', self.repository.id, exclude_review_id=review.id))
+
+        own = self.add_review(threads=0)
+        own.diff_hash = 'h'
+        own.review_data = {'repo': 'repo', 'user': 'someone', 'reviews': [{'file': 'a.py'}]}
+        own.save()
+        self.assertEqual(find_reusable_review('h', self.repository.id, exclude_review_id=review.id), own)
+
+        # Even when handed a foreign review, its thread is not copied and run keys are rewritten
+        _reuse_cached_review(review, foreign, usage_user=None, llm_model='m', thread_title='t',
+                             run_values={'user': 'dev', 'repo': 'repo', 'pr_id': 1})
+        get_runtime.assert_not_called()
+        self.assertEqual(review.review_data['user'], 'dev')
+        self.assertNotIn('pr_id', review.review_data)
+        self.assertNotEqual(review.threads.get().thread_id, 'foreign-thread')
+
+class WebhookSecretIndexTests(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        from .webhooks import secret_index
+        self.index = secret_index
+        secret_index._local_index.clear()
+        self.addCleanup(secret_index._local_index.clear)
+        self.addCleanup(secret_index.invalidate_repository_secret, 'owner/repo')
+
+    def lookup(self, full_name):
+        from asgiref.sync import async_to_sync
+        return async_to_sync(self.index.alookup_repository_secret)(full_name)
+
+    def test_unknown_names_stay_out_of_the_shared_cache_and_the_index_is_bounded(self):
+        from django.core.cache import cache
+        with self.settings(WEBHOOK_SECRET_INDEX_LOCAL_MAX=2):
+            self.assertEqual(self.lookup('owner/repo').repository_id, self.repository.id)
+            for n in range(5):
+                self.assertIsNone(self.lookup(f'random/{n}').repository_id)
+                self.assertIsNone(cache.get(self.index._cache_key(f'random/{n}')))
+        self.assertEqual(list(self.index._local_index), ['random/3', 'random/4'])
+        self.assertTrue(self.lookup('owner/repo').from_cache) # still in the shared cache
+
+class GitHubWebhookViewTests(ReviewTestCase):
+    url = '/api/v1/webhook/github/'
+
+    def setUp(self):
+        super().setUp()
+        from .webhooks import secret_index
+        Repository.objects.filter(pk=self.repository.pk).update(webhook_secret='s3cret')
+        secret_index._local_index.clear()
+        self.addCleanup(secret_index._local_index.clear)
+        self.addCleanup(secret_index.invalidate_repository_secret, 'owner/repo')
+        self.logged = []
+
+        async def enqueue(entry):
+            self.logged.append(entry)
+        for target, kwargs in (('core.webhook_view.aenqueue_event_log', {'side_effect': enqueue}),
+                               ('core.webhook_view.process_webhook_event', {})):
+            patcher = mock.patch(target, **kwargs)
+            setattr(self, target.rsplit('.', 1)[1], patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def post(self, body, secret='s3cret', delivery='delivery-1'):
+        import hashlib
+        import hmac
+        signature = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.generic('POST', self.url, body, content_type='application/json', headers={
+            'X-Hub-Signature-256': signature, 'X-GitHub-Event': 'pull_request', 'X-GitHub-Delivery': delivery,
+        })
+
+    def test_payload_is_parsed_once_and_logged_once(self):
+        body = fastjson.dumps({'action': 'opened', 'repository': {'full_name': 'owner/repo'}})
+        with mock.patch('core.webhook_view.fastjson.loads', wraps=fastjson.loads) as loads:
+            response = self.post(body)
+        self.assertEqual(response.status_code, 202)
+        loads.assert_called_once()
+        self.process_webhook_event.delay.assert_called_once_with('pull_request', fastjson.loads(body))
+        self.assertEqual([(e['event_id'], e['repository_id'], e['status']) for e in self.logged],
+                         [('delivery-1', self.repository.id, 'processed')])
+        self.assertEqual(self.logged[0]['headers']['X-GitHub-Event'], 'pull_request')
+
+    def test_bad_signature_and_bad_json_are_logged_but_never_dispatched(self):
+        response = self.post(fastjson.dumps({'repository': {'full_name': 'owner/repo'}}), secret='wrong')
+        self.assertEqual(response.status_code, 401)
+        response = self.post(b'{not json', delivery='delivery-2')
+        self.assertEqual(response.status_code, 400)
+        self.process_webhook_event.delay.assert_not_called()
+        self.assertEqual([(e['event_id'], e['status']) for e in self.logged], [('delivery-1', 'failed'), ('delivery-2', 'failed')])
+        self.assertNotIn('repository', self.logged[0]['payload']) # unverified payloads are not stored
+
+    def test_redeliveries_upsert_one_row(self):
+        from .webhooks.event_log import build_event_log_entry, write_event_logs
+        received = build_event_log_entry('delivery-1', 'push', {}, self.repository.id, {'n': 1}, 'received')
+        failed = build_event_log_entry('delivery-1', 'push', {}, self.repository.id, {'n': 2}, 'failed', 'boom')
+        self.assertEqual(write_event_logs([received, failed]), 1) # same delivery twice in one batch
+        write_event_logs([build_event_log_entry('delivery-1', 'push', {}, self.repository.id, {'n': 3}, 'processed')])
+        row = WebhookEventLog.objects.get()
+        self.assertEqual((row.status, row.payload, row.error_message), ('processed', {'n': 3}, None))
+        self.assertIsNotNone(row.processed_at)
+
+class GitHubRateLimiterTests(SimpleTestCase):
+    def test_low_budget_slows_down_instead_of_failing(self):
+        import time
+        from .github_client.ratelimit import GitHubRateLimiter
+        limiter = GitHubRateLimiter(max_wait=30.0)
+        budget = limiter._budget('token')
+        budget.remaining, budget.reset_at = 50, time.time() + 3000 # 60s spacing, over max_wait
+        self.assertEqual(budget.delay(limiter.reserve, max_spacing=limiter.max_wait), 30.0)
+        with mock.patch('core.github_client.ratelimit.time.sleep') as sleep:
+            limiter.acquire('token')
+        sleep.assert_called_once_with(30.0)
+
+    def test_malformed_retry_after_falls_back_to_backoff(self):
+        from .github_client.ratelimit import GitHubRateLimiter
+        limiter = GitHubRateLimiter(backoff_base=1.0)
+        delay = limiter.retry_delay('token', 429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}, attempt=0)
+        self.assertTrue(1.0 <= delay <= 2.0)
+
+class GitHubHTTPSessionTests(SimpleTestCase):
+    def setUp(self):
+        from .github_client import http
+        self.http = http
+        http.close_sync_session()
+        self.addCleanup(http.close_sync_session)
+
+    @mock.patch('core.services.get_response_cache', return_value=None)
+    def test_sync_helpers_share_one_pooled_session(self, _):
+        from concurrent.futures import ThreadPoolExecutor
+        from .services import get_github_user_info
+        with self.settings(GITHUB_HTTP_POOL_MAXSIZE=7):
+            session = self.http.get_sync_session()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                self.assertIs(executor.submit(self.http.get_sync_session).result(), session)
+        self.assertEqual(session.get_adapter('https://api.github.com/').poolmanager.connection_pool_kw['maxsize'], 7)
+
+        with mock.patch.object(session, 'get', side_effect=[_gh_response(body={'login': 'dev'}), _gh_response(body=[])]) as get:
+            self.assertEqual(get_github_user_info('token'), {'login': 'dev'})
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(get.call_args.kwargs['timeout'], self.http.get_request_timeout())
+
+        self.http.close_sync_session() # worker shutdown; the next call builds a fresh pool
+        self.assertIsNot(self.http.get_sync_session(), session)
+
+    def test_async_sessions_are_per_loop_and_replaced_once_closed(self):
+        async def sessions():
+            first = await self.http.get_async_session()
+            same = await self.http.get_async_session()
+            await first.close()
+            fresh = await self.http.get_async_session()
+            await self.http.close_async_session()
+            return first, same, fresh
+
+        first, same, fresh = asyncio.run(sessions())
+        self.assertIs(first, same)
+        self.assertIsNot(fresh, first)
+        self.assertTrue(fresh.closed)
+        self.assertIsNot(asyncio.run(sessions())[0], first) # another loop gets its own session
+
+class GitHubResponseCacheTests(SimpleTestCase):
+    url = 'https://api.github.com/repos/owner/repo/collaborators'
+
+    def setUp(self):
+        from .github_client import cache
+        patcher = mock.patch.object(cache, '_response_cache', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = cache.get_response_cache()
+
+    def get(self, *responses, token='token'):
+        from .github_client.http import get_sync_session
+        from .services import _github_get
+        with mock.patch.object(get_sync_session(), 'get', side_effect=responses) as get:
+            return _github_get(self.url, token, params={'page': 1}), get.call_args.kwargs['headers']
+
+    def test_304_replays_the_cached_body_and_headers(self):
+        headers = {'ETag': 'W/"abc"', 'Link': '<https://api.github.com/x?page=2>; rel="last"'}
+        response, sent = self.get(_gh_response(200, [{'login': 'dev'}], headers))
+        self.assertNotIn('If-None-Match', sent)
+
+        response, sent = self.get(_gh_response(304, headers={'ETag': 'W/"abc"'}))
+        self.assertEqual(sent['If-None-Match'], 'W/"abc"')
+        self.assertEqual((response.status_code, response.json()), (200, [{'login': 'dev'}]))
+        self.assertEqual(response.headers['Link'], headers['Link'])
+        self.assertTrue(response.from_cache)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+        # Entries are scoped to the token; another user revalidates nothing
+        response, sent = self.get(_gh_response(200, []), token='other')
+        self.assertNotIn('If-None-Match', sent)
+
+    def test_uncacheable_responses_and_backend_errors_fall_through(self):
+        self.get(_gh_response(200, [{'login': 'dev'}])) # no ETag/Last-Modified: not stored
+        response, sent = self.get(_gh_response(200, []))
+        self.assertNotIn('If-None-Match', sent)
+        self.assertEqual(self.cache.stats()['stores'], 0)
+
+        with mock.patch.object(self.cache.backend, 'get', side_effect=ConnectionError('cache down')):
+            response, sent = self.get(_gh_response(200, [{'login': 'dev'}]))
+        self.assertEqual(response.json(), [{'login': 'dev'}])
+
+class CollaboratorPaginationTests(SimpleTestCase):
+    link = '<https://api.github.com/repositories/1/collaborators?page=4&per_page=2>; rel="last"'
+
+    def page(self, number):
+        return [{'login': f'user-{number}-{i}'} for i in range(2)]
+
+    def expected(self, pages=4):
+        return [c['login'] for number in range(1, pages + 1) for c in self.page(number)]
+
+    def test_sync_pages_are_fetched_concurrently_and_yielded_in_order(self):
+        import threading
+        import time
+        from .services import iter_repo_collaborators_from_github
+        fetched_on = set()
+
+        def fake_get(url, token, params=None):
+            fetched_on.add(threading.current_thread().name)
+            time.sleep(0.01 * (5 - params['page'])) # later pages come back first
+            return _gh_response(200, self.page(params['page']), {'Link': self.link} if params['page'] == 1 else {})
+
+        with mock.patch('core.services._github_get', side_effect=fake_get):
+            logins = [c['login'] for c in iter_repo_collaborators_from_github('owner', 'repo', 'token', per_page=2)]
+        self.assertEqual(logins, self.expected())
+        self.assertTrue(any(name.startswith('github-pages') for name in fetched_on))
+
+    def test_sync_page_error_is_raised_after_the_pages_before_it(self):
+        import requests
+        from .services import iter_repo_collaborators_from_github
+
+        def fake_get(url, token, params=None):
+            if params['page'] == 3:
+                return _gh_response(500, {'message': 'boom'})
+            return _gh_response(200, self.page(params['page']), {'Link': self.link} if params['page'] == 1 else {})
+
+        logins = []
+        with mock.patch('core.services._github_get', side_effect=fake_get), self.assertRaises(requests.HTTPError):
+            for collaborator in iter_repo_collaborators_from_github('owner', 'repo', 'token', per_page=2):
+                logins.append(collaborator['login'])
+        self.assertEqual(logins, self.expected(pages=2))
+
+    def iterate_async(self, fetch, stopped=()):
+        import gc
+        from .services import GitHubService
+        loop_errors, logins, errors = [], [], []
+
+        async def main():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: loop_errors.append(context['message']))
+            try:
+                async for collaborator in GitHubService('token').iter_collaborators('owner', 'repo', per_page=2):
+                    logins.append(collaborator['login'])
+            except Exception as e:
+                # What had already stopped when the error reached us; keep no traceback, it holds the tasks
+                errors.append((str(e), list(stopped)))
+            gc.collect()
+            await asyncio.sleep(0.05)
+            gc.collect()
+
+        with mock.patch('core.services.GitHubService._fetch', side_effect=fetch):
+            asyncio.run(main())
+        return logins, errors, loop_errors
+
+    def test_async_pages_are_yielded_in_order(self):
+        async def fetch(method, url, params=None):
+            await asyncio.sleep(0.01 * (5 - params['page']))
+            return self.page(params['page']), {'Link': self.link} if params['page'] == 1 else {}
+
+        self.assertEqual(self.iterate_async(fetch), (self.expected(), [], []))
+
+    def test_async_failure_stops_and_collects_the_other_pages(self):
+        stopped = []
+
+        async def fetch(method, url, params=None):
+            page = params['page']
+            if page == 1:
+                return self.page(1), {'Link': self.link}
+            if page == 4:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    stopped.append(page)
+                    raise RuntimeError('connection reset while cancelling')
+            await asyncio.sleep(0.01 if page == 2 else 0)
+            raise RuntimeError(f"page {page} failed")
+
+        logins, errors, loop_errors = self.iterate_async(fetch, stopped)
+        self.assertEqual(logins, self.expected(pages=1))
+        self.assertEqual(errors, [('page 2 failed', [4])]) # page 4 was stopped before the error surfaced
+        self.assertEqual(loop_errors, []) # and no page failure was left unretrieved
+
+
+class GitHubBatchLoaderTests(SimpleTestCase):
+    def loader(self, respond, batch_size=50):
+        from .github_client.graphql import GitHubBatchLoader
+        calls = []
+
+        def transport(query, variables, token):
+            calls.append(variables)
+            return respond(query, variables)
+        return GitHubBatchLoader('token', transport, batch_size=batch_size), calls
+
+    def test_one_query_resolves_every_queued_key(self):
+        def respond(query, variables):
+            return {
+                'data': {
+                    'k0': {'pullRequest': {'databaseId': 11, 'number': 1, 'state': 'OPEN', 'headRefOid': 'h1',
+                                           'author': {'login': 'dev', 'databaseId': 7}}},
+                    'k1': {'pullRequest': None},
+                    'k2': {'object': {'oid': 'abc', 'message': 'fix', 'author': {'name': 'Dev', 'user': {'login': 'dev'}}}},
+                    'k3': {'collaborators': {'edges': [{'permission': 'WRITE', 'node': {'login': 'dev', 'databaseId': 7}}]}},
+                },
+                'errors': [{'type': 'NOT_FOUND', 'path': ['k1', 'pullRequest'], 'message': 'Could not resolve'}],
+            }
+
+        loader, calls = self.loader(respond)
+        pr = loader.load_pull_request('owner', 'repo', 1)
+        missing = loader.load_pull_request('owner', 'repo', 2)
+        commit = loader.load_commit('owner', 'repo', 'abc')
+        collaborator = loader.load_collaborator('owner', 'repo', 'dev')
+        loader.load_pull_request('owner', 'repo', '1') # same key, not queued twice
+
+        self.assertEqual(pr.result()['head'], {'sha': 'h1'})
+        self.assertEqual(pr.result()['user']['login'], 'dev')
+        self.assertIsNone(missing.result())
+        self.assertEqual(commit.result()['commit']['message'], 'fix')
+        self.assertTrue(collaborator.result()['permissions']['push'])
+        self.assertFalse(collaborator.result()['permissions']['admin'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]), 12) # owner, repo and identifier of four keys
+
+        loader.load_pull_request('owner', 'repo', 1).result() # memoised
+        self.assertEqual(len(calls), 1)
+
+    def test_errors_stay_with_their_keys(self):
+        from .github_client.graphql import GitHubGraphQLError
+
+        def respond(query, variables):
+            if 'e0' in variables:
+                raise ConnectionError('GitHub unreachable')
+            return {'data': {'k0': None, 'k1': {'pullRequest': {'number': 2}}},
+                    'errors': [{'type': 'FORBIDDEN', 'path': ['k0'], 'message': 'Resource not accessible'}]}
+
+        loader, calls = self.loader(respond, batch_size=2)
+        forbidden = loader.load_pull_request('owner', 'secret', 1)
+        allowed = loader.load_pull_request('owner', 'repo', 2)
+        commit = loader.load_commit('owner', 'repo', 'abc') # third key: a second batch
+        loader.dispatch()
+        self.assertEqual(len(calls), 2)
+        with self.assertRaisesMessage(GitHubGraphQLError, 'Resource not accessible'):
+            forbidden.result()
+        self.assertEqual(allowed.result()['number'], 2)
+        with self.assertRaises(ConnectionError):
+            commit.result()
+
+    def test_concurrent_awaits_share_a_batch_and_scopes_share_a_loader(self):
+        from types import SimpleNamespace
+        from .services import get_github_batch_loader
+        loader, calls = self.loader(lambda query, variables: {'data': {f'k{i}': {'pullRequest': {'number': i}}
+                                                                       for i in range(len(variables) // 3)}})
+
+        async def main():
+            return await asyncio.gather(*(loader.aload(loader.load_pull_request('owner', 'repo', n)) for n in (5, 6)))
+
+        self.assertEqual([pr['number'] for pr in asyncio.run(main())], [0, 1])
+        self.assertEqual(len(calls), 1)
+
+        request = SimpleNamespace()
+        self.assertIs(get_github_batch_loader('token', request), get_github_batch_loader('token', request))
+        self.assertIsNot(get_github_batch_loader('token', request), get_github_batch_loader('other', request))
+        self.assertIsNot(get_github_batch_loader('token'), get_github_batch_loader('token'))
+
+class ThreadReplyStreamDisconnectTests(ReviewTestCase):
+    def stream(self, run_id):
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncRequestFactory
+        from .thread_stream_view import thread_reply_stream
+
+        class Client:
+            async def stream_feedback(self, **kwargs):
+                if run_id:
+                    yield 'run', run_id
+                yield 'token', 'Hel'
+                await asyncio.Event().wait() # the run never finishes while the client is connected
+
+        thread = self.add_review(threads=1, comments=0).threads.get()
+        request = AsyncRequestFactory().post(f'/api/v1/threads/{thread.id}/reply/stream/', {'message': 'why?'}, content_type='application/json')
+
+        async def read_then_disconnect():
+            response = await thread_reply_stream(request, thread.id)
+            chunks = response.streaming_content
+            for _ in range(2 if run_id else 1):
+                await chunks.__anext__()
+            await chunks.aclose()
+
+        with mock.patch('core.thread_stream_view._authenticate', return_value=self.owner), \
+             mock.patch('core.thread_stream_view.aget_langgraph_client', mock.AsyncMock(return_value=Client())), \
+             mock.patch('core.thread_stream_view.process_thread_reply') as task:
+            async_to_sync(read_then_disconnect)()
+        return Comment.objects.get(thread=thread, type='request'), task
+
+    def test_started_run_is_handed_to_the_reply_task(self):
+        user_comment, task = self.stream('run-1')
+        task.delay.assert_called_once_with(user_comment.id, self.owner.id, run_id='run-1')
+
+    def test_disconnect_before_the_run_started_leaves_an_error_reply(self):
+        user_comment, task = self.stream(None)
+        task.delay.assert_not_called()
+        self.assertTrue(Comment.objects.filter(parent_comment=user_comment, type='error').exists())
+
+try:
+    import fakeredis # runs the limiter's Lua scripts when lupa is installed
+except ImportError: # pragma: no cover
+    fakeredis = None
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+class LLMConcurrencyLimiterTests(SimpleTestCase):
+    def limiter(self, **limits):
+        from .langgraph_client.limiter import LLMConcurrencyLimiter
+        return LLMConcurrencyLimiter({'default': limits}, poll_interval=0.01, max_wait=5)
+
+    def run_with_redis(self, scenario):
+        async def main():
+            redis = fakeredis.aioredis.FakeRedis()
+            with mock.patch('core.langgraph_client.limiter.get_async_redis', return_value=redis):
+                return await scenario(redis)
+        return asyncio.run(main())
+
+    def test_waiters_get_slots_in_arrival_order(self):
+        limiter, granted = self.limiter(max_in_flight=1), []
+
+        async def run(name, hold):
+            async with limiter.slot('gpt-4o'):
+                granted.append(name)
+                await hold.wait()
+
+        async def scenario(redis):
+            holds = {name: asyncio.Event() for name in 'abcd'}
+            tasks = []
+            for name in 'abcd':
+                tasks.append(asyncio.ensure_future(run(name, holds[name])))
+                await asyncio.sleep(0.05) # arrive one after another
+            for name in 'abcd':
+                holds[name].set()
+                await asyncio.sleep(0.05)
+            await asyncio.gather(*tasks)
+
+        self.run_with_redis(scenario)
+        self.assertEqual(granted, list('abcd'))
+
+    def test_in_flight_runs_never_exceed_the_cap(self):
+        limiter, state = self.limiter(max_in_flight=2), {'running': 0, 'peak': 0}
+
+        async def run():
+            async with limiter.slot('gpt-4o'):
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+                await asyncio.sleep(0.03)
+                state['running'] -= 1
+
+        async def scenario(redis):
+            await asyncio.gather(*(run() for _ in range(6)))
+            return await redis.zcard('llm-limit:gpt-4o:inflight')
+
+        self.assertEqual(self.run_with_redis(scenario), 0) # every slot released
+        self.assertEqual(state['peak'], 2)
+
+    def test_unknown_usage_keeps_the_token_estimate(self):
+        limiter = self.limiter(max_in_flight=1, tokens_per_minute=100000)
+
+        async def scenario(redis):
+            async with limiter.slot('gpt-4o', 6000) as slot:
+                slot.record_usage({}) # usage not reported by the run
+            async with limiter.slot('gpt-4o', 6000) as slot:
+                slot.record_usage({'input_tokens': 400, 'output_tokens': 100, 'total_tokens': 500})
+            return sorted(entry.split(b'|')[1] for entry in await redis.zrange('llm-limit:gpt-4o:tokens', 0, -1))
+
+        self.assertEqual(self.run_with_redis(scenario), [b'500', b'6000'])
+
+
+class ThreadReplyStatusTests(ReviewTestCase):
+    @mock.patch('core.thread_view.get_langgraph_runtime')
+    def test_saturated_model_queues_an_inline_reply(self, get_runtime):
+        from .langgraph_client.limiter import LLMRateLimitTimeout
+        get_runtime.return_value.run.side_effect = LLMRateLimitTimeout('No gpt-4o slot after 5s')
+        thread = self.add_review(threads=1, comments=0).threads.get()
+        url = f'/api/v1/threads/{thread.id}/reply/'
+        with mock.patch('core.thread_view.process_thread_reply') as task:
+            task.delay.return_value.id = 'task-1'
+            response = self.client.post(url, {'message': 'why?'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(get_runtime.return_value.get_client.return_value.handle_feedback.call_args.kwargs['max_wait'], 5)
+        with mock.patch('core.thread_view.process_thread_reply') as task:
+            task.delay.side_effect = ConnectionError('broker down')
+            response = self.client.post(url, {'message': 'why?'}, format='json')
+        self.assertEqual(response.status_code, 503)
+
+    @mock.patch('core.tasks.thread_tasks.get_langgraph_runtime')
+    def test_queued_reply_retries_then_answers_when_no_slot_frees_up(self, get_runtime):
+        from celery.exceptions import Retry
+        from .langgraph_client.limiter import LLMRateLimitTimeout
+        from .tasks.thread_tasks import process_thread_reply
+        get_runtime.return_value.run.side_effect = LLMRateLimitTimeout('No gpt-4o slot after 240s')
+        thread = self.add_review(threads=1, comments=0).threads.get()
+        comment = Comment.objects.create(thread=thread, user=self.owner, comment='why?', type='request')
+
+        with self.settings(THREAD_REPLY_MAX_WAIT=240, THREAD_REPLY_MAX_RETRIES=2), \
+                mock.patch.object(process_thread_reply, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                process_thread_reply.run(comment.id, self.owner.id)
+            self.assertEqual(retry.call_args.kwargs['countdown'], 30)
+            self.assertFalse(Comment.objects.filter(parent_comment=comment).exists())
+
+            process_thread_reply.push_request(retries=2)
+            self.addCleanup(process_thread_reply.pop_request)
+            process_thread_reply.run(comment.id, self.owner.id)
+        self.assertEqual(retry.call_count, 1)
+        self.assertEqual(get_runtime.return_value.get_client.return_value.handle_feedback.call_args.kwargs['max_wait'], 240)
+        reply = Comment.objects.get(parent_comment=comment)
+        self.assertEqual(reply.type, 'error')
+        self.assertIn('busy', reply.comment)
+
+    def test_unanswered_request_turns_failed_after_the_stale_timeout(self):
+        from django.utils import timezone
+        thread = self.add_review(threads=1, comments=0).threads.get()
+        comment = Comment.objects.create(thread=thread, user=self.owner, comment='why?', type='request')
+        url = f'/api/v1/threads/{thread.id}/reply/{comment.id}/'
+        self.assertEqual(self.client.get(url).data['status'], 'pending')
+        Comment.objects.filter(id=comment.id).update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(self.client.get(url).data['status'], 'failed')
+
+class ReviewerIndexTests(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reviewer = User.objects.create_user(github_id='3', username='reviewer', github_access_token='token')
+        self.thread = self.add_review(threads=1, comments=0).threads.get()
+
+    def reviewers(self):
+        return sorted(self.pull_request.requested_reviewers.values_list('github_id', flat=True))
+
+    def allowed(self):
+        from types import SimpleNamespace
+        from .permissions import IsAssignedReviewerForThread
+        thread = Thread.objects.select_related('review__pull_request__repository__owner').get(pk=self.thread.pk)
+        return IsAssignedReviewerForThread().has_object_permission(SimpleNamespace(user=self.reviewer), None, thread)
+
+    def test_pull_request_events_keep_the_index_current(self):
+        from .reviewer_index import apply_pull_request_event, is_requested_reviewer
+        apply_pull_request_event(self.pull_request, 'review_requested', {
+            'pull_request': {'requested_reviewers': [{'id': 3, 'login': 'reviewer'}, {'id': 4, 'login': 'other'}]}})
+        self.assertEqual(self.reviewers(), ['3', '4'])
+        apply_pull_request_event(self.pull_request, 'review_request_removed',
+                                 {'pull_request': {}, 'requested_reviewer': {'id': 4, 'login': 'other'}})
+        apply_pull_request_event(self.pull_request, 'review_requested',
+                                 {'pull_request': {}, 'requested_reviewer': {'id': 5, 'login': 'third'}})
+        self.assertEqual(self.reviewers(), ['3', '5'])
+        self.assertTrue(is_requested_reviewer(self.pull_request, self.reviewer))
+        self.assertFalse(is_requested_reviewer(self.pull_request, self.owner))
+
+    @mock.patch('core.permissions.get_github_batch_loader')
+    def test_fresh_index_answers_without_github(self, get_loader):
+        from .reviewer_index import sync_requested_reviewers
+        sync_requested_reviewers(self.pull_request, [{'id': 3, 'login': 'reviewer'}])
+        self.assertTrue(self.allowed())
+        get_loader.assert_not_called()
+
+    @mock.patch('core.permissions.get_github_batch_loader')
+    def test_stale_index_is_refreshed_from_github_and_used_when_github_fails(self, get_loader):
+        from django.utils import timezone
+        result = get_loader.return_value.load_pull_request.return_value.result
+        result.side_effect = ConnectionError('GitHub down')
+        self.assertFalse(self.allowed()) # nothing local to fall back on
+
+        result.side_effect = None
+        result.return_value = {'requested_reviewers': [{'id': 3, 'login': 'reviewer'}]}
+        self.assertTrue(self.allowed())
+        self.assertEqual(self.reviewers(), ['3'])
+
+        PullRequest.objects.filter(pk=self.pull_request.pk).update(reviewers_synced_at=timezone.now() - datetime.timedelta(days=1))
+        result.side_effect = ConnectionError('GitHub down')
+        self.assertTrue(self.allowed()) # stale list beats nothing
+        self.assertEqual(get_loader.call_count, 3)
+
+class RepositoryAccessCacheTests(ReviewTestCase):
+    def test_revocation_in_another_process_reaches_the_shared_entry(self):
+        from types import SimpleNamespace
+        from .permissions import CanAccessRepository
+        store = {}
+        redis = mock.Mock(get=store.get, delete=lambda key: store.pop(key, None),
+                          set=lambda key, value, ex: store.__setitem__(key, value))
+        member = User.objects.create_user(github_id='3', username='member')
+        collaborator = RepoCollaborator.objects.create(repository=self.repository, user=member, role='member')
+
+        def check():
+            return CanAccessRepository().has_object_permission(SimpleNamespace(user=member), None, self.repository)
+
+        with mock.patch('core.permissions.get_redis', return_value=redis):
+            self.assertTrue(check())
+            self.assertEqual(list(store.values()), [b'1'])
+            collaborator.delete() # post_delete signal, as a webhook task would
+            self.assertEqual(store, {})
+            self.assertFalse(check())
+
+    def test_member_webhook_events_update_access(self):
+        from types import SimpleNamespace
+        from .permissions import CanAccessRepository
+        from .tasks.review_tasks import process_webhook_event
+        store = {}
+        redis = mock.Mock(get=store.get, delete=lambda key: store.pop(key, None),
+                          set=lambda key, value, ex: store.__setitem__(key, value))
+        member = User.objects.create_user(github_id='3', username='member')
+
+        def check():
+            return CanAccessRepository().has_object_permission(SimpleNamespace(user=member), None, self.repository)
+
+        def member_event(action):
+            process_webhook_event('member', {'action': action, 'repository': {'full_name': 'owner/repo'},
+                                             'member': {'id': 3, 'login': 'member'}})
+
+        with mock.patch('core.permissions.get_redis', return_value=redis):
+            self.assertFalse(check()) # cached "no access"
+            member_event('added')
+            self.assertTrue(RepoCollaborator.objects.filter(repository=self.repository, user=member).exists())
+            self.assertTrue(check())
+            member_event('removed')
+            self.assertFalse(RepoCollaborator.objects.filter(repository=self.repository, user=member).exists())
+            self.assertFalse(check())
+
+class LLMUsageBackfillTests(ReviewTestCase):
+    def setUp(self):
+        super().setUp()
+        from .tasks.usage_tasks import backfill_llm_usage
+        self.task = backfill_llm_usage
+        self.review = self.add_review(threads=0)
+
+    def record(self, token_usage, run_id='run-1'):
+        from .tasks.usage_tasks import record_llm_usage
+        with mock.patch.object(self.task, 'apply_async') as apply_async, self.captureOnCommitCallbacks(execute=True):
+            usage = record_llm_usage(self.review, self.owner, 'gpt-4o', token_usage, run_id=run_id)
+        return usage, apply_async
+
+    def backfill(self, usage, read_run_usage, retries=0):
+        from celery.exceptions import Retry
+        runtime = mock.Mock()
+        runtime.client.read_run_usage.side_effect = read_run_usage
+        self.task.push_request(retries=retries)
+        self.addCleanup(self.task.pop_request)
+        with mock.patch('core.tasks.usage_tasks.get_langgraph_runtime', return_value=runtime), \
+                mock.patch.object(self.task, 'retry', side_effect=Retry()) as retry, \
+                self.settings(LLM_USAGE_BACKFILL_DELAY=10, LLM_USAGE_BACKFILL_MAX_RETRIES=3):
+            try:
+                self.task.run(usage.id)
+            except Retry:
+                return retry.call_args.kwargs['countdown']
+        return None
+
+    def test_reported_usage_is_recorded_without_a_backfill(self):
+        usage, apply_async = self.record({'input_tokens': 100, 'output_tokens': 50, 'total_tokens': 150})
+        self.assertFalse(usage.usage_pending)
+        self.assertEqual((usage.input_tokens, usage.output_tokens), (100, 50))
+        apply_async.assert_not_called()
+
+    def test_missing_usage_is_backfilled_once_langsmith_has_the_run(self):
+        usage, apply_async = self.record({})
+        self.assertTrue(usage.usage_pending)
+        apply_async.assert_called_once_with(args=[usage.id], countdown=10)
+
+        self.assertEqual(self.backfill(usage, [None]), 10) # run not processed yet
+        self.assertEqual(self.backfill(usage, ConnectionError('LangSmith down'), retries=2), 40)
+        self.assertIsNone(self.backfill(usage, [{'input_tokens': 1000, 'output_tokens': 500, 'total_tokens': 1500}], retries=3))
+        usage.refresh_from_db()
+        self.assertFalse(usage.usage_pending)
+        self.assertEqual((usage.input_tokens, usage.output_tokens), (1000, 500))
+        self.assertGreater(usage.cost, 0)
+
+    def test_backfill_gives_up_after_max_retries(self):
+        usage, _ = self.record({})
+        self.assertIsNone(self.backfill(usage, [None], retries=3))
+        usage.refresh_from_db()
+        self.assertTrue(usage.usage_pending)
+        self.assertEqual(usage.input_tokens, 0)
+
+class LangGraphRuntimeTests(SimpleTestCase):
+    def test_run_times_out_and_warm_up_does_not_block(self):
+        import time
+        from .langgraph_client.runtime import LangGraphRuntime
+        runtime = LangGraphRuntime(run_timeout=0.05)
+        self.addCleanup(runtime.close)
+        with self.assertRaises(TimeoutError):
+            runtime.run(asyncio.sleep(10))
+
+        async def slow_ready():
+            await asyncio.sleep(10)
+        with mock.patch.object(runtime, 'ensure_ready', slow_ready):
+            started = time.monotonic()
+            future = runtime.warm_up()
+            self.assertLess(time.monotonic() - started, 1)
+            future.cancel()
+
+class PRReviewActiveRowTests(ReviewTestCase):
+    def push(self, sha):
+        from .tasks.review_tasks import process_webhook_event
+        event = {'action': 'synchronize', 'repository': {'full_name': 'owner/repo'},
+                 'pull_request': dict(_gh_pr(1, '2025-01-01T00:00:00Z'), id=100, head={'sha': sha})}
+        process_webhook_event('pull_request', event)
+
+    def active(self):
+        return sorted(Review.objects.filter(pull_request=self.pull_request).exclude(status='superseded').values_list('status', flat=True))
+
+    @mock.patch('core.tasks.review_tasks.schedule_debounced_pr_review')
+    def test_pushes_during_a_running_review_keep_one_pending_row(self, schedule):
+        from .tasks.review_tasks import _claim_pr_review
+        running = Review.objects.create(repository=self.repository, pull_request=self.pull_request, status='in_progress')
+        self.push('b')
+        self.push('c')
+        self.assertEqual(schedule.call_count, 2)
+        self.assertEqual(self.active(), ['in_progress', 'pending'])
+
+        claimed = _claim_pr_review(self.repository, self.pull_request)
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'superseded')
+        self.assertEqual(self.active(), ['in_progress'])
+
+        self.push('d') # used to raise MultipleObjectsReturned and skip the review
+        self.assertEqual(schedule.call_count, 3)
+        self.assertEqual(self.active(), ['in_progress', 'pending'])
+        self.assertEqual(Review.objects.get(pk=claimed.pk).status, 'in_progress')
+
+
+class ReviewProgressCheckpointTests(ReviewTestCase):
+    def run_commit_review(self, error=None):
+        from asgiref.sync import async_to_sync
+        from .tasks.review_tasks import process_commit_review
+        commit = Commit.objects.create(repository=self.repository, commit_hash='abc1234', message='msg')
+
+        async def generate_review(on_progress=None, **kwargs):
+            await on_progress('review', {'reviews': [{'file': f'f{i}.py'} for i in range(30)]})
+            if error:
+                raise error
+            return {'review_data': {'reviews': [{'file': 'f0.py'}]}}
+
+        async def call(coro):
+            return await coro
+        runtime = mock.Mock(run=lambda coro: async_to_sync(call)(coro))
+        runtime.get_client.return_value = mock.Mock(review_agent='agent', generate_review=generate_review)
+        with mock.patch('core.tasks.review_tasks.get_langgraph_runtime', return_value=runtime), \
+                self.settings(REVIEW_PROGRESS_MAX_FINDINGS=5):
+            process_commit_review.run({}, self.repository.id, commit.id)
+        return Review.objects.get(commit=commit)
+
+    def test_completed_review_keeps_the_final_checkpoint(self):
+        review = self.run_commit_review()
+        self.assertEqual(review.status, 'completed')
+        self.assertEqual(review.progress['stage'], 'finished')
+        self.assertEqual(review.progress['findings'], {'reviews': 30})
+
+    def test_failed_run_records_a_failed_checkpoint_with_partial_findings(self):
+        with self.assertRaises(RuntimeError):
+            self.run_commit_review(error=RuntimeError('agent crashed'))
+        review = Review.objects.get()
+        self.assertEqual(review.status, 'failed')
+        self.assertEqual(review.progress['stage'], 'failed')
+        self.assertEqual(review.progress['partial']['reviews'], [{'file': f'f{i}.py'} for i in range(5)])
+
+
+class IncrementalReviewTests(ReviewTestCase):
+    def merge(self, previous, current, changed):
+        from .incremental_review import merge_review_data
+        return merge_review_data(previous, current, changed, base_review_id=7, base_head_sha='old')
+
+    def test_list_findings_carry_untouched_files_without_duplicates(self):
+        previous = {'reviews': [{'file': 'a.py', 'issue': 'old a'}, {'file': 'b.py', 'issue': 'old b'},
+                                {'file': 'c.py', 'issue': 'old c'}, {'issue': 'no file'}]}
+        # a.py changed; the agent also re-reported the unchanged c.py
+        current = {'reviews': [{'file': 'a.py', 'issue': 'new a'}, {'file': 'c.py', 'issue': 'new c'}]}
+        merged = self.merge(previous, current, ['a.py'])
+        self.assertEqual(merged['reviews'], [{'file': 'b.py', 'issue': 'old b'}, {'file': 'a.py', 'issue': 'new a'},
+                                             {'file': 'c.py', 'issue': 'new c'}])
+        self.assertEqual(merged['incremental'], {'base_review_id': 7, 'base_head_sha': 'old', 'changed_files': ['a.py']})
+
+    def test_dict_findings_are_replaced_per_file(self):
+        previous = {'fixes': {'a.py': ['old a'], 'b.py': ['old b']}, 'metrics': {'old': 1}}
+        current = {'fixes': {'c.py': ['new c']}, 'metrics': {'new': 1}}
+        merged = self.merge(previous, current, ['a.py', 'c.py'])
+        self.assertEqual(merged['fixes'], {'b.py': ['old b'], 'c.py': ['new c']}) # a.py changed and is now clean
+        self.assertEqual(merged['metrics'], {'new': 1})
+
+    def test_changed_files_between(self):
+        from .incremental_review import COMPARE_FILES_LIMIT, changed_files_between
+        self.owner.github_access_token = 'token'
+        self.owner.save()
+        cases = [
+            ({'status': 'ahead', 'files': [{'filename': 'b.py'}, {'filename': 'new.py', 'previous_filename': 'a.py'}]},
+             ['a.py', 'b.py', 'new.py']),
+            ({'status': 'identical', 'files': []}, []),
+            ({'status': 'diverged', 'files': [{'filename': 'a.py'}]}, None), # force-push or rebase
+            ({'status': 'ahead', 'files': [{'filename': f'{i}.py'} for i in range(COMPARE_FILES_LIMIT)]}, None),
+        ]
+        for comparison, expected in cases:
+            with mock.patch('core.incremental_review.compare_commits_from_github', return_value=comparison):
+                self.assertEqual(changed_files_between(self.repository, 'base', 'head'), expected)
+        with mock.patch('core.incremental_review.compare_commits_from_github', side_effect=RuntimeError('404')):
+            self.assertIsNone(changed_files_between(self.repository, 'base', 'head'))
+
+
+class FakeRedis:
+    """The list, string and lock commands the Redis-backed helpers use, in memory."""
+    def __init__(self):
+        self.data = {}
+
+    def rpush(self, key, *values):
+        self.data.setdefault(key, []).extend(values)
+        return len(self.data[key])
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.lrange(key, start, end)
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def lock(self, key, timeout=None):
+        return mock.Mock(acquire=mock.Mock(return_value=True))
+
+class WebhookEventLogFlushTests(ReviewTestCase):
+    def entry(self, event_id, **overrides):
+        from .webhooks.event_log import build_event_log_entry
+        entry = build_event_log_entry(event_id, 'push', {}, self.repository.id, {'ref': 'main'}, 'processed')
+        entry.update(overrides)
+        return entry
+
+    def test_bad_entries_go_to_the_dead_letter_list_instead_of_blocking_the_buffer(self):
+        from . import fastjson
+        from .webhooks.event_log import BUFFER_KEY, DEAD_LETTER_KEY, flush_event_log_buffer
+        redis = FakeRedis()
+        bad = fastjson.dumps(self.entry('bad', payload=None)) # payload is NOT NULL
+        redis.rpush(BUFFER_KEY, fastjson.dumps(self.entry('ok')), bad, b'{not json',
+                    fastjson.dumps(self.entry('gone', repository_id=999999)))
+        with mock.patch('core.webhooks.event_log.get_redis', return_value=redis):
+            self.assertEqual(flush_event_log_buffer(), 4)
+        self.assertEqual(redis.llen(BUFFER_KEY), 0)
+        self.assertEqual(redis.data[DEAD_LETTER_KEY], [b'{not json', bad])
+        self.assertEqual(
+            dict(WebhookEventLog.objects.values_list('event_id', 'repository_id')),
+            {'ok': self.repository.id, 'gone': None}, # deleted repository is nulled out
+        )
@@ -0,0 +1,111 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import User, Review, Thread, Comment
+from .query_plans import with_review_plan
+from .serializers import ReviewSerializer
+
+logger = logging.getLogger(__name__)
+
+# Parts of the feedback agent's state that are kept on the AI comment
+FEEDBACK_DATA_KEYS = [
+    "repo", "user", "fixes", "pr_id", "llm_model", "metrics",
+    "reviews", "original_review", "updated_review", "messages",
+    "feedback", "standards", "re_run_plan", "reviewer_id",
+    "sufficiency", "instructions", "feedback_status",
+    "feedback_suggestion", "feedback_explanation",
+    "sufficiency_suggestion", "sufficiency_explanation"
+]
+
+def get_ai_user() -> Optional[User]:
+    """User that AI replies are posted as (created on first use)."""
+    ai_user, _ = User.objects.get_or_create(
+        username="ai_assistant",
+        defaults={
+            "email": "ai@example.com",
+            "is_staff": True,
+            "is_ai_user": True  # Assuming this field exists
+        }
+    )
+    if ai_user:
+        return ai_user
+    if settings.AI_USER_ID:
+        try:
+            return User.objects.get(id=settings.AI_USER_ID)
+        except User.DoesNotExist:
+            logger.error(f"AI_USER_ID {settings.AI_USER_ID} not found")
+    # If no AI user is configured, use the first admin user
+    return User.objects.filter(is_staff=True).first()
+
+def feedback_context(thread: Thread) -> Tuple[bool, Dict[str, Any], Dict[str, Any]]:
+    """
+    (is_first_message, review_data, repo_settings) for a feedback run. The review and
+    repository settings are only sent on the first message of a thread.
+    """
+    is_first_message_in_thread = Comment.objects.filter(thread=thread).count() <= 1 # Only our new comment
+    if not is_first_message_in_thread:
+        return False, {}, {}
+    review = with_review_plan(Review.objects.filter(pk=thread.review_id)).get()
+    review_data = ReviewSerializer(review).data
+    repo_settings = {
+        'llm_preference': review.repository.llm_preference or settings.DEFAULT_LLM_MODEL,
+        'coding_standards': review.repository.coding_standards or [],
+        'code_metrics': review.repository.code_metrics or [],
+    }
+    return True, review_data, repo_settings
+
+def extract_ai_message(feedback_data: Dict[str, Any]) -> str:
+    """Text of the last AI message in the feedback agent's state."""
+    messages = (feedback_data or {}).get('messages') or []
+    last_message = messages[-1] if messages else None
+    if last_message and isinstance(last_message, (tuple, list)) and last_message[0] == 'ai':
+        return last_message[1]
+    if isinstance(last_message, dict) and last_message.get('type') == 'ai': # Adjust if structure is different
+        return last_message.get('content', "No response generated.")
+    return "No response generated."
+
+def save_ai_reply(thread: Thread, ai_user: User, user_comment: Comment, response: Dict[str, Any], usage_user: User) -> Comment:
+    """Persist the AI comment and usage for a finished feedback run."""
+    raw_feedback_data = response.get('feedback_data', {})
+    filtered_feedback_data = {key: raw_feedback_data[key] for key in FEEDBACK_DATA_KEYS if key in raw_feedback_data}
+
+    ai_comment = Comment.objects.create(
+        thread=thread,
+        user=ai_user,
+        comment=extract_ai_message(raw_feedback_data),
+        type='response',
+        parent_comment=user_comment,
+        comment_data=filtered_feedback_data # Store the relevant part of the response
+    )
+
+    thread.last_comment_at = timezone.now()
+    thread.save(update_fields=['last_comment_at'])
+
+    # Imported here: core.tasks imports this module (thread_tasks)
+    from .tasks.usage_tasks import record_llm_usage
+    token_usage = response.get('token_usage', {})
+    if token_usage or response.get('run_id'):
+        # Without usage on the run's messages this is backfilled from LangSmith later
+        record_llm_usage(
+            thread.review, usage_user,
+            thread.review.repository.llm_preference or settings.DEFAULT_LLM_MODEL,
+            token_usage, run_id=response.get('run_id'),
+        )
+    return ai_comment
+
+def save_error_reply(thread: Thread, ai_user: User, user_comment: Comment, error: Exception) -> Comment:
+    """Persist an error comment so the user's message still gets an answer."""
+    ai_comment = Comment.objects.create(
+        thread=thread,
+        user=ai_user,
+        parent_comment=user_comment,
+        comment=f"I'm sorry, I couldn't process your request: {str(error)}",
+        type='error',
+        comment_data={'error': str(error)}
+    )
+    thread.last_comment_at = timezone.now()
+    thread.save(update_fields=['last_comment_at'])
+    return ai_comment
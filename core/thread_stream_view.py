@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import fastjson
+from .models import Thread as ThreadModel, Comment as CommentModel
+from .serializers import CommentSerializer
+from .thread_reply import get_ai_user, feedback_context, save_ai_reply, save_error_reply
+from .tasks.thread_tasks import process_thread_reply
+from core.langgraph_client.runtime import aget_langgraph_client
+
+logger = logging.getLogger(__name__)
+
+def _sse(event: str, data: Any) -> bytes:
+    return b'event: ' + event.encode() + b'\ndata: ' + fastjson.dumps(data) + b'\n\n'
+
+def _authenticate(request):
+    """DRF's JWT authentication outside a DRF view; returns the user or None."""
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+def _serialize_comment(comment):
+    return CommentSerializer(comment).data
+
+def _finish_after_disconnect(thread, ai_user, user_comment, user, run_id):
+    """
+    The client dropped the stream: hand a started run to process_thread_reply, which
+    waits for it and saves the reply and usage; otherwise answer with an error comment.
+    """
+    if CommentModel.objects.filter(parent_comment=user_comment, type__in=['response', 'error']).exists():
+        return
+    if run_id:
+        try:
+            process_thread_reply.delay(user_comment.id, user.id, run_id=run_id)
+            return
+        except Exception as e:
+            logger.error(f"Could not queue the finish of run {run_id} for comment {user_comment.id}: {str(e)}")
+    save_error_reply(thread, ai_user, user_comment, Exception("The connection closed before the reply was ready."))
+
+@csrf_exempt
+@require_POST
+async def thread_reply_stream(request, pk):
+    """
+    Streaming (SSE) variant of ThreadViewSet.reply. Runs natively on the ASGI loop, so a
+    chat holds no worker thread while the feedback agent runs. Needs the ASGI deployment
+    (django_backend/asgi.py): under WSGI Django buffers the whole stream in a worker thread.
+
+    Events: `comment` (the saved user comment), `node` (graph node finished), `token`
+    (LLM text), then `done` (AI comment + token usage) or `error`.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if not user:
+        return JsonResponse({"detail": "Authentication credentials were not provided or are invalid."}, status=401)
+
+    # Same visibility rules as ThreadViewSet.get_queryset
+    thread = await ThreadModel.objects.filter(
+        Q(review__repository__owner=user) | Q(review__repository__collaborators__user=user), pk=pk
+    ).select_related('review__repository').distinct().afirst()
+    if not thread:
+        return JsonResponse({"detail": "Not found."}, status=404)
+
+    try:
+        body = fastjson.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON body"}, status=400)
+    message = body.get('message')
+    if not message:
+        return JsonResponse({"detail": "Message is required"}, status=400)
+    parent_comment = None
+    if body.get('parent_comment_id'):
+        parent_comment = await CommentModel.objects.filter(id=body['parent_comment_id'], thread=thread).afirst()
+        if not parent_comment:
+            return JsonResponse({"detail": "Parent comment not found"}, status=404)
+
+    ai_user = await sync_to_async(get_ai_user)()
+    if not ai_user:
+        logger.error("No AI user or admin user found for AI responses")
+        return JsonResponse({"detail": "Server configuration error: No AI user available"}, status=500)
+
+    user_comment = await CommentModel.objects.acreate(
+        thread=thread,
+        user=user,
+        comment=message,
+        type='request',
+        parent_comment=parent_comment
+    )
+
+    async def events() -> AsyncIterator[bytes]:
+        run_id = None
+        try:
+            yield _sse('comment', await sync_to_async(_serialize_comment)(user_comment))
+            client = await aget_langgraph_client()
+            is_first_message, review_data, repo_settings = await sync_to_async(feedback_context)(thread)
+            response = None
+            async for kind, data in client.stream_feedback(
+                feedback=message,
+                thread_id=thread.thread_id,
+                user_id=str(user.github_id),
+                is_first_message=is_first_message,
+                review_data=review_data,
+                repo_settings=repo_settings,
+                llm_model=thread.review.repository.llm_preference or settings.DEFAULT_LLM_MODEL,
+            ):
+                if kind == 'run':
+                    run_id = data
+                elif kind == 'token':
+                    yield _sse('token', {'text': data})
+                elif kind == 'node':
+                    yield _sse('node', {'node': data})
+                elif kind == 'done':
+                    response = data
+            ai_comment = await sync_to_async(save_ai_reply)(thread, ai_user, user_comment, response, usage_user=user)
+            yield _sse('done', {
+                'ai_response': await sync_to_async(_serialize_comment)(ai_comment),
+                'token_usage': response.get('token_usage', {}),
+            })
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled mid-await, or closed while suspended at a yield
+            logger.info(f"Client disconnected from reply stream for thread {thread.id}")
+            # The user comment is saved and the run may still finish: make sure it gets answered
+            await asyncio.shield(sync_to_async(_finish_after_disconnect)(thread, ai_user, user_comment, user, run_id))
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming thread reply: {str(e)}", exc_info=True)
+            try:
+                ai_comment = await sync_to_async(save_error_reply)(thread, ai_user, user_comment, e)
+                yield _sse('error', {'error': str(e), 'ai_response': await sync_to_async(_serialize_comment)(ai_comment)})
+            except Exception as inner_e:
+                logger.error(f"Failed to create error comment: {str(inner_e)}")
+                yield _sse('error', {'error': str(e)})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # keep nginx from buffering the stream
+    return response
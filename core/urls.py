@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # from . import views
 from .auth_view import GitHubLoginView, GitHubCallbackView, GitHubExchangeAuthTokenView, GitHubLoginRedirectView
-from .admin_view import AdminStatsView, AdminUserListView, AdminUserUpdateView
+from .admin_view import AdminStatsView, AdminMetricsView, AdminUserListView, AdminUserUpdateView
 from .webhook_view import github_webhook
 from .user_view import CurrentUserView, UserRepositoriesView, UserOrganizationsView
 from .repository_view import RepositoryViewSet
@@ -11,6 +11,7 @@ from .commit_view import CommitViewSet
 from .review_view import ReviewViewSet
 from .llmusage_view import LLMUsageViewSet
 from .thread_view import ThreadViewSet
+from .thread_stream_view import thread_reply_stream
 router = DefaultRouter()
 # # Register endpoints in FastAPI router order
 # router.register(r'repositories', views.RepositoryViewSet, basename='repository')
@@ -71,6 +72,9 @@ urlpatterns = [
     path('user/repos/', UserRepositoriesView.as_view(), name='user_repositories'), # Replaced by users/repos
     path('user/organizations/', UserOrganizationsView.as_view(), name='user_organizations'), # Replaced by users/organizations
 
+    # SSE variant of threads/<pk>/reply/ (async view, needs ASGI)
+    path('threads/<int:pk>/reply/stream/', thread_reply_stream, name='thread-reply-stream'),
+
     # Repository, pr, commit, reviews, llm-usage and threads endpoints (router)
     path('', include(router.urls)),
 
@@ -78,6 +82,7 @@ urlpatterns = [
 
     # Admin endpoints
     path('admin/stats/', AdminStatsView.as_view(), name='admin_stats'),
+    path('admin/metrics/', AdminMetricsView.as_view(), name='admin_metrics'),
     path('admin/users/', AdminUserListView.as_view(), name='admin_list_users'),
     path('admin/users/<int:user_id>/', AdminUserUpdateView.as_view(), name='admin_update_user'),
 ]
\ No newline at end of file
@@ -1,21 +1,31 @@
 from django.http import HttpResponse
 
 from .tasks.review_tasks import process_webhook_event
-from .models import (
-    Repository as DBRepository,
-    WebhookEventLog
-)
+from .webhooks.event_log import aenqueue_event_log, build_event_log_entry
+from .webhooks.secret_index import alookup_repository_secret
+from . import fastjson
 import hashlib
 import hmac
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
 import logging
 from django.views.decorators.http import require_POST
-import json
 # Create a logger instance
 logger = logging.getLogger(__name__)
 
+def _signature_is_valid(secret, body, signature):
+    expected_signature = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected_signature}", signature)
+
+async def _write_event_log(delivery_id, event_type, headers, repository_id, payload, status, error_message=None):
+    """Hand the log row to the buffered writer; the request never waits on the table."""
+    entry = build_event_log_entry(delivery_id, event_type, headers, repository_id, payload, status, error_message)
+    try:
+        await aenqueue_event_log(entry)
+    except Exception as e:
+        # The log is bookkeeping; never fail the delivery because of it
+        logger.error(f"Could not write webhook event log for {delivery_id}: {str(e)}")
+
 @csrf_exempt
 @require_POST
 async def github_webhook(request):
@@ -28,99 +38,57 @@ async def github_webhook(request):
         logger.warning("Webhook request missing required headers (Signature, Event, Delivery ID).")
         return HttpResponse('Missing required headers', status=400)
 
-    # Find repository for this webhook
-    repository = None
+    body = request.body
+    headers = request.headers
+
+    # Parse once; the repository name is needed to pick the signing secret
     try:
-        payload = json.loads(request.body.decode('utf-8'))
-        repo_full_name = payload.get('repository', {}).get('full_name')
-        if repo_full_name:
-            try:
-                repository = await DBRepository.objects.aget(repo_name=repo_full_name)
-            except DBRepository.DoesNotExist:
-                logger.warning(f"Repository {repo_full_name} not found in the database.")
-    except json.JSONDecodeError:
-        logger.warning("Could not parse request body as JSON to identify repository.")
+        event_data = fastjson.loads(body)
+    except ValueError as e:
+        logger.error(f"Invalid JSON payload for webhook event {delivery_id}: {str(e)}")
+        await _write_event_log(delivery_id, event_type, headers, None,
+                               {'message': 'Invalid JSON payload.'}, 'failed', f"Invalid JSON payload: {str(e)}")
+        return HttpResponse('Invalid JSON payload', status=400)
 
-    log_entry, created = await WebhookEventLog.objects.aupdate_or_create(
-        event_id=delivery_id,
-        defaults={
-            'repository':repository,
-            'event_type': event_type,
-            'payload': {'message': 'Event received, pending verification.'}, # Store raw body initially if possible
-            'headers': dict(request.headers),
-            'status': 'received'
-        }
-    )
-    if not created:
-        log_entry.status = 'received'
-        log_entry.repository = repository
-        log_entry.error_message = None
-        log_entry.processed_at = None
-        log_entry.payload = {'message': 'Event re-received, pending verification.'}
-        log_entry.headers = dict(request.headers)
-        await log_entry.asave()
+    # Resolve the repository id and secret from the secret index (no DB hit for known repos)
+    repo_full_name = (event_data.get('repository') or {}).get('full_name') if isinstance(event_data, dict) else None
+    repo_secret = None
+    if repo_full_name:
+        repo_secret = await alookup_repository_secret(repo_full_name)
+        if repo_secret.repository_id is None:
+            logger.warning(f"Repository {repo_full_name} not found in the database.")
+    repository_id = repo_secret.repository_id if repo_secret else None
 
-    # Extract repo info from payload to find the correct secret
+    # Verify the signature over the raw bytes before anything is trusted or enqueued
     try:
-        payload = json.loads(request.body.decode('utf-8'))
-        repo_full_name = payload.get('repository', {}).get('full_name')
-        
-        # Try to find repository-specific secret
-        webhook_secret = None
-        if repo_full_name:
-            try:
-                repo = await DBRepository.objects.aget(repo_name=repo_full_name)
-                webhook_secret = repo.webhook_secret
-            except DBRepository.DoesNotExist:
-                pass
-        
         # Fall back to global secret if no repo-specific secret found
-        if not webhook_secret:
-            webhook_secret = settings.GITHUB_WEBHOOK_SECRET
-            
-        # Verify signature with the appropriate secret
-        expected_signature = hmac.new(
-            webhook_secret.encode('utf-8'),
-            request.body,
-            hashlib.sha256
-        ).hexdigest()
-        
-        if not hmac.compare_digest(f"sha256={expected_signature}", signature):
+        valid = _signature_is_valid((repo_secret and repo_secret.secret) or settings.GITHUB_WEBHOOK_SECRET, body, signature)
+        if not valid and repo_secret and repo_secret.from_cache:
+            # The cached secret may predate a regeneration in another process; re-read it once
+            repo_secret = await alookup_repository_secret(repo_full_name, refresh=True)
+            repository_id = repo_secret.repository_id
+            valid = _signature_is_valid(repo_secret.secret or settings.GITHUB_WEBHOOK_SECRET, body, signature)
+        if not valid:
             logger.warning(f"Invalid webhook signature for event {delivery_id}.")
-            log_entry.status = 'failed'
-            log_entry.error_message = "Invalid signature."
-            await log_entry.asave()
+            await _write_event_log(delivery_id, event_type, headers, repository_id,
+                                   {'message': 'Payload discarded, invalid signature.'}, 'failed', "Invalid signature.")
             return HttpResponse('Invalid signature', status=401)
     except Exception as e:
         logger.error(f"Error during webhook signature verification for event {delivery_id}: {str(e)}")
-        log_entry.status = 'failed'
-        log_entry.error_message = f"Signature verification error: {str(e)}"
-        await log_entry.asave()
+        await _write_event_log(delivery_id, event_type, headers, repository_id,
+                               {'message': 'Payload discarded, signature verification error.'}, 'failed',
+                               f"Signature verification error: {str(e)}")
         return HttpResponse('Error verifying signature', status=500)
 
     try:
-        event_data = json.loads(request.body.decode('utf-8'))
-        log_entry.payload = event_data # Update with parsed JSON payload
-        await log_entry.asave(update_fields=['payload'])
-
         # Dispatch to Celery task for actual processing
         process_webhook_event.delay(event_type, event_data)
-        
-        log_entry.status = 'processed' # Mark as successfully enqueued
-        log_entry.processed_at = timezone.now()
-        await log_entry.asave(update_fields=['status', 'processed_at'])
-        logger.info(f"Webhook event {delivery_id} ({event_type}) successfully enqueued for processing.")
-        return HttpResponse('Webhook processed and enqueued', status=202)
-                
-    except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON payload for webhook event {delivery_id}: {str(e)}")
-        log_entry.status = 'failed'
-        log_entry.error_message = f"Invalid JSON payload: {str(e)}"
-        await log_entry.asave()
-        return HttpResponse('Invalid JSON payload', status=400)
     except Exception as e:
         logger.error(f"Error processing webhook event {delivery_id} after verification: {str(e)}", exc_info=True)
-        log_entry.status = 'failed'
-        log_entry.error_message = f"Internal processing error: {str(e)}"
-        await log_entry.asave()
-        return HttpResponse('Error processing webhook', status=500)
\ No newline at end of file
+        await _write_event_log(delivery_id, event_type, headers, repository_id, event_data, 'failed',
+                               f"Internal processing error: {str(e)}")
+        return HttpResponse('Error processing webhook', status=500)
+
+    await _write_event_log(delivery_id, event_type, headers, repository_id, event_data, 'processed')
+    logger.info(f"Webhook event {delivery_id} ({event_type}) successfully enqueued for processing.")
+    return HttpResponse('Webhook processed and enqueued', status=202)
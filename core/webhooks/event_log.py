@@ -0,0 +1,170 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from redis.exceptions import LockError
+
+from .. import fastjson
+from ..models import Repository, WebhookEventLog
+from ..redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'webhook-event-log:buffer'
+DEAD_LETTER_KEY = 'webhook-event-log:dead-letter' # entries that could not be written, kept for inspection
+FLUSH_LOCK_KEY = 'webhook-event-log:flush-lock'
+FLUSH_SCHEDULED_KEY = 'webhook-event-log:flush-scheduled'
+
+# Only these request headers are kept on the log row; the rest is noise
+LOGGED_HEADERS = (
+    'X-GitHub-Event',
+    'X-GitHub-Delivery',
+    'X-GitHub-Hook-ID',
+    'X-GitHub-Hook-Installation-Target-ID',
+    'X-GitHub-Hook-Installation-Target-Type',
+    'User-Agent',
+    'Content-Type',
+)
+
+UPDATE_FIELDS = ['repository', 'event_type', 'payload', 'headers', 'status',
+                 'error_message', 'processed_at', 'updated_at']
+
+def _batch_size() -> int:
+    return getattr(settings, 'WEBHOOK_EVENT_LOG_BATCH_SIZE', 200)
+
+def build_event_log_entry(delivery_id, event_type, headers, repository_id, payload, status, error_message=None) -> Dict[str, Any]:
+    """Plain, JSON-serialisable description of one WebhookEventLog row."""
+    return {
+        'event_id': delivery_id,
+        'repository_id': repository_id,
+        'event_type': event_type,
+        'payload': payload,
+        'headers': {name: headers[name] for name in LOGGED_HEADERS if name in headers},
+        'status': status,
+        'error_message': error_message,
+        'processed_at': timezone.now().isoformat() if status == 'processed' else None,
+    }
+
+def write_event_logs(entries: List[Dict[str, Any]]) -> int:
+    """
+    Upsert log rows on event_id in one statement. GitHub redeliveries (and entries
+    replayed after a crashed flush) overwrite the earlier row instead of duplicating it.
+    """
+    # ON CONFLICT cannot touch the same row twice, keep the latest entry per delivery
+    latest = {}
+    for entry in entries:
+        latest[entry['event_id']] = entry
+    if not latest:
+        return 0
+    # The repository may have been deleted since the delivery came in
+    repository_ids = {entry.get('repository_id') for entry in latest.values()} - {None}
+    existing_ids = set(Repository.objects.filter(id__in=repository_ids).values_list('id', flat=True)) if repository_ids else set()
+    rows = [
+        WebhookEventLog(
+            event_id=entry['event_id'],
+            repository_id=entry.get('repository_id') if entry.get('repository_id') in existing_ids else None,
+            event_type=entry['event_type'],
+            payload=entry.get('payload'),
+            headers=entry.get('headers'),
+            status=entry.get('status', 'received'),
+            error_message=entry.get('error_message'),
+            processed_at=parse_datetime(entry['processed_at']) if entry.get('processed_at') else None,
+        )
+        for entry in latest.values()
+    ]
+    WebhookEventLog.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['event_id'], update_fields=UPDATE_FIELDS,
+    )
+    return len(rows)
+
+async def aenqueue_event_log(entry: Dict[str, Any]) -> None:
+    """
+    Request-path side of the writer: append the entry to the Redis buffer and ask
+    for a flush once a batch is full. Falls back to a direct write if Redis is down.
+    """
+    if not getattr(settings, 'WEBHOOK_EVENT_LOG_BUFFERED', True):
+        await sync_to_async(write_event_logs)([entry])
+        return
+
+    try:
+        client = get_async_redis()
+        length = await client.rpush(BUFFER_KEY, fastjson.dumps(entry))
+        should_flush = length >= _batch_size() and await client.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=30)
+    except Exception as e:
+        logger.warning(f"Webhook event log buffer unavailable, writing {entry['event_id']} directly: {e}")
+        await sync_to_async(write_event_logs)([entry])
+        return
+
+    if should_flush:
+        from ..tasks.webhook_tasks import flush_webhook_event_log
+        try:
+            flush_webhook_event_log.delay()
+        except Exception as e:
+            # The periodic flush will still pick the buffer up
+            logger.warning(f"Could not schedule webhook event log flush: {e}")
+
+def _write_batch(entries) -> List[bytes]:
+    """Write (raw, entry) pairs; returns the raw entries that could not be written."""
+    try:
+        with transaction.atomic():
+            write_event_logs([entry for _, entry in entries])
+        return []
+    except Exception as e:
+        logger.warning(f"Webhook event log batch of {len(entries)} failed, retrying row by row: {e}")
+    failed = []
+    for raw, entry in entries:
+        try:
+            with transaction.atomic():
+                write_event_logs([entry])
+        except Exception as e:
+            logger.error(f"Could not write webhook event log {entry.get('event_id')}, moving it to the dead-letter list: {e}")
+            failed.append(raw)
+    return failed
+
+def flush_event_log_buffer(max_entries: Optional[int] = None) -> int:
+    """
+    Drain the Redis buffer into the database in batches. Entries are only trimmed
+    from the list after their batch is committed, so a crash mid-flush replays them.
+    A batch that fails is retried row by row; rows that still fail (and unreadable
+    entries) go to DEAD_LETTER_KEY so one bad entry can't block the buffer.
+    """
+    client = get_redis()
+    lock = client.lock(FLUSH_LOCK_KEY, timeout=120)
+    if not lock.acquire(blocking=False):
+        return 0 # another worker is flushing
+    flushed = 0
+    try:
+        client.delete(FLUSH_SCHEDULED_KEY)
+        batch_size = _batch_size()
+        while max_entries is None or flushed < max_entries:
+            raw_entries = client.lrange(BUFFER_KEY, 0, batch_size - 1)
+            if not raw_entries:
+                break
+            entries, dead = [], []
+            for raw in raw_entries:
+                try:
+                    entries.append((raw, fastjson.loads(raw)))
+                except ValueError:
+                    logger.error(f"Unreadable webhook event log entry, moving it to the dead-letter list: {raw[:200]!r}")
+                    dead.append(raw)
+            dead.extend(_write_batch(entries))
+            if dead:
+                client.rpush(DEAD_LETTER_KEY, *dead)
+            client.ltrim(BUFFER_KEY, len(raw_entries), -1)
+            flushed += len(raw_entries)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning("Webhook event log flush lock expired before release")
+    return flushed
+
+def buffer_depth() -> Optional[int]:
+    try:
+        return get_redis().llen(BUFFER_KEY)
+    except Exception:
+        return None
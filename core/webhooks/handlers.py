@@ -2,7 +2,10 @@ import json
 import logging
 from typing import Dict, Any
 from django.conf import settings
+from asgiref.sync import sync_to_async
 from ..models import RepoCollaborator, Repository, PullRequest, Commit, User
+from ..permissions import invalidate_repository_access
+from ..reviewer_index import apply_pull_request_event
 from ..tasks.review_tasks import process_webhook_event
 
 logger = logging.getLogger(__name__)
@@ -50,6 +53,8 @@ class GitHubWebhookHandler:
                 }
             )
 
+            await sync_to_async(apply_pull_request_event)(pr, action, event_data)
+
             # Trigger review for new or reopened PRs
             if action in ['opened', 'reopened']:
                 process_webhook_event.delay('pull_request', event_data)
@@ -102,7 +107,7 @@ class GitHubWebhookHandler:
             # Update collaborator status
             if action == 'added':
                 # First get or create the user based on GitHub ID
-                user = await User.objects.aget_or_create(
+                user, _ = await User.objects.aget_or_create(
                     github_id=str(member_data['id']),  # Convert to string since github_id is CharField
                     defaults={
                         'username': member_data['login'],
@@ -117,6 +122,8 @@ class GitHubWebhookHandler:
                         'role': 'member'  # Default role for new collaborators
                     }
                 )
+                # Drop any cached "no access" answer for this user
+                await sync_to_async(invalidate_repository_access)(repo.id, user.id)
             elif action == 'removed':
                 # First get the user by GitHub ID
                 try:
@@ -126,6 +133,7 @@ class GitHubWebhookHandler:
                         repository=repo,
                         user=user
                     ).adelete()
+                    await sync_to_async(invalidate_repository_access)(repo.id, user.id)
                 except User.DoesNotExist:
                     logger.warning(f"User with GitHub ID {member_data['id']} not found when removing collaborator")
 
@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..models import Repository
+
+logger = logging.getLogger(__name__)
+
+class RepositorySecret(NamedTuple):
+    repository_id: Optional[int]
+    secret: Optional[str]
+    from_cache: bool
+
+# full_name -> (expires_at, repository_id, secret); repository_id None marks an unregistered repo.
+# LRU bounded by WEBHOOK_SECRET_INDEX_LOCAL_MAX: full_name comes from the unauthenticated payload.
+_local_index: 'OrderedDict[str, Tuple[float, Optional[int], Optional[str]]]' = OrderedDict()
+_local_index_lock = threading.Lock()
+
+def _cache_key(full_name: str) -> str:
+    return f"webhook-secret:{full_name}"
+
+def _local_get(full_name):
+    with _local_index_lock:
+        entry = _local_index.get(full_name)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            _local_index.pop(full_name, None)
+            return None
+        _local_index.move_to_end(full_name)
+        return entry[1], entry[2]
+
+def _local_set(full_name, repository_id, secret):
+    if repository_id is None:
+        # Unknown names only get a short negative entry, so random names can't pin the index
+        ttl = getattr(settings, 'WEBHOOK_SECRET_INDEX_NEGATIVE_TTL', 10)
+    else:
+        ttl = getattr(settings, 'WEBHOOK_SECRET_INDEX_LOCAL_TTL', 60)
+    max_entries = getattr(settings, 'WEBHOOK_SECRET_INDEX_LOCAL_MAX', 1024)
+    with _local_index_lock:
+        _local_index[full_name] = (time.monotonic() + ttl, repository_id, secret)
+        _local_index.move_to_end(full_name)
+        while len(_local_index) > max_entries:
+            _local_index.popitem(last=False)
+
+async def alookup_repository_secret(full_name: str, refresh: bool = False) -> RepositorySecret:
+    """
+    Resolve a repository full_name to (repository id, webhook secret).
+
+    Checks the process-local index, then the shared cache, then the database.
+    With refresh=True the caches are skipped and rewritten from the database.
+    Unregistered names are never written to the shared cache.
+    """
+    if not refresh:
+        local = _local_get(full_name)
+        if local is not None:
+            return RepositorySecret(local[0], local[1], True)
+        try:
+            shared = await cache.aget(_cache_key(full_name))
+        except Exception as e:
+            logger.warning(f"Webhook secret cache lookup failed: {e}")
+            shared = None
+        if shared is not None and shared.get('id') is not None:
+            _local_set(full_name, shared['id'], shared['secret'])
+            return RepositorySecret(shared['id'], shared['secret'], True)
+
+    repo = await Repository.objects.filter(repo_name=full_name).values('id', 'webhook_secret').afirst()
+    repository_id = repo['id'] if repo else None
+    secret = repo['webhook_secret'] if repo else None
+    _local_set(full_name, repository_id, secret)
+    if repository_id is None:
+        return RepositorySecret(None, None, False)
+    try:
+        await cache.aset(
+            _cache_key(full_name),
+            {'id': repository_id, 'secret': secret},
+            getattr(settings, 'WEBHOOK_SECRET_INDEX_TTL', 3600),
+        )
+    except Exception as e:
+        logger.warning(f"Webhook secret cache store failed: {e}")
+    return RepositorySecret(repository_id, secret, False)
+
+def invalidate_repository_secret(full_name: str) -> None:
+    """Forget a repository's cached secret (this process and the shared cache)."""
+    if not full_name:
+        return
+    with _local_index_lock:
+        _local_index.pop(full_name, None)
+    try:
+        cache.delete(_cache_key(full_name))
+    except Exception as e:
+        logger.warning(f"Could not invalidate webhook secret cache for {full_name}: {e}")
@@ -3,6 +3,16 @@ ASGI config for django_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve through this module when threads/<pk>/reply/stream/ is used: it is an async SSE
+view and only streams under ASGI. Under WSGI Django buffers the whole response in a
+worker thread.
+
+    uvicorn django_backend.asgi:application --host 0.0.0.0 --port 8000 --workers 4
+
+or, behind gunicorn, `gunicorn django_backend.asgi:application -k uvicorn.workers.UvicornWorker`.
+Proxies in front must not buffer text/event-stream responses (the view sends
+X-Accel-Buffering: no for nginx).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import json
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -75,7 +76,7 @@ TEMPLATES = [
     },
 ]
 
-WSGI_APPLICATION = 'django_backend.wsgi.application'
+WSGI_APPLICATION = 'django_backend.wsgi.application' # threads/<pk>/reply/stream/ only streams when served from django_backend/asgi.py
 
 
 # Database
@@ -93,6 +94,24 @@ DATABASES = {
 }
 
 
+# Cache
+# Set DJANGO_CACHE_URL (e.g. redis://localhost:6379/1) to share cached data between processes.
+DJANGO_CACHE_URL = os.getenv('DJANGO_CACHE_URL')
+if DJANGO_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': DJANGO_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -145,6 +164,7 @@ CORS_ALLOWED_ORIGINS = [
 # CORS_ALLOW_ALL_ORIGINS = True
 
 # Django REST framework settings
+API_FAST_JSON = os.getenv('API_FAST_JSON', 'true').lower() == 'true' # orjson for API responses and request bodies (stdlib json when off or not installed)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication', # Use JWT
@@ -152,6 +172,19 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated', # Default to requiring authentication
     ),
+    # Keyset pagination on (created_at, id) for list endpoints, see core/pagination.py
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')), # ?page_size= may ask for up to 200
+    # orjson renderer/parser, see core/renderers.py; benchmark with `manage.py benchmark_json`
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer' if API_FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser' if API_FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     # TODO: Configure rate limiting if needed, similar to FastAPI's AUTH_RATE_LIMIT
 }
 
@@ -161,6 +194,45 @@ GITHUB_CLIENT_SECRET = "6f1e13cf4d4b274465656d12ac174d65187c0272" # Replace with
 GITHUB_CALLBACK_URL = "http://localhost:8000/api/v1/auth/github/callback" # Replace with actual value or load from env
 GITHUB_WEBHOOK_SECRET = "lhigjojihgfdtyuiodghj64thjki" # From your FastAPI config
 FRONTEND_URL = "http://localhost:5173" # From your FastAPI config
+
+# GitHub HTTP client pooling (shared keep-alive sessions in core/github_client/http.py)
+GITHUB_HTTP_POOL_CONNECTIONS = int(os.getenv('GITHUB_HTTP_POOL_CONNECTIONS', 10)) # Number of host pools kept by the sync session
+GITHUB_HTTP_POOL_MAXSIZE = int(os.getenv('GITHUB_HTTP_POOL_MAXSIZE', 20)) # Max connections kept alive per pool / total for aiohttp
+GITHUB_HTTP_LIMIT_PER_HOST = int(os.getenv('GITHUB_HTTP_LIMIT_PER_HOST', 10)) # aiohttp per-host connection limit
+GITHUB_HTTP_KEEPALIVE_TIMEOUT = int(os.getenv('GITHUB_HTTP_KEEPALIVE_TIMEOUT', 30)) # Seconds an idle aiohttp connection stays open
+GITHUB_HTTP_CONNECT_TIMEOUT = float(os.getenv('GITHUB_HTTP_CONNECT_TIMEOUT', 5))
+GITHUB_HTTP_READ_TIMEOUT = float(os.getenv('GITHUB_HTTP_READ_TIMEOUT', 30))
+
+# Conditional-request (ETag) cache for GitHub REST reads, see core/github_client/cache.py
+# Use 'core.github_client.cache.DjangoResponseCacheBackend' to share entries between workers via CACHES.
+GITHUB_RESPONSE_CACHE_ENABLED = os.getenv('GITHUB_RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+GITHUB_RESPONSE_CACHE_BACKEND = os.getenv('GITHUB_RESPONSE_CACHE_BACKEND', 'core.github_client.cache.LRUResponseCacheBackend')
+GITHUB_RESPONSE_CACHE_OPTIONS = {
+    'MAX_ENTRIES': 512, # LRU backend only
+    'MAX_ENTRY_BYTES': 512 * 1024, # Larger bodies are not cached
+    'CACHE_ALIAS': 'default', # Django cache backend only
+    'TIMEOUT': 24 * 60 * 60, # Django cache backend only
+}
+
+# Per-token GitHub rate-limit scheduling, see core/github_client/ratelimit.py
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv('GITHUB_RATE_LIMIT_RESERVE', 100)) # Start spacing requests out below this many remaining calls
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv('GITHUB_RATE_LIMIT_MAX_WAIT', 30)) # Longest a single request may be delayed before giving up
+GITHUB_RATE_LIMIT_MAX_RETRIES = int(os.getenv('GITHUB_RATE_LIMIT_MAX_RETRIES', 3)) # Retries for 403/429 rate-limit responses
+GITHUB_RATE_LIMIT_BACKOFF_BASE = float(os.getenv('GITHUB_RATE_LIMIT_BACKOFF_BASE', 1.0)) # Seconds, doubled on each retry without Retry-After
+GITHUB_PAGINATION_CONCURRENCY = int(os.getenv('GITHUB_PAGINATION_CONCURRENCY', 4)) # Pages fetched in parallel when walking paginated lists
+GITHUB_GRAPHQL_BATCH_SIZE = int(os.getenv('GITHUB_GRAPHQL_BATCH_SIZE', 50)) # Keys resolved per batched GraphQL query
+
+# Permission caches: CanAccessRepository membership (CACHES['default']) and the local PR reviewer index
+REPO_ACCESS_CACHE_POSITIVE_TTL = int(os.getenv('REPO_ACCESS_CACHE_POSITIVE_TTL', 300)) # Seconds a granted check is reused
+REPO_ACCESS_CACHE_NEGATIVE_TTL = int(os.getenv('REPO_ACCESS_CACHE_NEGATIVE_TTL', 60)) # Seconds a denied check is reused
+PR_REVIEWERS_CACHE_TTL = int(os.getenv('PR_REVIEWERS_CACHE_TTL', 300)) # Seconds the local requested-reviewer list is trusted before re-checking GitHub
+
+# Repository full_name -> webhook secret index, see core/webhooks/secret_index.py
+WEBHOOK_SECRET_INDEX_TTL = int(os.getenv('WEBHOOK_SECRET_INDEX_TTL', 3600)) # Seconds a repo -> webhook secret entry lives in the shared cache
+WEBHOOK_SECRET_INDEX_LOCAL_TTL = int(os.getenv('WEBHOOK_SECRET_INDEX_LOCAL_TTL', 60)) # Seconds it lives in process memory
+WEBHOOK_SECRET_INDEX_NEGATIVE_TTL = int(os.getenv('WEBHOOK_SECRET_INDEX_NEGATIVE_TTL', 10)) # Seconds an unknown repo name is remembered (process memory only)
+WEBHOOK_SECRET_INDEX_LOCAL_MAX = int(os.getenv('WEBHOOK_SECRET_INDEX_LOCAL_MAX', 1024)) # Max entries in the per-process index (LRU)
+
 # JWT Settings (if using django-rest-framework-simplejwt)
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30), # From your FastAPI config: ACCESS_TOKEN_EXPIRE_MINUTES
@@ -208,6 +280,16 @@ LANGSMITH_API_KEY = os.getenv('LANGSMITH_API_KEY', 'lsv2_pt_3d8d4ade48234f1b9a1e
 # LangGraph Assistant Configuration
 LANGGRAPH_REVIEW_ASSISTANT_ID = os.getenv('LANGGRAPH_REVIEW_ASSISTANT_ID', "80c5c4d8-dc67-5ab3-8734-c1e23e87e5ad")
 LANGGRAPH_FEEDBACK_ASSISTANT_ID = os.getenv('LANGGRAPH_FEEDBACK_ASSISTANT_ID', "cd380c07-d635-5f75-a268-adf7c2575a03")
+LANGGRAPH_RUNTIME_REFRESH_SECONDS = int(os.getenv('LANGGRAPH_RUNTIME_REFRESH_SECONDS', 300)) # How often a worker re-fetches assistant descriptors
+LANGGRAPH_RUN_TIMEOUT = float(os.getenv('LANGGRAPH_RUN_TIMEOUT', 3600)) # Longest a sync caller waits on one LangGraph call (limiter queueing included)
+LANGGRAPH_STREAM_REVIEWS = os.getenv('LANGGRAPH_STREAM_REVIEWS', 'true').lower() == 'true' # Stream review runs and checkpoint progress on the Review
+REVIEW_PROGRESS_SAVE_INTERVAL = float(os.getenv('REVIEW_PROGRESS_SAVE_INTERVAL', 2.0)) # Min seconds between progress writes
+REVIEW_PROGRESS_MAX_FINDINGS = int(os.getenv('REVIEW_PROGRESS_MAX_FINDINGS', 20)) # Findings per key kept in a progress checkpoint
+THREAD_REPLY_OFFLOAD = os.getenv('THREAD_REPLY_OFFLOAD', 'false').lower() == 'true' # Default for threads/<pk>/reply/: queue the AI answer on Celery and return 202
+THREAD_REPLY_TIME_LIMIT = int(os.getenv('THREAD_REPLY_TIME_LIMIT', 600)) # Soft time limit (seconds) of a queued reply; the hard limit is 60s later
+THREAD_REPLY_MAX_WAIT = float(os.getenv('THREAD_REPLY_MAX_WAIT', 240)) # Longest a queued reply waits for an LLM slot; keep well under THREAD_REPLY_TIME_LIMIT
+THREAD_REPLY_MAX_RETRIES = int(os.getenv('THREAD_REPLY_MAX_RETRIES', 2)) # Retries of a queued reply that got no LLM slot, 30s/60s apart, before an error reply
+THREAD_REPLY_STALE_AFTER = int(os.getenv('THREAD_REPLY_STALE_AFTER', 900)) # reply_status reports a still-unanswered request this old as failed
 AI_USER_ID = os.getenv('AI_USER_ID', 1) # Replace 1 with the actual ID of your AI user after creation
 
 # Celery Configuration
@@ -218,6 +300,73 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Task queues per class, see core/task_routing.py. Tasks declare a queue_class; run
+# dedicated workers per queue so bulk webhook reviews can't starve people waiting on
+# a manual review or chat reply, e.g.
+#   celery -A django_backend.celery_app worker -Q interactive -c 4   # manual reviews, re-reviews, thread replies
+#   celery -A django_backend.celery_app worker -Q webhook -c 2       # webhook events and webhook-driven PR reviews
+#   celery -A django_backend.celery_app worker -Q sync,maintenance,celery -c 1  # mirror sync, flushes, backfills
+TASK_QUEUES = {
+    'interactive': os.getenv('TASK_QUEUE_INTERACTIVE', 'interactive'),
+    'webhook': os.getenv('TASK_QUEUE_WEBHOOK', 'webhook'),
+    'sync': os.getenv('TASK_QUEUE_SYNC', 'sync'),
+    'maintenance': os.getenv('TASK_QUEUE_MAINTENANCE', 'maintenance'),
+}
+TASK_ROUTE_OVERRIDES = {} # task name -> queue class, beats the class the task declares
+CELERY_TASK_ROUTES = ('core.task_routing.route_task',)
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1 # Reviews run for minutes; don't let one worker hoard queued tasks
+
+# Redis used by the app itself (event-log buffer, locks); defaults to the Celery broker
+REDIS_URL = os.getenv('REDIS_URL', CELERY_BROKER_URL)
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 2))
+
+# Buffered WebhookEventLog writer, see core/webhooks/event_log.py
+WEBHOOK_EVENT_LOG_BUFFERED = os.getenv('WEBHOOK_EVENT_LOG_BUFFERED', 'true').lower() == 'true' # False writes each row inline
+WEBHOOK_EVENT_LOG_BATCH_SIZE = int(os.getenv('WEBHOOK_EVENT_LOG_BATCH_SIZE', 200)) # Buffered rows that trigger an immediate flush
+WEBHOOK_EVENT_LOG_FLUSH_INTERVAL = float(os.getenv('WEBHOOK_EVENT_LOG_FLUSH_INTERVAL', 5)) # Seconds between periodic flushes
+
+# Quiet period before a webhook-triggered PR review runs; pushes within it collapse into one review of the latest head
+PR_REVIEW_DEBOUNCE_SECONDS = int(os.getenv('PR_REVIEW_DEBOUNCE_SECONDS', 30))
+
+# Reuse completed reviews of an identical diff (+ standards/metrics/model), see core/review_cache.py
+REVIEW_CACHE_ENABLED = os.getenv('REVIEW_CACHE_ENABLED', 'true').lower() == 'true'
+REVIEW_CACHE_TTL = int(os.getenv('REVIEW_CACHE_TTL', 7 * 24 * 60 * 60)) # Seconds a completed review stays reusable
+INCREMENTAL_REVIEW_ENABLED = os.getenv('INCREMENTAL_REVIEW_ENABLED', 'true').lower() == 'true' # Re-review only files changed since the last completed review of a PR
+# LLM usage that a run's messages don't report is backfilled from LangSmith by a deferred task
+LLM_USAGE_BACKFILL_DELAY = int(os.getenv('LLM_USAGE_BACKFILL_DELAY', 10)) # Seconds before the first LangSmith lookup (doubles per retry)
+LLM_USAGE_BACKFILL_MAX_RETRIES = int(os.getenv('LLM_USAGE_BACKFILL_MAX_RETRIES', 6))
+
+# Per-model limits on concurrent LangGraph runs, see core/langgraph_client/limiter.py.
+# Keys match llm_preference by substring (like calculate_cost); runs over a limit wait in a FIFO queue.
+# LLM_MODEL_LIMITS='{"gpt-4": {"max_in_flight": 2, "tokens_per_minute": 80000}}' adds/overrides models.
+LLM_LIMITER_ENABLED = os.getenv('LLM_LIMITER_ENABLED', 'true').lower() == 'true'
+LLM_MODEL_LIMITS = {
+    'default': {'max_in_flight': 8, 'tokens_per_minute': 400000},
+    **json.loads(os.getenv('LLM_MODEL_LIMITS', '{}')),
+}
+LLM_ESTIMATED_REVIEW_TOKENS = int(os.getenv('LLM_ESTIMATED_REVIEW_TOKENS', 20000)) # Reserved per review run until its real usage is known
+LLM_ESTIMATED_FEEDBACK_TOKENS = int(os.getenv('LLM_ESTIMATED_FEEDBACK_TOKENS', 6000)) # Reserved per chat reply
+LLM_LIMIT_LEASE_SECONDS = int(os.getenv('LLM_LIMIT_LEASE_SECONDS', 120)) # Slot lease, renewed while the run is alive
+LLM_LIMIT_MAX_WAIT = float(os.getenv('LLM_LIMIT_MAX_WAIT', 1800)) # Longest a run waits for a slot before failing
+LLM_LIMIT_INLINE_MAX_WAIT = float(os.getenv('LLM_LIMIT_INLINE_MAX_WAIT', 5)) # Longest an inline threads/<pk>/reply/ waits before the reply is queued on Celery instead
+
+# Local mirror of GitHub PRs/commits served by the list endpoints, see core/github_mirror.py
+GITHUB_MIRROR_SYNC_INTERVAL = int(os.getenv('GITHUB_MIRROR_SYNC_INTERVAL', 300)) # Seconds between incremental syncs of every repository
+GITHUB_MIRROR_MAX_PAGES = int(os.getenv('GITHUB_MIRROR_MAX_PAGES', 20)) # Pages of 100 PRs/commits one sync may walk (bounds the first sync)
+GITHUB_MIRROR_STALE_AFTER = int(os.getenv('GITHUB_MIRROR_STALE_AFTER', 900)) # Seconds after which list responses carry X-Mirror-Stale: true
+GITHUB_MIRROR_REFRESH_MIN_INTERVAL = int(os.getenv('GITHUB_MIRROR_REFRESH_MIN_INTERVAL', 60)) # ?refresh=true queues at most one sync per repository per interval
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-webhook-event-log': {
+        'task': 'core.tasks.webhook_tasks.flush_webhook_event_log',
+        'schedule': WEBHOOK_EVENT_LOG_FLUSH_INTERVAL,
+    },
+    'sync-github-mirrors': {
+        'task': 'core.tasks.sync_tasks.sync_github_mirrors',
+        'schedule': GITHUB_MIRROR_SYNC_INTERVAL,
+    },
+}
+
 # It's highly recommended to load sensitive keys and environment-specific settings
 # from environment variables rather than hardcoding them.
 # For example, using something like python-decouple or os.environ.get()